@@ -1,84 +1,305 @@
-from django.contrib import admin
-from .models import Cheval, Cavalier, Moniteur, Cours, Participation, Inscription
-from django.db.models import Count, Case, When, IntegerField
-from datetime import date
+import re
+
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.core.paginator import Paginator
+from django.db import IntegrityError, transaction
+from django.forms.models import BaseInlineFormSet
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
+from django.utils.functional import cached_property
+from .calendrier import aujourd_hui, prochaine_date
+from .contraintes import validate_many
+from .creneaux import rapport
+from .disponibilites import cavaliers_libres, chevaux_libres
+from . import exports
+from .forms import CoursForm
+from .inscriptions import PLACES_PAR_COURS
+from .planning import appliquer, planifier_semaine
+from .models import (
+    Attente, Cheval, Cavalier, Moniteur, Cours, Participation, Inscription, Seance, Tache,
+    participants_du_cours,
+)
+from django.db.models import Exists, OuterRef
+
+# === Pagination sans COUNT(*) complet ===
+class PaginateurPlafonne(Paginator):
+    """
+    Ne compte pas au-delà de ``PLAFOND`` lignes : le COUNT(*) porte sur une
+    sous-requête limitée, donc son coût ne grandit plus avec la table.
+    Les pages au-delà du plafond ne sont pas proposées.
+    """
+    PLAFOND = 10000
+
+    @cached_property
+    def count(self):
+        return self.object_list.order_by().values('pk')[:self.PLAFOND].count()
+
+
+class GrandeTableAdmin(admin.ModelAdmin):
+    paginator = PaginateurPlafonne
+    show_full_result_count = False
 
 # === Admin Cavalier ===
-class CavalierAdmin(admin.ModelAdmin):
+class CavalierAdmin(GrandeTableAdmin):
     list_display = ["prenom", "nom", "est_inscrit_quelque_part"]
     search_fields = ["prenom", "nom"]
+    actions = ["exporter_plannings"]
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            inscrit=Exists(Participation.objects.filter(cavalier=OuterRef('pk'), date__gte=aujourd_hui()))
+        )
+
+    @admin.display(description="Inscrit à un cours ?", ordering="inscrit")
     def est_inscrit_quelque_part(self, obj):
-        participations = Participation.objects.filter(cavalier=obj)
-        return "✅ Oui" if participations.exists() else "❌ Non"
-    est_inscrit_quelque_part.short_description = "Inscrit à un cours ?"
+        return "✅ Oui" if obj.inscrit else "❌ Non"
+
+    @admin.action(description="📄 Exporter les plannings à venir (CSV)")
+    def exporter_plannings(self, request, queryset):
+        a_venir = Participation.objects.filter(cavalier__in=queryset.values('pk'), date__gte=aujourd_hui())
+        return exports.reponse_csv(request, "plannings", exports.plannings(a_venir))
 
 # === Admin Cheval ===
 class ChevalAdmin(admin.ModelAdmin):
     search_fields = ["nom"]
+    actions = ["exporter_charge"]
+
+    @admin.action(description="📄 Exporter la charge de la semaine (CSV)")
+    def exporter_charge(self, request, queryset):
+        return exports.reponse_csv(request, "charge-chevaux", exports.charge_chevaux(queryset))
+
+# === Admin Participation / Inscription ===
+class ParticipationAdmin(GrandeTableAdmin):
+    list_display = ["date", "cours", "cavalier", "cheval"]
+    list_select_related = ["cours", "cavalier", "cheval"]
+    actions = ["exporter"]
+
+    @admin.action(description="📄 Exporter les participations (CSV)")
+    def exporter(self, request, queryset):
+        return exports.reponse_csv(request, "participations", exports.participations(queryset))
+
+
+class SeanceAdmin(GrandeTableAdmin):
+    list_display = ["date", "cours"]
+    list_select_related = ["cours"]
+
+
+class InscriptionAdmin(GrandeTableAdmin):
+    list_display = ["cavalier", "cours", "date_inscription"]
+    list_select_related = ["cavalier", "cours"]
+
+
+class AttenteAdmin(GrandeTableAdmin):
+    list_display = ["seance", "cavalier", "cheval", "demandee_le", "promue_le"]
+    list_select_related = ["seance__cours", "cavalier", "cheval"]
+    raw_id_fields = ["seance", "cavalier", "cheval"]
+
+
+class TacheAdmin(admin.ModelAdmin):
+    list_display = ["cle", "essais", "executer_apres", "prise_le", "abandonnee_le"]
+    list_filter = [("abandonnee_le", admin.EmptyFieldListFilter)]
+    readonly_fields = ["erreur"]
+    actions = ["relancer"]
+
+    @admin.action(description="🔁 Relancer les tâches abandonnées")
+    def relancer(self, request, queryset):
+        n = 0
+        for tache in queryset.filter(abandonnee_le__isnull=False):
+            try:
+                with transaction.atomic():
+                    Tache.objects.filter(pk=tache.pk).update(essais=0, executer_apres=timezone.now(), abandonnee_le=None)
+                n += 1
+            except IntegrityError:
+                # Une tâche de même clé attend déjà : elle fera le travail
+                tache.delete()
+        self.message_user(request, f"{n} tâche(s) relancée(s).")
+
+# === Choix de l'inline Participation, chargés une fois par requête ===
+class ChoixEnCache(forms.ModelChoiceField):
+    """ModelChoiceField qui lit d'abord les objets préchargés par le formset."""
+    objets = None
+
+    def to_python(self, value):
+        if self.objets is not None and str(value) in self.objets:
+            return self.objets[str(value)]
+        return super().to_python(value)
+
+
+class AutocompleteEnCache(AutocompleteSelect):
+    """Affiche l'option sélectionnée sans requête quand l'objet est préchargé."""
+
+    def optgroups(self, name, value, attr=None):
+        field = self.choices.field
+        if field.objets is None:
+            return super().optgroups(name, value, attr)
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, "", "", False, 0))
+        for v in value:
+            obj = field.objets.get(str(v))
+            if obj is not None:
+                options.append(self.create_option(
+                    name, obj.pk, field.label_from_instance(obj), True, len(options)
+                ))
+        return [(None, options, 0)]
+
+# === Formset Participation : règles vérifiées en lot ===
+class ParticipationFormSet(BaseInlineFormSet):
+    champs_en_cache = ("cavalier", "cheval")
+
+    @cached_property
+    def objets_en_cache(self):
+        """Cavaliers et chevaux de toutes les lignes, en une requête par champ."""
+        ids = {nom: set() for nom in self.champs_en_cache}
+        if self.is_bound:
+            motif = re.compile(rf"{re.escape(self.prefix)}-\d+-({'|'.join(self.champs_en_cache)})")
+            for cle, valeur in self.data.items():
+                m = motif.fullmatch(cle)
+                if m and valeur:
+                    ids[m.group(1)].add(valeur)
+        else:
+            for p in self.get_queryset():
+                for nom in self.champs_en_cache:
+                    ids[nom].add(getattr(p, f"{nom}_id"))
+        return {
+            nom: {str(obj.pk): obj for obj in self.form.base_fields[nom].queryset.filter(pk__in=ids[nom])}
+            for nom in self.champs_en_cache
+        }
+
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        # Les lignes existantes sont déjà chargées par _existing_object : pas de get() par ligne
+        pk = self.model._meta.pk.name
+        if form.is_bound and index is not None and index < self.initial_form_count():
+            champ = form.fields[pk]
+            form.fields[pk] = ChoixEnCache(champ.queryset, initial=champ.initial, required=False, widget=champ.widget)
+            form.fields[pk].objets = {str(k): obj for k, obj in self._object_dict.items()}
+
+    def _construct_form(self, i, **kwargs):
+        form = super()._construct_form(i, **kwargs)
+        form.instance._validation_groupee = True
+        for nom, objets in self.objets_en_cache.items():
+            form.fields[nom].objets = objets
+        return form
+
+    def clean(self):
+        super().clean()
+        forms = [
+            form for form in self.forms
+            if form.is_valid() and not self._should_delete_form(form)
+            and form.instance.cheval_id and form.instance.cavalier_id
+        ]
+        erreurs = validate_many(form.instance for form in forms)
+        for form, erreur in zip(forms, erreurs):
+            if erreur:
+                form.add_error(None, erreur)
 
 # === Inline Participation personnalisé ===
 class ParticipationInline(admin.TabularInline):
+    """Participations aux séances à venir du cours ; une nouvelle ligne va à la prochaine séance."""
     model = Participation
+    formset = ParticipationFormSet
     extra = 1
+    fields = ["date", "cavalier", "cheval"]
+    readonly_fields = ["date"]
     autocomplete_fields = ["cavalier", "cheval"]
 
-    def formfield_for_foreignkey(self, db_field, request=None, **kwargs):
-        today = date.today()
-        jour_str = today.strftime('%A').lower()
-
-        if db_field.name == "cheval":
-            # 🐴 Chevaux déjà montés 2 fois dans la journée
-            chevaux_exclus_jour = Participation.objects.filter(
-                cours__jour=jour_str
-            ).values('cheval').annotate(n=Count('id')).filter(n__gte=2).values_list('cheval', flat=True)
-
-            # 🐴 Chevaux déjà utilisés dans le cours courant (pas 2 cavaliers sur le même cheval dans un cours)
-            cours_id = request.resolver_match.kwargs.get('object_id')
-            chevaux_deja_utilises = []
-            if cours_id:
-                chevaux_deja_utilises = Participation.objects.filter(
-                    cours__id=cours_id
-                ).values_list('cheval', flat=True)
-
-            kwargs["queryset"] = Cheval.objects.exclude(
-                id__in=list(chevaux_exclus_jour) + list(chevaux_deja_utilises)
-            )
-
-        if db_field.name == "cavalier":
-            # 🧍 Cavaliers ayant dépassé 4 cours cette semaine
-            cavaliers_limite = Participation.objects.values('cavalier') \
-                .annotate(n=Count('id')) \
-                .filter(n__gte=4).values_list('cavalier', flat=True)
-
-            # 🧍 Cavaliers non encore inscrits
-            inscrits_ids = Participation.objects.values_list('cavalier', flat=True).distinct()
-
-            kwargs["queryset"] = Cavalier.objects.exclude(id__in=cavaliers_limite).annotate(
-                inscrit=Case(
-                    When(id__in=inscrits_ids, then=1),
-                    default=0,
-                    output_field=IntegerField()
-                )
-            ).order_by('inscrit', 'nom')
+    def get_queryset(self, request):
+        # Le libellé de chaque ligne (Participation.__str__) affiche les trois relations
+        return super().get_queryset(request).filter(date__gte=aujourd_hui()) \
+            .select_related('cours', 'cavalier', 'cheval').order_by('date', 'pk')
 
+    def get_formset(self, request, obj=None, **kwargs):
+        request._cours_participation = obj  # lu par _choix, pendant la construction des champs
+        return super().get_formset(request, obj, **kwargs)
+
+    def _choix(self, request, nom):
+        """Querysets de choix, construits une seule fois par requête."""
+        cache = request.__dict__.setdefault('_choix_participation', {})
+        if nom not in cache:
+            cours = getattr(request, '_cours_participation', None)
+            jour = prochaine_date(cours.jour) if cours else None
+
+            if nom == "cheval":
+                # 🐴 Chevaux déjà montés 2 fois le jour de la prochaine séance dans
+                # d'autres cours (occupation matérialisée)
+                queryset = chevaux_libres(cours, jour) if cours else Cheval.objects.all()
+            else:
+                # 🧍 Cavaliers ayant déjà 4 cours la semaine de la séance (ou un cours
+                # débutant, pour un concours) ; non inscrits en premier
+                queryset = (cavaliers_libres(cours, jour) if cours else Cavalier.objects.all()).annotate(
+                    inscrit=Exists(Participation.objects.filter(cavalier=OuterRef('pk'), date__gte=aujourd_hui()))
+                ).order_by('inscrit', 'nom')
+            cache[nom] = queryset
+        return cache[nom]
+
+    def formfield_for_foreignkey(self, db_field, request=None, **kwargs):
+        if db_field.name in ("cheval", "cavalier"):
+            kwargs["queryset"] = self._choix(request, db_field.name)
+            kwargs["form_class"] = ChoixEnCache
+            kwargs["widget"] = AutocompleteEnCache(db_field, self.admin_site, using=kwargs.get("using"))
         return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
 # === Admin Cours personnalisé ===
 class CoursAdmin(admin.ModelAdmin):
+    form = CoursForm  # libellé des entraîneurs : "Prénom Nom (spécialité)"
     inlines = [ParticipationInline]
-    list_display = ["niveau", "jour", "heure_debut", "heure_fin", "entraineur"]
+    list_display = ["niveau", "jour", "heure_debut", "heure_fin", "entraineur", "participants"]
+    list_select_related = ["entraineur"]
+    actions = ["planifier_chevaux"]
+    change_list_template = "admin/club/cours/change_list.html"  # lien vers les chevauchements
+
+    def get_urls(self):
+        vue = self.admin_site.admin_view(self.chevauchements)
+        return [path('chevauchements/', vue, name='club_cours_chevauchements'), *super().get_urls()]
+
+    def chevauchements(self, request):
+        """Rapport de tous les chevauchements de créneaux (moniteurs, cavaliers, chevaux)."""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        conflits = rapport()
+        return TemplateResponse(request, "admin/club/cours/chevauchements.html", {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': "Chevauchements de créneaux",
+            'conflits': conflits,
+            'participations': [("🧍 Cavaliers", conflits['cavaliers']), ("🐴 Chevaux", conflits['chevaux'])],
+        })
+
+    def get_queryset(self, request):
+        # Participants de la prochaine séance
+        return super().get_queryset(request).annotate(nb_participants=participants_du_cours())
+
+    @admin.display(description="Participants", ordering="nb_participants")
+    def participants(self, obj):
+        return f"{obj.nb_participants}/{PLACES_PAR_COURS}"
+
+    @admin.action(description="🐴 Affecter les chevaux aux inscrits")
+    def planifier_chevaux(self, request, queryset):
+        plan = planifier_semaine(cours=queryset)
+        try:
+            appliquer(plan)
+        except ValidationError as e:
+            # Une inscription est passée entre le calcul et l'écriture : rien n'a été écrit
+            self.message_user(request, f"Planning non appliqué : {' '.join(e.messages)} Relance l'action.",
+                              level=messages.ERROR)
+            return
+        self.message_user(request, f"{len(plan.affectations)} participations créées.")
+        if plan.refus:
+            self.message_user(request, f"{len(plan.refus)} inscriptions sans cheval.", level=messages.WARNING)
 
-    def formfield_for_foreignkey(self, db_field, request, **kwargs):
-        if db_field.name == "entraineur":
-            kwargs["queryset"] = Moniteur.objects.all()
-            kwargs["label_from_instance"] = lambda obj: f"{obj.prenom} {obj.nom} ({obj.specialite})"
-        return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
 # === Enregistrement dans l’admin ===
 admin.site.register(Cavalier, CavalierAdmin)
 admin.site.register(Cheval, ChevalAdmin)
 admin.site.register(Moniteur)
 admin.site.register(Cours, CoursAdmin)
-admin.site.register(Participation)
-admin.site.register(Inscription)
+admin.site.register(Participation, ParticipationAdmin)
+admin.site.register(Seance, SeanceAdmin)
+admin.site.register(Inscription, InscriptionAdmin)
+admin.site.register(Attente, AttenteAdmin)
+admin.site.register(Tache, TacheAdmin)
@@ -0,0 +1,55 @@
+from django.db.models import Exists, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .calendrier import prochaine_date
+from .models import Cheval, ChevalJour, Moniteur, Participation
+
+
+# === POLITIQUES DE CHOIX ===
+# Une politique reçoit le queryset des chevaux éligibles, le cours et la date
+# de la séance, et renvoie le queryset trié du meilleur au moins bon candidat.
+
+def moins_charge(chevaux, cours, date):
+    """Répartit la charge de la semaine : le cheval le moins travaillé d'abord."""
+    return chevaux.order_by('seances_travail', 'pk')
+
+
+def moins_monte_ce_jour(chevaux, cours, date):
+    """Privilégie le repos dans la journée, puis la charge de la semaine."""
+    nb_jour = Coalesce(Subquery(
+        ChevalJour.objects.filter(cheval=OuterRef('pk'), date=date).values('seances'),
+        output_field=IntegerField(),
+    ), Value(0))
+    return chevaux.annotate(nb_jour=nb_jour).order_by('nb_jour', 'seances_travail', 'pk')
+
+
+POLITIQUE_PAR_DEFAUT = moins_charge
+
+
+def chevaux_eligibles(cours, cavalier=None, date=None):
+    """
+    Chevaux qui peuvent être montés dans la séance de ``cours`` du ``date``
+    (par défaut la prochaine), en une seule requête.
+
+    Exclut les chevaux indisponibles, déjà pris dans cette séance ou dans un
+    cours qui la chevauche, ou déjà montés 2 fois ce jour-là. Les chevaux de moins de 6 ans ne vont jamais en
+    concours et ne sont proposés qu'aux cavaliers qui sont aussi moniteurs.
+    """
+    date = date or prochaine_date(cours.jour)
+    pleins_ce_jour = ChevalJour.objects.pleins(date)
+    deja_sur_le_creneau = Participation.objects.chevauchant(date, cours.heure_debut, cours.heure_fin) \
+        .values('cheval')
+    chevaux = Cheval.objects.filter(disponible=True) \
+        .exclude(pk__in=pleins_ce_jour).exclude(pk__in=deja_sur_le_creneau)
+
+    if cours.niveau.lower() == "concours" or cavalier is None:
+        return chevaux.filter(age__gte=6)
+    est_moniteur = Exists(Moniteur.objects.filter(nom=cavalier.nom, prenom=cavalier.prenom))
+    return chevaux.filter(Q(age__gte=6) | est_moniteur)
+
+
+def choisir_cheval(cours, cavalier=None, politique=None, date=None):
+    """Renvoie le meilleur cheval éligible selon ``politique``, ou ``None``."""
+    politique = politique or POLITIQUE_PAR_DEFAUT
+    date = date or prochaine_date(cours.jour)
+    return politique(chevaux_eligibles(cours, cavalier, date), cours, date).first()
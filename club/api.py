@@ -0,0 +1,149 @@
+from datetime import datetime, time
+from functools import wraps
+
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views.decorators.http import condition, require_GET
+
+from .calendrier import aujourd_hui, prochaine_date, sept_jours
+from .inscriptions import PLACES_PAR_COURS
+from .models import Cheval, Cours, Revision, participants_du_cours
+
+LIMITE_PAR_DEFAUT = 50
+LIMITE_MAX = 200
+
+
+class ParametreInvalide(ValueError):
+    pass
+
+
+# === RÉVISION : ETag et Last-Modified ===
+def _revision(request):
+    """Révision des données, lue une seule fois par requête."""
+    if not hasattr(request, '_revision_club'):
+        request._revision_club = Revision.actuelle()
+    return request._revision_club
+
+
+# Les places portent sur la prochaine séance : les réponses changent aussi
+# chaque jour, sans nouvelle révision
+def _etag(request, *args, **kwargs):
+    return f"club-{_revision(request).numero}-{aujourd_hui():%Y%m%d}"
+
+
+def _derniere_modification(request, *args, **kwargs):
+    minuit = timezone.make_aware(datetime.combine(aujourd_hui(), time.min))
+    return max(_revision(request).modifie, minuit)
+
+
+def point_api(vue):
+    """GET seulement, réponse 304 si la révision n'a pas changé, 400 sur paramètre invalide."""
+    @wraps(vue)
+    def envelopper(request, *args, **kwargs):
+        try:
+            return vue(request, *args, **kwargs)
+        except ParametreInvalide as e:
+            return JsonResponse({"erreur": str(e)}, status=400)
+    return require_GET(condition(etag_func=_etag, last_modified_func=_derniere_modification)(envelopper))
+
+
+# === PAGINATION PAR CLÉ ET CHOIX DES CHAMPS ===
+def _entier(request, nom, defaut):
+    valeur = request.GET.get(nom)
+    if valeur in (None, ""):
+        return defaut
+    try:
+        return int(valeur)
+    except ValueError:
+        raise ParametreInvalide(f"« {nom} » doit être un entier.")
+
+
+def _champs(request, disponibles):
+    demandes = request.GET.get('champs')
+    if not demandes:
+        return list(disponibles)
+    champs = [c.strip() for c in demandes.split(',') if c.strip()]
+    inconnus = [c for c in champs if c not in disponibles]
+    if inconnus:
+        raise ParametreInvalide(f"Champs inconnus : {', '.join(inconnus)} (disponibles : {', '.join(disponibles)}).")
+    return champs
+
+
+def _page(request, queryset, champs):
+    """
+    Page de résultats après l'identifiant ``apres`` (pagination par clé) :
+    le coût ne dépend pas de la position dans la liste, contrairement à OFFSET.
+    """
+    apres = _entier(request, 'apres', 0)
+    limite = _entier(request, 'limite', LIMITE_PAR_DEFAUT)
+    if not 1 <= limite <= LIMITE_MAX:
+        raise ParametreInvalide(f"« limite » doit être entre 1 et {LIMITE_MAX}.")
+
+    # L'identifiant est toujours lu : il sert de clé à la page suivante
+    colonnes = dict.fromkeys(['id', *champs])
+    lignes = list(queryset.filter(pk__gt=apres).order_by('pk').values(*colonnes)[:limite + 1])
+    suivant = None
+    if len(lignes) > limite:
+        lignes = lignes[:limite]
+        params = request.GET.copy()
+        params['apres'] = lignes[-1]['id']
+        suivant = request.build_absolute_uri(f"{request.path}?{params.urlencode()}")
+    if 'id' not in champs:
+        for ligne in lignes:
+            del ligne['id']
+    return {"resultats": lignes, "suivant": suivant}
+
+
+def _par_jour(request, queryset):
+    jour = request.GET.get('jour')
+    if jour is None:
+        return queryset
+    if jour not in dict(Cours.JOUR_CHOICES):
+        raise ParametreInvalide(f"Jour inconnu : {jour}.")
+    return queryset.filter(jour=jour)
+
+
+# === POINTS D'ENTRÉE ===
+CHAMPS_CHEVAL = ('id', 'nom', 'race', 'age', 'disponible', 'seances_travail')
+CHAMPS_COURS = ('id', 'niveau', 'jour', 'heure_debut', 'heure_fin', 'entraineur')
+CHAMPS_PLACES = ('id', 'date', 'participants', 'places_restantes')
+
+
+@point_api
+def chevaux(request):
+    """Chevaux du club ; ``?disponible=1`` ne garde que les chevaux disponibles."""
+    queryset = Cheval.objects.all()
+    if request.GET.get('disponible') in ('1', 'true'):
+        queryset = queryset.filter(disponible=True)
+    return JsonResponse(_page(request, queryset, _champs(request, CHAMPS_CHEVAL)))
+
+
+@point_api
+def cours(request):
+    """Cours de la semaine, filtrables par ``?jour=`` ; ``entraineur`` est l'identifiant du moniteur."""
+    queryset = _par_jour(request, Cours.objects.all())
+    return JsonResponse(_page(request, queryset, _champs(request, CHAMPS_COURS)))
+
+
+@point_api
+def places(request):
+    """
+    Places restantes à la prochaine séance de chaque cours (``PLACES_PAR_COURS``
+    moins les participations) ; ``date`` est la date de cette séance.
+    """
+    debut, fin = sept_jours()
+    queryset = _par_jour(request, Cours.objects.all()).annotate(
+        participants=participants_du_cours((debut, fin)),
+    )
+    champs = _champs(request, CHAMPS_PLACES)
+    calcules = ('date', 'places_restantes')
+    page = _page(request, queryset, [c for c in champs if c not in calcules] + ['participants', 'jour'])
+    for ligne in page["resultats"]:
+        jour = ligne.pop('jour')
+        if 'date' in champs:
+            ligne['date'] = prochaine_date(jour, debut)
+        if 'places_restantes' in champs:
+            ligne['places_restantes'] = max(PLACES_PAR_COURS - ligne['participants'], 0)
+        if 'participants' not in champs:
+            del ligne['participants']
+    return JsonResponse(page)
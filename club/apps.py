@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class ClubConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'club'
+
+    def ready(self):
+        from . import cache, inscriptions, mails, sqlite, taches
+
+        cache.brancher()         # invalidation du cache des plannings
+        inscriptions.brancher()  # promotion de la liste d'attente
+        mails.brancher()         # tâches d'envoi des mails
+        sqlite.brancher()        # pragmas SQLite du profil de production
+        taches.brancher()        # tâches de fond et leur vérification
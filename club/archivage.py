@@ -0,0 +1,129 @@
+import time
+from collections import Counter, defaultdict
+
+from django.db import connection, transaction
+from django.db.models import F
+
+from .calendrier import debut_saison, saison, semaine
+from .models import (
+    Avis, BilanCavalier, BilanCheval, CavalierSemaine, ChevalJour, Inscription, InscriptionArchivee, Participation,
+    ParticipationArchivee, ajuster_occupation, participations_modifiees,
+)
+
+
+class Avancement:
+    def __init__(self):
+        self.participations = 0
+        self.inscriptions = 0
+        self.lots = 0
+        self.debut = time.perf_counter()
+
+    @property
+    def duree(self):
+        return time.perf_counter() - self.debut
+
+
+def _cumuler(modele, champ, totaux):
+    """
+    Ajoute ``totaux`` ``{(objet_id, saison): Counter}`` aux bilans : les lignes
+    manquantes sont créées, puis un UPDATE en F() par saison et par valeur
+    d'ajout distincte (comme ``ajuster_occupation``).
+    """
+    modele.objects.bulk_create(
+        [modele(**{f"{champ}_id": pk, 'saison': s}) for pk, s in totaux], ignore_conflicts=True,
+    )
+    groupes = defaultdict(list)
+    for (pk, s), valeurs in totaux.items():
+        groupes[(s, tuple(sorted(valeurs.items())))].append(pk)
+    for (s, valeurs), ids in groupes.items():
+        modele.objects.filter(saison=s, **{f"{champ}_id__in": ids}) \
+            .update(**{nom: F(nom) + n for nom, n in valeurs})
+
+
+def _lot_de_participations(avant, taille):
+    """Déplace un lot de participations antérieures à ``avant`` ; renvoie sa taille."""
+    with transaction.atomic():
+        # Lu dans l'ordre de l'index (date, cheval) : pas de tri, pas de parcours complet
+        lignes = list(
+            Participation.objects.filter(date__lt=avant).order_by('date', 'cheval')
+            .values_list('pk', 'date', 'cours_id', 'cavalier_id', 'cheval_id', 'cours__niveau', 'seance_id')[:taille]
+        )
+        if not lignes:
+            return 0
+        ParticipationArchivee.objects.bulk_create(
+            ParticipationArchivee(id=pk, date=date, cours_id=cours_id, cavalier_id=cavalier_id,
+                                  cheval_id=cheval_id, niveau=niveau)
+            for pk, date, cours_id, cavalier_id, cheval_id, niveau, _ in lignes
+        )
+        cavaliers, chevaux = defaultdict(Counter), defaultdict(Counter)
+        for _, date, _, cavalier_id, cheval_id, niveau, _ in lignes:
+            cavaliers[(cavalier_id, saison(date))]['seances'] += 1
+            if niveau.lower() == "concours":
+                cavaliers[(cavalier_id, saison(date))]['concours'] += 1
+            chevaux[(cheval_id, saison(date))]['seances'] += 1
+        _cumuler(BilanCavalier, 'cavalier', cavaliers)
+        _cumuler(BilanCheval, 'cheval', chevaux)
+
+        # DELETE direct plutôt que .delete() : les receveurs post_delete de Participation
+        # réajusteraient l'occupation en double et promouvraient la liste d'attente de
+        # séances passées. Rien ne référence Participation : pas de cascade à faire.
+        # Compteurs, révision et cache sont mis à jour juste en dessous.
+        pks = [l[0] for l in lignes]
+        with connection.cursor() as curseur:
+            curseur.execute(
+                f"DELETE FROM {Participation._meta.db_table} WHERE id IN ({', '.join(['%s'] * len(pks))})", pks,
+            )
+        ajuster_occupation(retirees=[(cavalier_id, cheval_id, seance_id, date)
+                                     for _, date, _, cavalier_id, cheval_id, _, seance_id in lignes])
+        participations_modifiees.send(sender=Participation, cavalier_ids={l[3] for l in lignes})
+    return len(lignes)
+
+
+def _lot_d_inscriptions(avant, taille):
+    with transaction.atomic():
+        inscriptions = list(Inscription.objects.filter(date_inscription__lt=avant).order_by('pk')[:taille])
+        if not inscriptions:
+            return 0
+        InscriptionArchivee.objects.bulk_create(
+            InscriptionArchivee(id=i.pk, cavalier_id=i.cavalier_id, cours_id=i.cours_id,
+                                date_inscription=i.date_inscription)
+            for i in inscriptions
+        )
+        # Ni signal ni clé étrangère vers Inscription : un seul DELETE
+        Inscription.objects.filter(pk__in=[i.pk for i in inscriptions]).delete()
+    return len(inscriptions)
+
+
+def archiver(avant=None, taille=1000, pause=0.0):
+    """
+    Déplace les participations antérieures à ``avant``, et les inscriptions
+    des saisons terminées à cette date, vers les tables d'archives, en lots
+    de ``taille`` lignes ; produit l'avancement après chaque lot.
+
+    Chaque lot est une transaction courte : le site reste utilisable, et une
+    interruption ne perd rien (il suffit de relancer, les lots déjà faits ne
+    sont plus à déplacer). ``pause`` laisse passer les écritures du site
+    entre deux lots. ``avant`` vaut au plus le lundi de la semaine en cours
+    (c'est la valeur par défaut) : les séances archivées sont passées et ne
+    comptent plus dans les compteurs des chevaux.
+    """
+    lundi = semaine()[0]
+    avant = avant or lundi
+    if avant > lundi:
+        raise ValueError(f"Seules les semaines terminées s'archivent (avant le {lundi:%d/%m/%Y}).")
+
+    avancement = Avancement()
+    # Une inscription vaut pour toute la saison : elle ne part qu'avec elle
+    for deplacer, limite, compte in ((_lot_de_participations, avant, 'participations'),
+                                     (_lot_d_inscriptions, debut_saison(avant), 'inscriptions')):
+        while n := deplacer(limite, taille):
+            setattr(avancement, compte, getattr(avancement, compte) + n)
+            avancement.lots += 1
+            yield avancement
+            if pause:
+                time.sleep(pause)
+    # Jours de cheval et semaines de cavalier vidés par l'archivage
+    ChevalJour.objects.filter(date__lt=avant, seances=0).delete()
+    CavalierSemaine.objects.filter(lundi__lt=avant, cours=0).delete()
+    # Avis jamais envoyés (tâche abandonnée) : ces séances sont passées, ils ne partiront plus
+    Avis.objects.filter(seance__date__lt=avant).delete()
@@ -0,0 +1,203 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.template.loader import render_to_string
+
+from .calendrier import aujourd_hui
+from .models import Attente, Cheval, Cours, Moniteur, Participation, participations_modifiees
+from .taches import mettre_en_file, tache
+
+# Le planning d'un cavalier change quelques fois par semaine : l'invalidation
+# explicite fait le travail, la durée de vie n'est qu'un filet de sécurité
+DUREE = 7 * 24 * 3600
+
+# Les clés portent la date du jour : le planning des séances à venir change
+# de lui-même chaque jour, les clés de la veille expirent seules
+CLE_PARTICIPATIONS = "club:planning:{}:{}:participations"
+CLE_FRAGMENT = "club:planning:{}:{}:fragment"
+CLE_SUCCES = "club:planning:succes"
+CLE_ECHECS = "club:planning:echecs"
+
+
+def _compter(cle):
+    if not cache.add(cle, 1, timeout=None):
+        try:
+            cache.incr(cle)
+        except ValueError:  # expirée entre add() et incr()
+            cache.add(cle, 1, timeout=None)
+
+
+def _lire(cle, calculer):
+    valeur = cache.get(cle)
+    if valeur is None:
+        _compter(CLE_ECHECS)
+        valeur = calculer()
+        cache.set(cle, valeur, DUREE)
+    else:
+        _compter(CLE_SUCCES)
+    return valeur
+
+
+def _a_venir(cavalier, jour):
+    return Participation.objects.filter(cavalier=cavalier, date__gte=jour) \
+        .select_related('cours__entraineur', 'cheval').order_by('date', 'cours__heure_debut')
+
+
+def _attentes(cavalier, jour):
+    return Attente.objects.en_attente().filter(cavalier=cavalier, seance__date__gte=jour) \
+        .avec_position().select_related('seance__cours').order_by('seance__date', 'seance__cours__heure_debut')
+
+
+def participations_du_cavalier(cavalier):
+    """Participations du cavalier aux séances à venir (avec cours, moniteur et cheval), depuis le cache."""
+    jour = aujourd_hui()
+    return _lire(CLE_PARTICIPATIONS.format(cavalier.pk, jour), lambda: list(_a_venir(cavalier, jour)))
+
+
+def fragment_planning(cavalier):
+    """
+    HTML de la liste des cours du cavalier et de ses places en liste
+    d'attente (club/_planning.html), depuis le cache : la position n'est
+    recalculée que quand la file bouge.
+    """
+    jour = aujourd_hui()
+    return _lire(
+        CLE_FRAGMENT.format(cavalier.pk, jour),
+        lambda: render_to_string("club/_planning.html", {
+            "participations": participations_du_cavalier(cavalier),
+            "attentes": list(_attentes(cavalier, jour)),
+        }),
+    )
+
+
+# === VERSIONS ASYNCHRONES (vues ASGI) ===
+async def _acompter(cle):
+    if not await cache.aadd(cle, 1, timeout=None):
+        try:
+            await cache.aincr(cle)
+        except ValueError:
+            await cache.aadd(cle, 1, timeout=None)
+
+
+async def _alire(cle, calculer):
+    valeur = await cache.aget(cle)
+    if valeur is None:
+        await _acompter(CLE_ECHECS)
+        valeur = await calculer()
+        await cache.aset(cle, valeur, DUREE)
+    else:
+        await _acompter(CLE_SUCCES)
+    return valeur
+
+
+async def aparticipations_du_cavalier(cavalier):
+    """Comme ``participations_du_cavalier``, avec l'ORM asynchrone."""
+    jour = aujourd_hui()
+
+    async def calculer():
+        return [p async for p in _a_venir(cavalier, jour)]
+    return await _alire(CLE_PARTICIPATIONS.format(cavalier.pk, jour), calculer)
+
+
+async def afragment_planning(cavalier):
+    """Comme ``fragment_planning``, avec l'ORM asynchrone."""
+    jour = aujourd_hui()
+
+    async def calculer():
+        return render_to_string("club/_planning.html", {
+            "participations": await aparticipations_du_cavalier(cavalier),
+            "attentes": [a async for a in _attentes(cavalier, jour)],
+        })
+    return await _alire(CLE_FRAGMENT.format(cavalier.pk, jour), calculer)
+
+
+def statistiques():
+    return {
+        "succes": cache.get(CLE_SUCCES, 0),
+        "echecs": cache.get(CLE_ECHECS, 0),
+    }
+
+
+def invalider(cavalier_ids):
+    """
+    Oublie le planning des cavaliers donnés, une fois la transaction validée :
+    une lecture faite avant le commit ne peut pas laisser de donnée périmée.
+    """
+    jour = aujourd_hui()
+    cles = [cle.format(pk, jour) for pk in set(cavalier_ids) if pk for cle in (CLE_PARTICIPATIONS, CLE_FRAGMENT)]
+    if cles:
+        transaction.on_commit(lambda: cache.delete_many(cles))
+
+
+# === INVALIDATION ===
+def _participation_modifiee(sender, instance, **kwargs):
+    invalider([instance.cavalier_id, getattr(instance, '_cavalier_id_initial', None)])
+
+
+def _participations_modifiees(sender, cavalier_ids, **kwargs):
+    invalider(cavalier_ids)
+
+
+# Un cours, un cheval ou un moniteur modifié touche tous les cavaliers de
+# ses séances à venir : les retrouver est confié à la file de tâches
+CHAMPS_PLANNINGS = {'cours': 'cours', 'cheval': 'cheval', 'moniteur': 'cours__entraineur'}
+
+
+def _invalider_plannings(arguments):
+    """Plannings des cavaliers des séances à venir des cours, chevaux et moniteurs donnés."""
+    filtre = Q()
+    for nom, champ in CHAMPS_PLANNINGS.items():
+        ids = {a[nom] for a in arguments if nom in a}
+        if ids:
+            filtre |= Q(**{f"{champ}__in": ids})
+    invalider(Participation.objects.filter(filtre, date__gte=aujourd_hui()).values_list('cavalier_id', flat=True))
+
+
+def _plannings_a_invalider(nom, pk):
+    mettre_en_file('plannings', {f"{nom}:{pk}": {nom: pk}})
+
+
+def _cours_modifie(sender, instance, created, **kwargs):
+    # Un cours supprimé supprime ses participations, qui invalident elles-mêmes
+    if not created:
+        _plannings_a_invalider('cours', instance.pk)
+
+
+def _cheval_modifie(sender, instance, created, **kwargs):
+    if not created:
+        _plannings_a_invalider('cheval', instance.pk)
+
+
+def _moniteur_modifie(sender, instance, created, **kwargs):
+    if not created:
+        _plannings_a_invalider('moniteur', instance.pk)
+
+
+def _moniteur_supprime(sender, instance, **kwargs):
+    # Sur place : après la suppression, les cours ne pointent plus vers le moniteur
+    invalider(Participation.objects.filter(cours__entraineur=instance, date__gte=aujourd_hui()).values_list('cavalier_id', flat=True))
+
+
+def _attente_enregistree(sender, instance, **kwargs):
+    # Une demande arrive en fin de file : les positions des autres ne changent pas
+    invalider([instance.cavalier_id])
+
+
+def _attente_supprimee(sender, instance, **kwargs):
+    invalider([instance.cavalier_id, *Attente.objects.en_attente().filter(seance_id=instance.seance_id)
+               .values_list('cavalier_id', flat=True)])
+
+
+def brancher():
+    """Invalidation du cache sur les signaux des modèles ; appelé par ``ClubConfig.ready``."""
+    post_save.connect(_participation_modifiee, sender=Participation)
+    post_delete.connect(_participation_modifiee, sender=Participation)
+    participations_modifiees.connect(_participations_modifiees)
+    tache('plannings', _invalider_plannings)
+    post_save.connect(_cours_modifie, sender=Cours)
+    post_save.connect(_cheval_modifie, sender=Cheval)
+    post_save.connect(_moniteur_modifie, sender=Moniteur)
+    pre_delete.connect(_moniteur_supprime, sender=Moniteur)
+    post_save.connect(_attente_enregistree, sender=Attente)
+    post_delete.connect(_attente_supprimee, sender=Attente)
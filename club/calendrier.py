@@ -0,0 +1,50 @@
+from datetime import date, timedelta
+
+from django.utils import timezone
+
+# Jours des cours (Cours.jour), dans l'ordre de date.weekday()
+JOURS = ['lundi', 'mardi', 'mercredi', 'jeudi', 'vendredi', 'samedi', 'dimanche']
+
+
+def aujourd_hui():
+    return timezone.localdate()
+
+
+def lundi(jour):
+    """Lundi de la semaine de ``jour``."""
+    return jour - timedelta(days=jour.weekday())
+
+
+def semaine(jour=None):
+    """Premier et dernier jour (lundi, dimanche) de la semaine de ``jour``, aujourd'hui par défaut."""
+    debut = lundi(jour or aujourd_hui())
+    return debut, debut + timedelta(days=6)
+
+
+def prochaine_date(nom_du_jour, depuis=None):
+    """Prochaine date (``depuis`` compris) qui tombe un ``nom_du_jour`` (« lundi », …)."""
+    depuis = depuis or aujourd_hui()
+    return depuis + timedelta(days=(JOURS.index(nom_du_jour) - depuis.weekday()) % 7)
+
+
+def dates(nom_du_jour, depuis, semaines):
+    """Les ``semaines`` prochaines dates d'un jour de cours, à partir de ``depuis``."""
+    premiere = prochaine_date(nom_du_jour, depuis)
+    return [premiere + timedelta(weeks=n) for n in range(semaines)]
+
+
+def sept_jours(depuis=None):
+    """Les sept jours à partir de ``depuis`` (aujourd'hui par défaut) : la prochaine séance de chaque cours."""
+    debut = depuis or aujourd_hui()
+    return debut, debut + timedelta(days=6)
+
+
+def debut_saison(jour):
+    """1er septembre de la saison du club (septembre → août) qui contient ``jour``."""
+    return date(jour.year if jour.month >= 9 else jour.year - 1, 9, 1)
+
+
+def saison(jour):
+    """Nom de la saison d'une date, par exemple « 2025-2026 »."""
+    annee = debut_saison(jour).year
+    return f"{annee}-{annee + 1}"
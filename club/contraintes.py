@@ -0,0 +1,161 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+from .calendrier import lundi
+from .creneaux import Creneaux
+from .models import Cavalier, Cheval, Cours, Moniteur, Participation, _dater
+
+# Règles du club, partagées avec disponibilites (mêmes règles en filtres SQL)
+MAX_PAR_JOUR = 2       # séances par cheval et par jour
+MAX_PAR_SEMAINE = 4    # cours par cavalier et par semaine
+
+
+# === OCCUPATION EN MÉMOIRE ===
+class Occupation:
+    """Index en mémoire des participations des cavaliers et chevaux concernés."""
+
+    def __init__(self):
+        self.chevaux_cours = Counter()      # (cheval_id, cours_id, date) -> nb
+        self.cavaliers_cours = Counter()    # (cavalier_id, cours_id, date) -> nb
+        self.chevaux_jour = Counter()       # (cheval_id, date) -> nb
+        self.cavaliers_semaine = Counter()  # (cavalier_id, lundi) -> nb
+        self.cavaliers_debutant = Counter() # (cavalier_id, lundi) -> nb de cours débutant
+        self.moniteurs = set()              # (nom, prenom)
+        self.creneaux = Creneaux()          # ('cavalier' | 'cheval', id, date) -> créneaux des séances
+
+    def ajouter(self, cheval_id, cavalier_id, cours_id, date, niveau, debut, fin, signe=1):
+        semaine = lundi(date)
+        for cle in (('cheval', cheval_id, date), ('cavalier', cavalier_id, date)):
+            if signe > 0:
+                self.creneaux.ajouter(cle, debut, fin, cours_id)
+            else:
+                self.creneaux.retirer(cle, debut, fin, cours_id)
+        self.chevaux_cours[(cheval_id, cours_id, date)] += signe
+        self.cavaliers_cours[(cavalier_id, cours_id, date)] += signe
+        self.chevaux_jour[(cheval_id, date)] += signe
+        self.cavaliers_semaine[(cavalier_id, semaine)] += signe
+        if niveau.lower() == "débutant":
+            self.cavaliers_debutant[(cavalier_id, semaine)] += signe
+
+    def retirer(self, *args):
+        self.ajouter(*args, signe=-1)
+
+    @classmethod
+    def charger(cls, participations, ignorees=()):
+        """
+        Construit l'index en une requête (deux si un cheval a moins de 6 ans).
+
+        Seules les semaines des participations vérifiées sont lues, par les
+        index (cavalier, date) et (cheval, date) : le coût ne dépend pas de
+        l'historique. Les participations en base dont le pk est dans
+        ``ignorees`` ne comptent pas.
+        """
+        occupation = cls()
+        cavaliers = {p.cavalier_id for p in participations}
+        chevaux = {p.cheval_id for p in participations}
+        debut = min(lundi(p.date) for p in participations)
+        fin = max(lundi(p.date) for p in participations) + timedelta(days=6)
+        lignes = Participation.objects.filter(
+            Q(cavalier_id__in=cavaliers) | Q(cheval_id__in=chevaux), date__range=(debut, fin),
+        ).values_list('id', 'cheval_id', 'cavalier_id', 'cours_id', 'date', 'cours__niveau',
+                      'cours__heure_debut', 'cours__heure_fin')
+
+        remplacees = {p.pk for p in participations if p.pk} | set(ignorees)
+        for pk, *ligne in lignes:
+            if pk not in remplacees:
+                occupation.ajouter(*ligne)
+
+        jeunes = [p.cavalier for p in participations if p.cheval.age < 6]
+        if jeunes:
+            filtre = Q()
+            for cavalier in jeunes:
+                filtre |= Q(nom=cavalier.nom, prenom=cavalier.prenom)
+            occupation.moniteurs = set(Moniteur.objects.filter(filtre).values_list('nom', 'prenom'))
+        return occupation
+
+    def verifier(self, p):
+        """Lève une ValidationError si ``p`` enfreint une règle du club."""
+        cheval, cavalier, cours = p.cheval, p.cavalier, p.cours
+        concours = cours.niveau.lower() == "concours"
+        semaine = lundi(p.date)
+
+        # 🧍 Cavalier déjà inscrit à cette séance ?
+        if self.cavaliers_cours[(cavalier.pk, cours.pk, p.date)] > 0:
+            raise ValidationError("Ce cavalier participe déjà à ce cours.", code='deja_inscrit')
+
+        # 🐴 Cheval déjà utilisé dans ce cours ?
+        if self.chevaux_cours[(cheval.pk, cours.pk, p.date)] > 0:
+            raise ValidationError(f"{cheval.nom} est déjà monté pendant ce créneau.", code='cheval_cours')
+
+        # 🕒 Cavalier ou cheval déjà dans un autre cours qui chevauche celui-ci ?
+        debut, fin = cours.heure_debut, cours.heure_fin
+        if self.creneaux.chevauche(('cavalier', cavalier.pk, p.date), debut, fin):
+            raise ValidationError(f"{cavalier.prenom} {cavalier.nom} est déjà dans un cours sur ce créneau.",
+                                  code='cavalier_creneau')
+        if self.creneaux.chevauche(('cheval', cheval.pk, p.date), debut, fin):
+            raise ValidationError(f"{cheval.nom} est déjà monté dans un cours sur ce créneau.", code='cheval_creneau')
+
+        # 🐴 Cheval monté + de 2 fois ce jour-là ?
+        if self.chevaux_jour[(cheval.pk, p.date)] >= MAX_PAR_JOUR:
+            raise ValidationError(f"{cheval.nom} est déjà monté {MAX_PAR_JOUR} fois ce jour-là.", code='cheval_jour')
+
+        # 🧍‍♂️ Cavalier dans + de 4 cours cette semaine ?
+        if self.cavaliers_semaine[(cavalier.pk, semaine)] >= MAX_PAR_SEMAINE:
+            raise ValidationError(f"{cavalier.prenom} {cavalier.nom} a déjà atteint {MAX_PAR_SEMAINE} cours cette semaine.", code='limite_semaine')
+
+        # 🧍 Débutant ne peut pas aller en concours la même semaine
+        if concours and self.cavaliers_debutant[(cavalier.pk, semaine)] > 0:
+            raise ValidationError("Ce cavalier suit un cours Débutant et ne peut pas participer à un Concours.", code='debutant_concours')
+
+        # 🐴 Cheval < 6 ans → pas concours, doit être monté par moniteur
+        if cheval.age < 6:
+            if concours:
+                raise ValidationError(f"{cheval.nom} a moins de 6 ans et ne peut pas faire de concours.", code='cheval_jeune')
+            if (cavalier.nom, cavalier.prenom) not in self.moniteurs:
+                raise ValidationError(f"{cheval.nom} a moins de 6 ans et ne peut être monté que par un moniteur.", code='cheval_jeune')
+
+
+def _charger_relations(participations):
+    """Charge en bloc les cours, cavaliers et chevaux pas encore en cache."""
+    for nom, modele in (('cours', Cours), ('cavalier', Cavalier), ('cheval', Cheval)):
+        champ = Participation._meta.get_field(nom)
+        manquantes = [p for p in participations if not champ.is_cached(p)]
+        if manquantes:
+            objets = modele.objects.in_bulk({getattr(p, champ.attname) for p in manquantes})
+            for p in manquantes:
+                setattr(p, nom, objets[getattr(p, champ.attname)])
+
+
+def validate_many(participations, ignorees=()):
+    """
+    Vérifie les règles de ``Participation.clean`` pour tout un lot.
+
+    Le nombre de requêtes ne dépend pas de la taille du lot. Les participations
+    sont vérifiées dans l'ordre et chacune compte pour les suivantes, comme si
+    elles étaient enregistrées une à une. Une participation sans séance est
+    vérifiée pour la prochaine séance de son cours. Les participations en
+    base listées dans ``ignorees`` (pk) sont comptées comme déjà remplacées.
+    Renvoie une liste alignée sur ``participations`` contenant ``None`` ou la
+    ``ValidationError`` levée.
+    """
+    participations = list(participations)
+    if not participations:
+        return []
+    _charger_relations(participations)
+    _dater(participations)
+    occupation = Occupation.charger(participations, ignorees)
+
+    erreurs = []
+    for p in participations:
+        try:
+            occupation.verifier(p)
+        except ValidationError as e:
+            erreurs.append(e)
+        else:
+            erreurs.append(None)
+            occupation.ajouter(p.cheval.pk, p.cavalier.pk, p.cours.pk, p.date, p.cours.niveau,
+                               p.cours.heure_debut, p.cours.heure_fin)
+    return erreurs
@@ -0,0 +1,94 @@
+from bisect import bisect_left, insort
+from collections import defaultdict
+from heapq import heappop, heappush
+from operator import itemgetter
+
+from .calendrier import aujourd_hui
+from .models import Cours, Participation
+
+# Un créneau est un intervalle [début, fin[ dans une journée : deux créneaux
+# se chevauchent si chacun commence avant la fin de l'autre. Les créneaux
+# sont rangés par clé (un moniteur et un jour, un cavalier ou un cheval et
+# une date), triés par heure de début.
+
+_debut = itemgetter(0)
+
+
+def chevauchent(debut, fin, autre_debut, autre_fin):
+    return debut < autre_fin and autre_debut < fin
+
+
+# === INDEX EN MÉMOIRE ===
+class Creneaux:
+    """Créneaux ``(début, fin, valeur)`` de chaque clé, triés par début."""
+
+    def __init__(self):
+        self.par_cle = defaultdict(list)
+
+    def ajouter(self, cle, debut, fin, valeur=None):
+        insort(self.par_cle[cle], (debut, fin, valeur), key=_debut)
+
+    def retirer(self, cle, debut, fin, valeur=None):
+        self.par_cle[cle].remove((debut, fin, valeur))
+
+    def chevauchants(self, cle, debut, fin):
+        """
+        Valeurs des créneaux de ``cle`` qui chevauchent [``debut``, ``fin``[ :
+        la dichotomie borne le parcours aux créneaux qui commencent avant
+        ``fin``, parcourus un à un (une clé ne porte qu'une journée, quelques
+        créneaux).
+        """
+        creneaux = self.par_cle.get(cle, ())
+        return [creneaux[i][2] for i in range(bisect_left(creneaux, fin, key=_debut)) if creneaux[i][1] > debut]
+
+    def chevauche(self, cle, debut, fin):
+        return bool(self.chevauchants(cle, debut, fin))
+
+
+def conflits(creneaux):
+    """
+    Chevauchements d'une suite de créneaux ``(clé, début, fin, valeur)`` :
+    triplets ``(clé, valeur, valeur en conflit)``, un par paire qui se
+    chevauche. Balayage par début croissant : les créneaux en cours de la
+    clé attendent dans un tas trié par fin, d'où sortent ceux qui finissent
+    avant le nouveau début ; ceux qui restent le chevauchent tous.
+    O(n log n + nombre de paires).
+    """
+    resultat = []
+    cle_courante, en_cours = None, []
+    for rang, (cle, debut, fin, valeur) in enumerate(sorted(creneaux, key=itemgetter(0, 1))):
+        if cle != cle_courante:
+            cle_courante, en_cours = cle, []
+        while en_cours and en_cours[0][0] <= debut:
+            heappop(en_cours)
+        resultat += [(cle, autre, valeur) for _, _, autre in en_cours]
+        heappush(en_cours, (fin, rang, valeur))  # le rang départage deux fins égales
+    return resultat
+
+
+# === RAPPORT ===
+def rapport(depuis=None):
+    """
+    Tous les chevauchements existants : moniteurs dans le planning des cours,
+    cavaliers et chevaux dans les séances depuis ``depuis`` (aujourd'hui par
+    défaut). Trois lectures en values_list() et trois balayages, puis une
+    requête par liste pour charger les conflits trouvés.
+    """
+    depuis = depuis or aujourd_hui()
+    cours = Cours.objects.filter(entraineur__isnull=False) \
+        .values_list('entraineur_id', 'jour', 'heure_debut', 'heure_fin', 'pk')
+    moniteurs = conflits(((m, jour), d, f, pk) for m, jour, d, f, pk in cours.iterator())
+
+    participations = Participation.objects.filter(date__gte=depuis)
+    resultat = {'moniteurs': _charger(Cours.objects.select_related('entraineur'), moniteurs)}
+    for nom, champ in (('cavaliers', 'cavalier_id'), ('chevaux', 'cheval_id')):
+        lignes = participations.values_list(champ, 'date', 'cours__heure_debut', 'cours__heure_fin', 'pk')
+        trouves = conflits(((r, date), d, f, pk) for r, date, d, f, pk in lignes.iterator())
+        resultat[nom] = _charger(Participation.objects.select_related('cours', 'cavalier', 'cheval'), trouves)
+    return resultat
+
+
+def _charger(queryset, trouves):
+    """Remplace les identifiants des conflits par les objets, chargés en une requête."""
+    objets = queryset.in_bulk({pk for _, a, b in trouves for pk in (a, b)})
+    return [(objets[a], objets[b]) for _, a, b in trouves]
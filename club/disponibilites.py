@@ -0,0 +1,163 @@
+from datetime import time, timedelta
+
+from django.db.models import (
+    BooleanField, Case, Count, Exists, ExpressionWrapper, OuterRef, Q, Subquery, TimeField, Value, When,
+)
+from django.db.models.functions import Coalesce
+
+from .calendrier import lundi, semaine, sept_jours
+from .contraintes import MAX_PAR_JOUR, MAX_PAR_SEMAINE
+from .creneaux import Creneaux
+from .inscriptions import PLACES_PAR_COURS
+from .models import Cavalier, Cheval, ChevalJour, Moniteur, Participation, Seance
+
+# Les règles de Participation.clean (voir contraintes.Occupation.verifier),
+# écrites en filtres et annotations : les pages n'affichent que ce qui
+# passera, au lieu de le découvrir au POST.
+
+
+def _semaines(debut, fin):
+    premier = lundi(debut)
+    return [(l, l + timedelta(days=6))
+            for l in (premier + timedelta(weeks=i) for i in range((fin - premier).days // 7 + 1))]
+
+
+def _par_semaine(jours, valeur, defaut):
+    """Expression valant ``valeur(semaine)`` pour la semaine de la séance (quelques semaines au plus)."""
+    return Case(*(When(date__range=s, then=valeur(s)) for s in _semaines(*jours)), default=defaut)
+
+
+def _sur_le_creneau(ref):
+    """Participations qui chevauchent la séance extérieure, elle comprise ; ``ref(champ)`` y fait référence."""
+    return Participation.objects.chevauchant(ref('date'), ref('cours__heure_debut'), ref('cours__heure_fin'))
+
+
+def _chevaux_de_la_seance():
+    """
+    Chevaux disponibles, ni déjà montés MAX_PAR_JOUR fois le jour de la séance
+    extérieure, ni déjà dans un cours qui la chevauche (elle comprise).
+    """
+    return Cheval.objects.filter(disponible=True) \
+        .exclude(pk__in=ChevalJour.objects.filter(date=OuterRef(OuterRef('date')), seances__gte=MAX_PAR_JOUR)
+                 .values('cheval')) \
+        .exclude(pk__in=_sur_le_creneau(lambda champ: OuterRef(OuterRef(champ))).values('cheval'))
+
+
+def seances_ouvertes(cavalier, jours=None, max_cours=MAX_PAR_SEMAINE, complets=False, niveau=None):
+    """
+    Séances entre ``jours`` (les sept prochains jours par défaut, soit la
+    prochaine de chaque cours) où ``cavalier`` peut encore s'inscrire, en
+    une requête.
+
+    Écartées : séances où il est déjà ou qui chevauchent l'un de ses cours,
+    semaines où il a ``max_cours`` cours,
+    concours d'une semaine où il suit un cours débutant, séances sans cheval
+    qu'il puisse monter (moins de 6 ans : moniteurs seulement, jamais en
+    concours). Avec ``complets``, les séances pleines restent (liste
+    d'attente) ; ``complet`` l'indique.
+    """
+    jours = jours or sept_jours()
+    siennes = Participation.objects.filter(cavalier=cavalier)
+    cours_semaine = _par_semaine(jours, lambda s: Coalesce(Subquery(
+        cavalier.semaines.filter(lundi=s[0]).values('cours')
+    ), Value(0)), Value(0))
+    debutant = _par_semaine(
+        jours, lambda s: Exists(siennes.filter(date__range=s, cours__niveau_normalise="débutant")), Value(False),
+    )
+    libres = _chevaux_de_la_seance()
+
+    # Seul ``complet`` est lu ; les autres expressions ne servent qu'aux filtres
+    seances = Seance.objects.filter(date__range=jours).select_related('cours__entraineur').annotate(
+        complet=ExpressionWrapper(Q(participants__gte=PLACES_PAR_COURS), output_field=BooleanField()),
+    ).alias(
+        cours_semaine=cours_semaine,
+        debutant=debutant,
+        adulte_libre=Exists(libres.filter(age__gte=6)),
+        jeune_libre=Exists(libres.filter(age__lt=6)),
+        moniteur=Exists(Moniteur.objects.filter(nom=cavalier.nom, prenom=cavalier.prenom)),
+    ).exclude(
+        Exists(_sur_le_creneau(OuterRef).filter(cavalier=cavalier))
+    ).filter(
+        cours_semaine__lt=max_cours,
+    ).exclude(
+        cours__niveau_normalise="concours", debutant=True,
+    )
+    if niveau is not None:
+        seances = seances.filter(cours__niveau_normalise=niveau)
+
+    # Le moniteur d'abord : les jeunes chevaux ne sont cherchés que pour lui
+    cheval_libre = Q(adulte_libre=True) | (
+        Q(moniteur=True) & ~Q(cours__niveau_normalise="concours") & Q(jeune_libre=True)
+    )
+    ouverte = Q(participants__lt=PLACES_PAR_COURS) & cheval_libre
+    return seances.filter(ouverte | Q(complet=True) if complets else ouverte).order_by('date', 'cours__heure_debut')
+
+
+def chevaux_par_seance(seances, cavalier):
+    """
+    Pose sur chaque séance ``chevaux`` : les chevaux que ``cavalier`` peut
+    y monter, en deux requêtes quel que soit le nombre de séances (les
+    candidats, puis les chevaux déjà pris ces jours-là et les jours pleins,
+    réunis).
+    """
+    seances = list(seances)
+    if not seances:
+        return seances
+    moniteur = Exists(Moniteur.objects.filter(nom=cavalier.nom, prenom=cavalier.prenom))
+    candidats = list(Cheval.objects.filter(disponible=True).filter(Q(age__gte=6) | moniteur).order_by('nom'))
+
+    # Créneaux (jour, début, fin, cheval) des chevaux déjà pris ; un jour plein
+    # occupe toute la journée
+    jours = {s.date for s in seances}
+    pris = Participation.objects.filter(date__in=jours) \
+        .values_list('date', 'cours__heure_debut', 'cours__heure_fin', 'cheval')
+    pleins = ChevalJour.objects.filter(date__in=jours, seances__gte=MAX_PAR_JOUR) \
+        .values_list('date', Value(time.min, output_field=TimeField()), Value(time.max, output_field=TimeField()),
+                     'cheval')
+    occupes = Creneaux()
+    for jour, debut, fin, cheval in pris.union(pleins, all=True):
+        occupes.ajouter(jour, debut, fin, cheval)
+
+    for s in seances:
+        concours = s.cours.niveau_normalise == "concours"
+        hors = set(occupes.chevauchants(s.date, s.cours.heure_debut, s.cours.heure_fin))
+        s.chevaux = [c for c in candidats if c.id not in hors and not (concours and c.age < 6)]
+    return seances
+
+
+def disponibilites(cavalier, jours=None, max_cours=MAX_PAR_SEMAINE, complets=False, niveau=None):
+    """Séances ouvertes à ``cavalier`` (``seances_ouvertes``) avec leurs ``chevaux`` : trois requêtes."""
+    return chevaux_par_seance(seances_ouvertes(cavalier, jours, max_cours, complets, niveau), cavalier)
+
+
+# === ADMIN : CHOIX D'UNE SÉANCE ===
+# Les participants déjà présents dans la séance restent proposés : leurs
+# lignes doivent rester valides dans le formulaire.
+
+def _ailleurs(cours, date):
+    """Participations du ``date`` dans d'autres cours qui chevauchent ``cours``."""
+    return Participation.objects.chevauchant(date, cours.heure_debut, cours.heure_fin).exclude(cours=cours)
+
+
+def chevaux_libres(cours, date):
+    """
+    Chevaux pas encore montés MAX_PAR_JOUR fois le ``date`` dans d'autres
+    cours, ni pris dans un autre cours qui chevauche celui-ci.
+    """
+    ici = Participation.objects.filter(cours=cours, date=date).values('cheval')
+    return Cheval.objects.exclude(pk__in=ChevalJour.objects.pleins(date, MAX_PAR_JOUR).exclude(cheval__in=ici)) \
+        .exclude(pk__in=_ailleurs(cours, date).values('cheval'))
+
+
+def cavaliers_libres(cours, date):
+    """
+    Cavaliers qui n'ont pas déjà MAX_PAR_SEMAINE cours dans la semaine du
+    ``date`` hors de cette séance, ni un autre cours qui la chevauche ; pour
+    un concours, sans cours débutant cette semaine-là.
+    """
+    autres = Participation.objects.filter(date__range=semaine(date)).exclude(cours=cours, date=date).order_by()
+    a_la_limite = autres.values('cavalier').annotate(n=Count('pk')).filter(n__gte=MAX_PAR_SEMAINE).values('cavalier')
+    cavaliers = Cavalier.objects.exclude(pk__in=a_la_limite).exclude(pk__in=_ailleurs(cours, date).values('cavalier'))
+    if cours.niveau_normalise == "concours":
+        cavaliers = cavaliers.exclude(pk__in=autres.filter(cours__niveau_normalise="débutant").values('cavalier'))
+    return cavaliers
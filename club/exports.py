@@ -0,0 +1,106 @@
+import csv
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Count, OuterRef, QuerySet, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
+
+from .calendrier import aujourd_hui, semaine
+from .models import Cheval, Participation
+
+# Lignes lues par paquets : la mémoire ne dépend pas de la taille de l'export
+TAILLE_PAQUET = 2000
+
+
+class _Echo:
+    """Pseudo-fichier pour csv.writer : write() renvoie la ligne au lieu de l'écrire."""
+
+    def write(self, valeur):
+        return valeur
+
+
+def lignes_csv(entete, lignes):
+    """Texte CSV de ``lignes`` (un queryset est lu par paquets), une ligne à la fois."""
+    if isinstance(lignes, QuerySet):
+        lignes = lignes.iterator(chunk_size=TAILLE_PAQUET)
+    ecrivain = csv.writer(_Echo())
+    yield ecrivain.writerow(entete)
+    for ligne in lignes:
+        yield ecrivain.writerow(ligne)
+
+
+async def alignes_csv(entete, lignes):
+    """
+    Comme ``lignes_csv``, en itérateur asynchrone : chaque paquet est lu dans
+    un thread (``sync_to_async``), comme le fait ``aiterator()`` — qui lance
+    la requête d'un values_list() dans la boucle d'événements et échoue.
+    """
+    curseur = lignes.iterator(chunk_size=TAILLE_PAQUET)  # générateur : rien n'est lu ici
+    paquet_suivant = sync_to_async(lambda: list(islice(curseur, TAILLE_PAQUET)))
+    ecrivain = csv.writer(_Echo())
+    yield ecrivain.writerow(entete)
+    while paquet := await paquet_suivant():
+        for ligne in paquet:
+            yield ecrivain.writerow(ligne)
+
+
+# === EXPORTS ===
+# Chaque export renvoie (en-tête, queryset). Les lignes sont des tuples lus
+# avec values_list() (colonnes des cours, cavaliers et chevaux jointes dans
+# la même requête, aucun objet modèle), par paquets de TAILLE_PAQUET : rien
+# n'est gardé en mémoire d'un paquet à l'autre.
+
+def participations(queryset=None):
+    """Participations avec leur cours, cavalier et cheval, dans l'ordre de l'index (date, cheval)."""
+    queryset = Participation.objects.all() if queryset is None else queryset
+    colonnes = ('date', 'cours__jour', 'cours__heure_debut', 'cours__heure_fin', 'cours__niveau',
+                'cavalier__prenom', 'cavalier__nom', 'cavalier__email', 'cheval__nom')
+    entete = ["date", "jour", "debut", "fin", "niveau", "prenom", "nom", "email", "cheval"]
+    return entete, queryset.order_by('date', 'cheval').values_list(*colonnes)
+
+
+def plannings(queryset=None):
+    """Planning de chaque cavalier (une ligne par séance), dans l'ordre de l'index (cavalier, date)."""
+    queryset = Participation.objects.all() if queryset is None else queryset
+    colonnes = ('cavalier__email', 'cavalier__prenom', 'cavalier__nom', 'date', 'cours__jour',
+                'cours__heure_debut', 'cours__niveau', 'cheval__nom', 'cours__entraineur__prenom',
+                'cours__entraineur__nom')
+    entete = ["email", "prenom", "nom", "date", "jour", "debut", "niveau", "cheval",
+              "moniteur_prenom", "moniteur_nom"]
+    return entete, queryset.order_by('cavalier', 'date').values_list(*colonnes)
+
+
+def charge_chevaux(queryset=None, debut=None, fin=None):
+    """Charge de travail de chaque cheval : séances entre ``debut`` et ``fin`` (la semaine en cours par défaut)."""
+    queryset = Cheval.objects.all() if queryset is None else queryset
+    if debut is None and fin is None:
+        debut, fin = semaine()
+    periode = Participation.objects.filter(cheval=OuterRef('pk'))
+    if debut:
+        periode = periode.filter(date__gte=debut)
+    if fin:
+        periode = periode.filter(date__lte=fin)
+    # Sous-requête par cheval sur l'index (cheval, date) : seule la période est lue
+    seances = Coalesce(Subquery(
+        periode.order_by().values('cheval').annotate(n=Count('pk')).values('n')
+    ), Value(0))
+    entete = ["nom", "race", "age", "disponible", "seances_a_venir", "seances_periode"]
+    return entete, queryset.annotate(periode=seances).order_by('nom', 'pk') \
+        .values_list('nom', 'race', 'age', 'disponible', 'seances_travail', 'periode')
+
+
+def reponse_csv(request, nom, export):
+    """
+    StreamingHttpResponse d'un export : le CSV part au fil de la lecture.
+
+    Sous ASGI, Django lit un itérateur synchrone d'un bloc (``sync_to_async(list)``)
+    avant d'envoyer quoi que ce soit : il reçoit donc un itérateur asynchrone,
+    et WSGI un itérateur synchrone.
+    """
+    entete, lignes = export
+    contenu = alignes_csv(entete, lignes) if isinstance(request, ASGIRequest) else lignes_csv(entete, lignes)
+    reponse = StreamingHttpResponse(contenu, content_type="text/csv; charset=utf-8")
+    reponse.headers['Content-Disposition'] = f'attachment; filename="{nom}-{aujourd_hui():%Y-%m-%d}.csv"'
+    return reponse
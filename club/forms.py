@@ -1,5 +1,5 @@
 from django import forms
-from .models import Cours, Moniteur
+from .models import Cours
 
 class CoursForm(forms.ModelForm):
     class Meta:
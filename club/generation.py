@@ -0,0 +1,128 @@
+import random
+from datetime import time as heure, timedelta
+
+from django.db import transaction
+
+from .calendrier import semaine
+from .inscriptions import PLACES_PAR_COURS
+from .models import Cavalier, Cheval, Cours, Inscription, Moniteur, Participation, Seance
+from .planning import appliquer, planifier_semaine
+
+PRENOMS = [
+    "Camille", "Léa", "Manon", "Chloé", "Emma", "Inès", "Jade", "Louise", "Alice", "Lina",
+    "Lucas", "Hugo", "Louis", "Jules", "Arthur", "Nathan", "Tom", "Léo", "Paul", "Adam",
+]
+NOMS = [
+    "Martin", "Bernard", "Dubois", "Thomas", "Robert", "Richard", "Petit", "Durand", "Leroy", "Moreau",
+    "Simon", "Laurent", "Lefebvre", "Michel", "Garcia", "David", "Bertrand", "Roux", "Vincent", "Fournier",
+]
+NOMS_CHEVAUX = [
+    "Tornade", "Éclair", "Caramel", "Hermès", "Quartz", "Ulysse", "Vanille", "Bijou", "Fripouille", "Orage",
+    "Saphir", "Tempête", "Iris", "Java", "Kiwi", "Nuage", "Pistache", "Réglisse", "Sirocco", "Zéphyr",
+]
+RACES = ["Selle Français", "Pur-sang", "Connemara", "Pottok", "Lusitanien", "Haflinger", "Trotteur", "Appaloosa"]
+SPECIALITES = ["CSO", "Dressage", "Cross", "Voltige", "Horse-ball"]
+# (niveau, poids) : la plupart des cours sont des galops intermédiaires
+NIVEAUX = [("Débutant", 4), ("Galop 1", 3), ("Galop 2", 3), ("Galop 3", 3), ("Galop 4", 2),
+           ("Galop 5", 2), ("Galop 6", 1), ("Galop 7", 1), ("Concours", 2)]
+
+
+def _nom(alea, noms, i):
+    # Le numéro garde les noms distincts quelle que soit la taille du club
+    return f"{alea.choice(noms)} {i}"
+
+
+def generer_club(cavaliers=10000, chevaux=500, cours=300, moniteurs=20, seed=0, marque="club", semaines=4):
+    """
+    Crée un club fictif reproductible (même ``seed``, même club).
+
+    Chaque cours reçoit autour de ``PLACES_PAR_COURS`` inscriptions, sans
+    dépasser 4 cours par cavalier ; les chevaux sont ensuite affectés par
+    ``planifier_semaine``, qui respecte toutes les règles du club. Quelques
+    cavaliers sont aussi moniteurs, pour les jeunes chevaux. Les séances des
+    ``semaines`` à venir sont créées, les participations vont aux prochaines.
+    ``marque`` préfixe les emails, qui doivent rester uniques. Renvoie le
+    nombre de lignes créées par modèle.
+    """
+    alea = random.Random(seed)
+    with transaction.atomic():
+        equipe = Moniteur.objects.bulk_create(
+            Moniteur(nom=alea.choice(NOMS), prenom=_nom(alea, PRENOMS, i),
+                     email=f"{marque}-moniteur-{seed}-{i}@club.example", specialite=alea.choice(SPECIALITES))
+            for i in range(moniteurs)
+        )
+        niveaux, poids = zip(*NIVEAUX)
+        creneaux = []
+        for i in range(cours):
+            niveau = alea.choices(niveaux, poids)[0]
+            debut = 8 + alea.randrange(12)
+            # bulk_create n'appelle pas Cours.save() : niveau_normalise est rempli ici
+            creneaux.append(Cours(
+                niveau=niveau, niveau_normalise=niveau.lower(), jour=Cours.JOUR_CHOICES[i % 6][0],
+                heure_debut=heure(debut), heure_fin=heure(debut + 1),
+                entraineur=alea.choice(equipe) if equipe else None,
+            ))
+        creneaux = Cours.objects.bulk_create(creneaux)
+        seances = Seance.objects.generer(semaines, cours=Cours.objects.filter(pk__in=[co.pk for co in creneaux]))
+        Cheval.objects.bulk_create(
+            Cheval(nom=_nom(alea, NOMS_CHEVAUX, i), race=alea.choice(RACES), age=alea.randint(3, 24))
+            for i in range(chevaux)
+        )
+        club = Cavalier.objects.bulk_create(
+            [Cavalier(nom=m.nom, prenom=m.prenom, age=alea.randint(20, 60),
+                      email=f"{marque}-{seed}-{i}@club.example")
+             for i, m in enumerate(equipe[:cavaliers])]
+            + [Cavalier(nom=alea.choice(NOMS), prenom=_nom(alea, PRENOMS, i), age=alea.randint(7, 70),
+                        email=f"{marque}-{seed}-{i}@club.example")
+               for i in range(len(equipe), cavaliers)]
+        )
+
+        inscriptions = []
+        cours_par_cavalier = {}
+        for co in creneaux:
+            for cavalier in alea.sample(club, min(len(club), alea.randint(PLACES_PAR_COURS - 2, PLACES_PAR_COURS + 1))):
+                if cours_par_cavalier.get(cavalier.pk, 0) < 4:
+                    cours_par_cavalier[cavalier.pk] = cours_par_cavalier.get(cavalier.pk, 0) + 1
+                    inscriptions.append(Inscription(cavalier=cavalier, cours=co))
+        Inscription.objects.bulk_create(inscriptions)
+
+        participations = appliquer(planifier_semaine(cours=Cours.objects.filter(pk__in=[co.pk for co in creneaux])))
+
+    return {
+        "moniteurs": len(equipe),
+        "cours": len(creneaux),
+        "seances": seances,
+        "chevaux": chevaux,
+        "cavaliers": len(club),
+        "inscriptions": len(inscriptions),
+        "participations": len(participations),
+    }
+
+
+def generer_historique(participations, avant=None, seed=0):
+    """
+    Ajoute ``participations`` participations passées aux cours existants,
+    semaine après semaine en remontant depuis ``avant`` (le lundi de la
+    semaine en cours par défaut) : ``PLACES_PAR_COURS`` cavaliers et autant
+    de chevaux distincts par séance. Renvoie le lundi de la plus ancienne
+    semaine remplie, à repasser en ``avant`` pour continuer l'historique.
+    """
+    alea = random.Random(seed)
+    cavaliers = list(Cavalier.objects.values_list('pk', flat=True))
+    chevaux = list(Cheval.objects.filter(age__gte=6).values_list('pk', flat=True))
+    places = min(PLACES_PAR_COURS, len(cavaliers), len(chevaux))
+    lundi = avant or semaine()[0]
+    if not places or not Cours.objects.exists():
+        return lundi
+    while participations > 0:
+        lundi -= timedelta(weeks=1)
+        with transaction.atomic():
+            Seance.objects.generer(1, depuis=lundi)
+            lot = [
+                Participation(seance=seance, cavalier_id=cavalier, cheval_id=cheval)
+                for seance in Seance.objects.filter(date__range=(lundi, lundi + timedelta(days=6)))
+                for cavalier, cheval in zip(alea.sample(cavaliers, places), alea.sample(chevaux, places))
+            ][:participations]
+            Participation.objects.bulk_create(lot, batch_size=2000)
+        participations -= len(lot)
+    return lundi
@@ -0,0 +1,194 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.models import F, QuerySet
+from django.db.models.signals import post_delete
+from django.utils import timezone
+
+from .allocation import choisir_cheval
+from .cache import invalider
+from .calendrier import aujourd_hui, prochaine_date
+from .contraintes import MAX_PAR_SEMAINE, validate_many
+from .mails import annoncer
+from .models import Attente, Avis, Participation, Seance
+
+# Nombre maximum de cavaliers par cours
+PLACES_PAR_COURS = 5
+
+
+def _verrouiller(*objets):
+    """
+    Verrouille les lignes données jusqu'à la fin de la transaction.
+
+    Les verrous sont toujours pris dans l'ordre cavalier → cours → cheval pour
+    éviter les interblocages. SQLite ne connaît pas SELECT ... FOR UPDATE :
+    une écriture à vide suffit à prendre le verrou d'écriture de la base,
+    ce qui sérialise les inscriptions concurrentes.
+    """
+    if connection.features.has_select_for_update:
+        for obj in objets:
+            list(type(obj).objects.select_for_update().filter(pk=obj.pk).values_list('pk'))
+    else:
+        obj = objets[0]
+        type(obj).objects.filter(pk=obj.pk).update(id=F('id'))
+
+
+def inscrire(cavalier, cours, cheval=None, max_cours=None, date=None):
+    """
+    Inscrit ``cavalier`` à la séance de ``cours`` du ``date`` (par défaut la
+    prochaine) en une seule transaction ; ``max_cours`` compte les cours de
+    la même semaine.
+
+    Les vérifications (capacité du cours, limites du cheval et du cavalier,
+    règles de ``Participation.clean``) et l'insertion se font sous verrou :
+    deux inscriptions simultanées ne peuvent pas dépasser une limite.
+    Si ``cheval`` est omis, il est choisi par ``allocation.choisir_cheval``. Lève une
+    ``ValidationError`` dont le ``code`` indique le motif du refus.
+    """
+    with transaction.atomic():
+        _verrouiller(cavalier, cours)
+        date = date or prochaine_date(cours.jour)
+        seance = Seance.objects.obtenir([(cours.pk, date)])[(cours.pk, date)]
+        return _inscrire(cavalier, cours, seance, cheval, max_cours)
+
+
+def _inscrire(cavalier, cours, seance, cheval=None, max_cours=None):
+    """Vérifications et insertion d'``inscrire``, cavalier et cours déjà verrouillés."""
+    if Participation.objects.filter(cavalier=cavalier, seance=seance).exists():
+        raise ValidationError("Tu es déjà inscrit à ce cours.", code='deja_inscrit')
+
+    if max_cours is not None and cavalier.nb_cours(seance.date) >= max_cours:
+        raise ValidationError(f"Tu es déjà inscrit à {max_cours} cours cette semaine.", code='limite')
+
+    seance.refresh_from_db(fields=['participants'])
+    if seance.participants >= PLACES_PAR_COURS:
+        raise ValidationError("Ce cours est déjà complet.", code='complet')
+
+    if cheval is None:
+        cheval = choisir_cheval(cours, cavalier, date=seance.date)
+        if cheval is None:
+            raise ValidationError("Aucun cheval disponible.", code='aucun_cheval')
+    _verrouiller(cheval)
+
+    participation = Participation(seance=seance, cours=cours, cavalier=cavalier, cheval=cheval)
+    erreur = validate_many([participation])[0]
+    if erreur:
+        raise erreur
+    # Les compteurs de la séance et de la semaine ne montent que sous leur limite :
+    # dernier rempart si une écriture est passée hors de ces verrous
+    participation.save(places=PLACES_PAR_COURS, max_cours=min(max_cours or MAX_PAR_SEMAINE, MAX_PAR_SEMAINE))
+    annoncer(Avis.INSCRIPTION, participation)
+    return participation
+
+
+# === LISTE D'ATTENTE ===
+def inscrire_ou_attendre(cavalier, cours, cheval=None, max_cours=None, date=None):
+    """
+    Comme ``inscrire``, mais une séance complète place le cavalier dans sa
+    file d'attente au lieu de le refuser. Renvoie ``(participation, None)``
+    ou ``(None, attente)`` ; les autres refus lèvent toujours une ``ValidationError``.
+
+    Le cours reste verrouillé entre le constat « complet » et l'entrée dans
+    la file : une place libérée entre-temps attend la fin de la transaction,
+    puis sa promotion trouve la demande.
+    """
+    with transaction.atomic():
+        _verrouiller(cavalier, cours)
+        date = date or prochaine_date(cours.jour)
+        seance = Seance.objects.obtenir([(cours.pk, date)])[(cours.pk, date)]
+        try:
+            with transaction.atomic():
+                return _inscrire(cavalier, cours, seance, cheval, max_cours), None
+        except ValidationError as e:
+            if e.code != 'complet':
+                raise
+        attente = Attente.objects.en_attente().filter(cavalier=cavalier, seance=seance).first()
+        if attente is None:
+            attente = Attente.objects.create(seance=seance, cavalier=cavalier, cheval=cheval)
+    return None, attente
+
+
+def _file(seance):
+    return list(Attente.objects.en_attente().filter(seance=seance).select_related('cavalier', 'cheval'))
+
+
+def promouvoir(seance):
+    """
+    Donne les places libres de ``seance`` aux demandes de sa file, dans
+    l'ordre d'arrivée, en une transaction ; renvoie les participations créées.
+
+    Chaque demande est revérifiée comme une inscription (cheval, limites du
+    cavalier et de la semaine) : celle qui ne passe plus reste dans la file
+    et la suivante est essayée. Une demande n'est prise que par un UPDATE
+    conditionnel (``promue_le`` encore vide) : deux annulations simultanées
+    ne peuvent pas promouvoir deux fois la même.
+    """
+    cours = seance.cours
+    promues = []
+    with transaction.atomic():
+        file = _file(seance)
+        if not file:
+            return promues
+        # Même ordre de verrous qu'``inscrire`` : cavaliers, puis cours. La file
+        # est relue sous le verrou du cours, qui sérialise les entrées dans la file
+        _verrouiller(*sorted({a.cavalier for a in file}, key=lambda c: c.pk), cours)
+        file = _file(seance)
+        for attente in file:
+            seance.refresh_from_db(fields=['participants'])
+            if seance.participants >= PLACES_PAR_COURS:
+                break
+            try:
+                with transaction.atomic():
+                    if not Attente.objects.filter(pk=attente.pk, promue_le__isnull=True) \
+                            .update(promue_le=timezone.now()):
+                        continue
+                    try:
+                        participation = _inscrire(attente.cavalier, cours, seance, attente.cheval)
+                    except ValidationError:
+                        if attente.cheval is None:
+                            raise
+                        # Le cheval souhaité n'est plus libre : un autre, s'il y en a
+                        participation = _inscrire(attente.cavalier, cours, seance)
+                    promues.append(participation)
+            except ValidationError as e:
+                if e.code == 'deja_inscrit':
+                    attente.delete()
+        if promues:
+            # Prises par UPDATE, sans signal : les positions de toute la file ont changé
+            invalider([a.cavalier_id for a in file])
+    return promues
+
+
+_reecriture = ContextVar('reecriture_des_participations', default=False)
+
+
+@contextmanager
+def reecriture():
+    """
+    Suppressions de participations aussitôt recréées (replanification) : ce
+    ne sont pas des désinscriptions, aucune place n'est donnée à la file.
+    """
+    jeton = _reecriture.set(True)
+    try:
+        yield
+    finally:
+        _reecriture.reset(jeton)
+
+
+def _place_liberee(sender, instance, origin=None, **kwargs):
+    # Seule une désinscription (participation supprimée seule ou par un
+    # QuerySet de participations) libère une place à donner : pas la
+    # suppression en cascade d'un cours, d'une séance ou d'un cavalier, ni
+    # une réécriture du planning
+    desinscription = isinstance(origin, Participation) or \
+        (isinstance(origin, QuerySet) and origin.model is Participation)
+    if desinscription and not _reecriture.get() and instance.date >= aujourd_hui():
+        annoncer(Avis.ANNULATION, instance)
+        promouvoir(Seance.objects.select_related('cours').get(pk=instance.seance_id))
+
+
+def brancher():
+    """Promotion de la liste d'attente à chaque désinscription ; appelé par ``ClubConfig.ready``."""
+    post_delete.connect(_place_liberee, sender=Participation)
@@ -0,0 +1,174 @@
+import logging
+import smtplib
+from datetime import date, timedelta
+from itertools import groupby
+from operator import attrgetter, itemgetter
+
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Prefetch
+from django.template.loader import get_template
+
+from .calendrier import aujourd_hui, semaine
+from .models import Avis, Participation, Seance
+from .taches import mettre_en_file, tache
+
+# Les mails ne partent jamais de la requête : ils sont mis en file (voir
+# club.taches) et envoyés par lots, chaque lot sur une seule connexion au
+# serveur. La tâche d'un cavalier est dédoublonnée : tous les changements
+# notés avant son passage tiennent dans un seul mail. En tâches synchrones
+# (tests, développement), ils partent après le commit ; un envoi en échec
+# est journalisé et ses avis restent en base pour l'envoi suivant.
+
+logger = logging.getLogger('club.taches.mails')
+
+
+def envoyer(messages):
+    """Envoie ``messages`` sur une seule connexion, ouverte une fois pour tout le lot ; renvoie le nombre envoyé."""
+    if not messages:
+        return 0
+    with get_connection() as connexion:
+        return connexion.send_messages(messages)
+
+
+def _message(destinataire, sujet, gabarit, contexte):
+    return EmailMessage(sujet, gabarit.render(contexte), to=[destinataire])
+
+
+# === CONFIRMATIONS ET ANNULATIONS ===
+def annoncer(nature, participation):
+    """
+    Note le changement de ``participation`` (``Avis.INSCRIPTION`` ou
+    ``Avis.ANNULATION``) dans la transaction en cours et met le mail de son
+    cavalier en file.
+    """
+    Avis.objects.create(cavalier_id=participation.cavalier_id, nature=nature,
+                        seance_id=participation.seance_id, cheval_id=participation.cheval_id)
+    mettre_en_file('avis', {participation.cavalier_id: {'cavalier': participation.cavalier_id}})
+
+
+def _a_annoncer(avis):
+    """
+    Dernier avis de chaque séance à venir, dans l'ordre des séances. Une séance
+    revenue à son état de départ (inscription puis annulation) n'est pas
+    annoncée, ni une séance passée (avis resté d'un envoi en échec).
+    """
+    premiers, derniers = {}, {}
+    for a in avis:
+        if a.seance.date < aujourd_hui():
+            continue
+        premiers.setdefault(a.seance_id, a)
+        derniers[a.seance_id] = a
+    retenus = [a for seance_id, a in derniers.items()
+               if not (premiers[seance_id].nature == Avis.INSCRIPTION and a.nature == Avis.ANNULATION)]
+    return sorted(retenus, key=lambda a: (a.seance.date, a.seance.cours.heure_debut))
+
+
+def _sujet(avis):
+    if len(avis) > 1:
+        return f"Ton planning au club : {len(avis)} changements"
+    a = avis[0]
+    quoi = "Inscription confirmée" if a.nature == Avis.INSCRIPTION else "Désinscription"
+    return f"{quoi} : {a.seance.cours.niveau} le {a.seance.date:%d/%m}"
+
+
+def envoyer_avis(arguments):
+    """
+    Un mail par cavalier du lot pour tous ses avis en attente, sur une seule
+    connexion. Les avis d'un cavalier sont supprimés dès que son mail est
+    parti : après un échec, le nouvel essai n'écrit qu'aux cavaliers pas
+    encore servis. Une adresse refusée par le serveur ne bloque pas le lot :
+    ses avis sont abandonnés et journalisés.
+    """
+    avis = list(Avis.objects.filter(cavalier_id__in={a['cavalier'] for a in arguments})
+                .select_related('cavalier', 'seance__cours', 'cheval').order_by('cavalier_id', 'pk'))
+    gabarit = get_template("club/mails/avis.txt")
+    a_envoyer, sans_mail = [], []
+    for _, siens in groupby(avis, key=attrgetter('cavalier_id')):
+        siens = list(siens)
+        a_annoncer = _a_annoncer(siens)
+        if a_annoncer:
+            cavalier = siens[0].cavalier
+            a_envoyer.append((siens, _message(cavalier.email, _sujet(a_annoncer), gabarit,
+                                              {'cavalier': cavalier, 'avis': a_annoncer})))
+        else:
+            sans_mail += siens
+    Avis.objects.filter(pk__in=[a.pk for a in sans_mail]).delete()
+    if not a_envoyer:
+        return
+
+    echecs = []
+    with get_connection() as connexion:
+        for siens, message in a_envoyer:
+            try:
+                connexion.send_messages([message])
+            except smtplib.SMTPRecipientsRefused:
+                logger.warning("Adresse refusée, %d avis abandonnés : %s", len(siens), message.to[0])
+            except (smtplib.SMTPException, OSError):
+                echecs.append(message.to[0])
+                continue
+            Avis.objects.filter(pk__in=[a.pk for a in siens]).delete()
+    if echecs:
+        raise RuntimeError(f"{len(echecs)} mail(s) d'avis non envoyés : {', '.join(echecs)}")
+
+
+# === PROGRAMME DE LA SEMAINE ===
+def annoncer_programmes(jour=None):
+    """
+    Met en file le programme de la semaine de ``jour`` (la semaine prochaine
+    par défaut) de chaque cavalier inscrit et de chaque moniteur qui y donne
+    cours. Renvoie le nombre de mails mis en file.
+    """
+    debut, fin = semaine(jour or aujourd_hui() + timedelta(weeks=1))
+    cavaliers = Participation.objects.filter(date__range=(debut, fin)).order_by() \
+        .values_list('cavalier_id', flat=True).distinct()
+    moniteurs = Seance.objects.filter(date__range=(debut, fin), cours__entraineur__isnull=False).order_by() \
+        .values_list('cours__entraineur_id', flat=True).distinct()
+    taches = {f"{debut}:cavalier:{pk}": {'cavalier': pk, 'lundi': debut.isoformat()} for pk in cavaliers}
+    taches.update({f"{debut}:moniteur:{pk}": {'moniteur': pk, 'lundi': debut.isoformat()} for pk in moniteurs})
+    mettre_en_file('programmes', taches)
+    return len(taches)
+
+
+def _programmes_cavaliers(ids, jours):
+    participations = Participation.objects.filter(cavalier_id__in=ids, date__range=jours) \
+        .select_related('cavalier', 'cours__entraineur', 'cheval').order_by('cavalier_id', 'date', 'cours__heure_debut')
+    gabarit = get_template("club/mails/programme_cavalier.txt")
+    messages = []
+    for _, siennes in groupby(participations, key=attrgetter('cavalier_id')):
+        siennes = list(siennes)
+        cavalier = siennes[0].cavalier
+        messages.append(_message(cavalier.email, f"Tes cours de la semaine du {jours[0]:%d/%m}", gabarit,
+                                 {'cavalier': cavalier, 'participations': siennes}))
+    return messages
+
+
+def _programmes_moniteurs(ids, jours):
+    inscrits = Participation.objects.select_related('cavalier', 'cheval').order_by('cavalier__nom', 'cavalier__prenom')
+    seances = Seance.objects.filter(cours__entraineur_id__in=ids, date__range=jours) \
+        .select_related('cours__entraineur').prefetch_related(Prefetch('participations', queryset=inscrits)) \
+        .order_by('cours__entraineur_id', 'date', 'cours__heure_debut')
+    gabarit = get_template("club/mails/programme_moniteur.txt")
+    messages = []
+    for _, siennes in groupby(seances, key=attrgetter('cours.entraineur_id')):
+        siennes = list(siennes)
+        moniteur = siennes[0].cours.entraineur
+        messages.append(_message(moniteur.email, f"Tes cours de la semaine du {jours[0]:%d/%m}", gabarit,
+                                 {'moniteur': moniteur, 'seances': siennes}))
+    return messages
+
+
+def envoyer_programmes(arguments):
+    """Programme de chaque cavalier et moniteur du lot : trois requêtes par semaine, une connexion."""
+    messages = []
+    for lundi, lot in groupby(sorted(arguments, key=itemgetter('lundi')), key=itemgetter('lundi')):
+        lot = list(lot)
+        jours = semaine(date.fromisoformat(lundi))
+        messages += _programmes_cavaliers({a['cavalier'] for a in lot if 'cavalier' in a}, jours)
+        messages += _programmes_moniteurs({a['moniteur'] for a in lot if 'moniteur' in a}, jours)
+    envoyer(messages)
+
+
+def brancher():
+    """Tâches d'envoi des mails ; appelé par ``ClubConfig.ready``."""
+    tache('avis', envoyer_avis)
+    tache('programmes', envoyer_programmes)
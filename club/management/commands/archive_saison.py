@@ -0,0 +1,56 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from club.archivage import archiver
+from club.calendrier import debut_saison, semaine
+from club.models import Inscription, Participation
+
+
+class Command(BaseCommand):
+    help = (
+        "Déplace les participations des semaines terminées et les inscriptions des saisons "
+        "terminées vers les archives, par lots transactionnels (relançable, utilisable site "
+        "ouvert) ; les bilans par cavalier et par cheval sont cumulés au passage"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--avant', type=date.fromisoformat, metavar='AAAA-MM-JJ',
+            help="Archive ce qui précède cette date (par défaut le lundi de la semaine en cours)",
+        )
+        parser.add_argument('--lot', type=int, default=1000, help='Lignes déplacées par transaction')
+        parser.add_argument('--pause', type=float, default=0.0, help='Secondes de pause entre deux lots')
+        parser.add_argument('--dry-run', action='store_true', help='Compte les lignes à archiver sans rien déplacer')
+
+    def handle(self, *args, **options):
+        avant = options['avant'] or semaine()[0]
+        if options['lot'] < 1:
+            raise CommandError("--lot doit valoir au moins 1.")
+
+        if options['dry_run']:
+            self.stdout.write(
+                f"[dry-run] {Participation.objects.filter(date__lt=avant).count()} participations et "
+                f"{Inscription.objects.filter(date_inscription__lt=debut_saison(avant)).count()} inscriptions "
+                f"(saisons terminées) antérieures au {avant:%d/%m/%Y} à archiver."
+            )
+            return
+
+        avancement = None
+        try:
+            for avancement in archiver(avant, taille=options['lot'], pause=options['pause']):
+                if options['verbosity'] >= 2 or avancement.lots % 50 == 0:
+                    self.stdout.write(
+                        f"lot {avancement.lots} : {avancement.participations} participations, "
+                        f"{avancement.inscriptions} inscriptions ({avancement.duree:.1f} s)"
+                    )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if avancement is None:
+            self.stdout.write(self.style.SUCCESS(f"Rien à archiver avant le {avant:%d/%m/%Y}."))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"{avancement.participations} participations et {avancement.inscriptions} inscriptions "
+            f"archivées en {avancement.lots} lots ({avancement.duree:.1f} s)."
+        ))
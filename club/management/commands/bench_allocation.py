@@ -0,0 +1,69 @@
+import random
+import statistics
+import time
+from datetime import time as heure
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from club.allocation import choisir_cheval
+from club.models import Cavalier, Cheval, Cours, Participation
+
+class Command(BaseCommand):
+    help = (
+        "Mesure le choix d'un cheval sur un club fictif de grande taille "
+        "(les données sont créées dans une transaction annulée à la fin)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chevaux', type=int, default=3000)
+        parser.add_argument('--participations', type=int, default=20000)
+        parser.add_argument('--essais', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        alea = random.Random(options['seed'])
+        with transaction.atomic():
+            cours = [
+                Cours.objects.create(
+                    niveau=alea.choice(["Débutant", "Galop 3", "Concours"]),
+                    jour=Cours.JOUR_CHOICES[i % 6][0],
+                    heure_debut=heure(8 + i % 10), heure_fin=heure(9 + i % 10),
+                )
+                for i in range(60)
+            ]
+            chevaux = Cheval.objects.bulk_create(
+                Cheval(nom=f"bench-{i}", race="bench", age=alea.randint(3, 20),
+                       seances_travail=alea.randint(0, 8))
+                for i in range(options['chevaux'])
+            )
+            cavalier = Cavalier.objects.create(nom="bench", prenom="bench", age=30, email="bench@example.com")
+            # Couples (cours, cheval) distincts, un cavalier chacun (contraintes d'unicité)
+            couples = set()
+            while len(couples) < min(options['participations'], len(cours) * len(chevaux)):
+                couples.add((alea.choice(cours), alea.choice(chevaux)))
+            montes = Cavalier.objects.bulk_create(
+                Cavalier(nom="bench", prenom=str(i), age=30, email=f"bench-{i}@example.com")
+                for i in range(len(couples))
+            )
+            Participation.objects.bulk_create(
+                Participation(cours=co, cavalier=c, cheval=h) for (co, h), c in zip(couples, montes)
+            )
+
+            mesures = {"ancien (.first())": lambda c: Cheval.objects.filter(disponible=True).first(),
+                       "allocation.choisir_cheval": lambda c: choisir_cheval(c, cavalier)}
+            for nom, choisir in mesures.items():
+                durees = []
+                with CaptureQueriesContext(connection) as requetes:
+                    for _ in range(options['essais']):
+                        c = alea.choice(cours)
+                        debut = time.perf_counter()
+                        choisir(c)
+                        durees.append((time.perf_counter() - debut) * 1000)
+                centiles = statistics.quantiles(durees, n=100)
+                self.stdout.write(
+                    f"{nom:28} médiane {centiles[49]:.2f} ms  p95 {centiles[94]:.2f} ms  "
+                    f"{len(requetes) / options['essais']:.1f} requête(s)/choix"
+                )
+            transaction.set_rollback(True)
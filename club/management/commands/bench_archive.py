@@ -0,0 +1,90 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+
+from club.allocation import choisir_cheval
+from club.archivage import archiver
+from club.calendrier import sept_jours
+from club.contraintes import validate_many
+from club.generation import generer_club, generer_historique
+from club.models import Cavalier, Cheval, Cours, Participation, participants_du_cours
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure les chemins chauds (règles d'inscription, choix du cheval, places des cours, "
+        "planning) à mesure que l'historique grandit, sans archivage puis après archive_saison. "
+        "Les données sont créées dans une transaction annulée à la fin."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--volumes', default="0,20000,100000",
+                            help="Participations passées ajoutées à chaque palier (cumulées)")
+        parser.add_argument('--cavaliers', type=int, default=2000)
+        parser.add_argument('--chevaux', type=int, default=150)
+        parser.add_argument('--cours', type=int, default=60)
+        parser.add_argument('--repetitions', type=int, default=30)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        try:
+            paliers = sorted({int(v) for v in options['volumes'].split(',')})
+        except ValueError:
+            raise CommandError("--volumes attend des entiers séparés par des virgules.")
+        self.alea = random.Random(options['seed'])
+        self.repetitions = options['repetitions']
+
+        cache_prive = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bench_archive'}}
+        with override_settings(CACHES=cache_prive), transaction.atomic():
+            generer_club(cavaliers=options['cavaliers'], chevaux=options['chevaux'], cours=options['cours'],
+                         seed=options['seed'], marque="bench-archive", semaines=1)
+            self.cours = list(Cours.objects.all())
+            self.cavaliers = list(Cavalier.objects.all())
+            self.chevaux = list(Cheval.objects.filter(age__gte=6))
+            plus_ancien = None
+
+            self.stdout.write(f"{'historique':>10}  {'chemin':22} {'sans archivage':>15} {'archivé':>9}")
+            ajoutees = 0
+            for volume in paliers:
+                plus_ancien = generer_historique(volume - ajoutees, avant=plus_ancien, seed=options['seed'])
+                ajoutees = volume
+                chaud = self._mesurer()
+                # Archivage dans un point de sauvegarde annulé : le palier suivant
+                # repart de tout l'historique dans la table chaude
+                with transaction.atomic():
+                    debut = time.perf_counter()
+                    for _ in archiver(taille=2000):
+                        pass
+                    duree = time.perf_counter() - debut
+                    archive = self._mesurer()
+                    transaction.set_rollback(True)
+                for nom in chaud:
+                    self.stdout.write(f"{volume:10}  {nom:22} {chaud[nom]:13.2f}ms {archive[nom]:7.2f}ms")
+                if volume:
+                    self.stdout.write(f"{'':12}archive_saison : {volume} lignes en {duree:.2f} s ({volume / duree:.0f}/s)")
+            transaction.set_rollback(True)
+
+    def _mesurer(self):
+        jours = sept_jours()
+        chemins = {
+            "Participation.clean": lambda: validate_many([Participation(
+                cours=self.alea.choice(self.cours), cavalier=self.alea.choice(self.cavaliers),
+                cheval=self.alea.choice(self.chevaux))]),
+            "choisir_cheval": lambda: choisir_cheval(self.alea.choice(self.cours), self.alea.choice(self.cavaliers)),
+            "places des cours": lambda: list(Cours.objects.annotate(nb=participants_du_cours(jours)).filter(nb__lt=5)),
+            "planning du cavalier": lambda: list(Participation.objects.filter(
+                cavalier=self.alea.choice(self.cavaliers), date__gte=jours[0])),
+        }
+        resultats = {}
+        for nom, chemin in chemins.items():
+            durees = []
+            for _ in range(self.repetitions):
+                debut = time.perf_counter()
+                chemin()
+                durees.append((time.perf_counter() - debut) * 1000)
+            resultats[nom] = statistics.median(durees)
+        return resultats
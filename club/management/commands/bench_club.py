@@ -0,0 +1,171 @@
+import json
+import random
+import statistics
+import subprocess
+import time
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from club.allocation import choisir_cheval
+from club.generation import generer_club
+from club.models import Cavalier, Cheval, Cours, Participation
+from club.urls import urlpatterns
+
+class Command(BaseCommand):
+    help = (
+        "Mesure les chemins principaux du club (Participation.clean/save, vues, "
+        "admin des cours) : centiles de latence et nombre de requêtes. Les "
+        "données sont créées dans une transaction annulée à la fin."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cavaliers', type=int, default=10000)
+        parser.add_argument('--chevaux', type=int, default=500)
+        parser.add_argument('--cours', type=int, default=300)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--existant', action='store_true',
+                            help="Mesure sur les données déjà en base (par exemple après seed_club)")
+        parser.add_argument('--repetitions', type=int, default=50)
+        parser.add_argument('--json', metavar='FICHIER',
+                            help="Écrit les résultats en JSON (« - » pour la sortie standard)")
+
+    def handle(self, *args, **options):
+        if options['repetitions'] < 2:
+            raise CommandError("--repetitions doit valoir au moins 2.")
+        self.alea = random.Random(options['seed'])
+        self.repetitions = options['repetitions']
+        self.resultats = {}
+
+        # Cache privé : les lectures faites sur des données annulées ne doivent pas survivre à la mesure
+        cache_prive = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bench_club'}}
+        with override_settings(CACHES=cache_prive), transaction.atomic():
+            if options['existant']:
+                club = {"cavaliers": Cavalier.objects.count(), "chevaux": Cheval.objects.count(),
+                        "cours": Cours.objects.count(), "participations": Participation.objects.count()}
+            else:
+                club = generer_club(cavaliers=options['cavaliers'], chevaux=options['chevaux'],
+                                    cours=options['cours'], seed=options['seed'], marque="bench")
+            if not club["participations"]:
+                raise CommandError("Aucune participation en base : lancez seed_club ou retirez --existant.")
+
+            self._modele()
+            self._vues()
+            self._admin()
+            transaction.set_rollback(True)
+
+        rapport = {
+            "commit": self._commit(),
+            "date": timezone.now().isoformat(timespec='seconds'),
+            "base": connection.vendor,
+            "repetitions": self.repetitions,
+            "club": club,
+            "mesures": self.resultats,
+        }
+        if options['json'] == '-':
+            self.stdout.write(json.dumps(rapport, indent=2, ensure_ascii=False))
+            return
+        for nom, m in self.resultats.items():
+            self.stdout.write(
+                f"{nom:28} p50 {m['p50_ms']:7.2f} ms  p95 {m['p95_ms']:7.2f} ms  "
+                f"p99 {m['p99_ms']:7.2f} ms  {m['requetes']:5.1f} requête(s)"
+            )
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as f:
+                json.dump(rapport, f, indent=2, ensure_ascii=False)
+            self.stdout.write(f"Résultats écrits dans {options['json']}")
+
+    # === MESURE ===
+    def _mesurer(self, nom, preparer, executer):
+        """Chronomètre ``executer(preparer())`` ; seule l'exécution est mesurée et comptée."""
+        durees, requetes = [], []
+        for _ in range(self.repetitions):
+            argument = preparer()
+            with CaptureQueriesContext(connection) as capture:
+                debut = time.perf_counter()
+                executer(argument)
+                durees.append((time.perf_counter() - debut) * 1000)
+            requetes.append(len(capture))
+        centiles = statistics.quantiles(durees, n=100, method='inclusive')
+        self.resultats[nom] = {
+            "p50_ms": round(centiles[49], 3),
+            "p95_ms": round(centiles[94], 3),
+            "p99_ms": round(centiles[98], 3),
+            "max_ms": round(max(durees), 3),
+            "requetes": statistics.mean(requetes),
+            "requetes_max": max(requetes),
+        }
+
+    # === MODÈLE ===
+    def _modele(self):
+        cours = list(Cours.objects.all())
+        cavaliers = list(Cavalier.objects.all())
+        chevaux = list(Cheval.objects.all())
+
+        def clean(p):
+            try:
+                p.clean()
+            except ValidationError:
+                pass
+
+        self._mesurer(
+            "Participation.clean",
+            lambda: Participation(cours=self.alea.choice(cours), cavalier=self.alea.choice(cavaliers),
+                                  cheval=self.alea.choice(chevaux)),
+            clean,
+        )
+
+        # Cavaliers sans cours : chaque enregistrement est une inscription valide
+        libres = list(Cavalier.objects.filter(participation__isnull=True)[:self.repetitions * 4])
+        self.alea.shuffle(libres)
+
+        def nouvelle_participation():
+            while libres:
+                cavalier, co = libres.pop(), self.alea.choice(cours)
+                cheval = choisir_cheval(co, cavalier)
+                if cheval is not None:
+                    return Participation(cours=co, cavalier=cavalier, cheval=cheval)
+            raise CommandError("Pas assez de cavaliers sans cours pour mesurer Participation.save.")
+
+        self._mesurer("Participation.save", nouvelle_participation, lambda p: p.save())
+
+    # === VUES ===
+    def _vues(self):
+        # Le cavalier connecté est celui qui a le plus de cours
+        cavalier = Cavalier.objects.annotate(n=Count('participation')).order_by('-n', 'pk').first()
+        if cavalier.user is None:
+            cavalier.user = User.objects.create_user(f"bench-{cavalier.pk}", cavalier.email)
+            cavalier.save(update_fields=['user'])
+        client = Client(HTTP_HOST='localhost')
+        client.force_login(cavalier.user)
+        for motif in urlpatterns:
+            url = reverse(motif.name)
+            self._mesurer(f"GET {motif.name}", lambda: None, lambda _: self._get(client, url))
+
+    def _admin(self):
+        admin = User.objects.create_superuser(f"bench-admin-{self.alea.random()}", "admin@club.example")
+        client = Client(HTTP_HOST='localhost')
+        client.force_login(admin)
+        cours = Cours.objects.annotate(n=Count('participations')).order_by('-n', 'pk').first()
+        url = reverse('admin:club_cours_change', args=[cours.pk])
+        self._mesurer("GET admin cours (change)", lambda: None, lambda _: self._get(client, url))
+
+    def _get(self, client, url):
+        reponse = client.get(url)
+        if reponse.status_code != 200:
+            raise CommandError(f"{url} : statut HTTP {reponse.status_code}")
+
+    def _commit(self):
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,123 @@
+import random
+import statistics
+import time
+from datetime import time as heure
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+
+from club.calendrier import prochaine_date
+from club.contraintes import validate_many
+from club.creneaux import chevauchent, conflits, rapport
+from club.models import Cavalier, Cheval, Cours, Moniteur, Participation, Seance
+
+
+def _pairs(cours):
+    """Le contrôle naïf : chaque couple de cours comparé, O(n²)."""
+    return [(a[4], b[4]) for i, a in enumerate(cours) for b in cours[i + 1:]
+            if a[:2] == b[:2] and chevauchent(a[2], a[3], b[2], b[3])]
+
+
+def _naif_clean(cours):
+    """Validation d'un cours sans index : tous les cours du moniteur chargés et comparés."""
+    autres = Cours.objects.filter(entraineur_id=cours.entraineur_id).exclude(pk=cours.pk)
+    return [c for c in autres if c.jour == cours.jour and chevauchent(cours.heure_debut, cours.heure_fin,
+                                                                         c.heure_debut, c.heure_fin)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure la détection des chevauchements de créneaux sur des milliers de cours "
+        "hebdomadaires : validation d'un cours et d'une participation, rapport complet "
+        "(tri et balayage) contre la comparaison de tous les couples. Les données sont "
+        "créées dans une transaction annulée à la fin."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cours', type=int, default=3000)
+        parser.add_argument('--moniteurs', type=int, default=15)
+        parser.add_argument('--cavaliers', type=int, default=4000)
+        parser.add_argument('--chevaux', type=int, default=600)
+        parser.add_argument('--repetitions', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        alea = random.Random(options['seed'])
+        self.repetitions = options['repetitions']
+        cache_prive = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bench_creneaux'}}
+        with override_settings(CACHES=cache_prive), transaction.atomic():
+            self._club(alea, options)
+            cours = list(Cours.objects.filter(niveau="bench-creneaux").select_related('entraineur'))
+            self.stdout.write(f"{len(cours)} cours, {Participation.objects.count()} participations")
+
+            self.stdout.write(f"{'validation':28} {'médiane':>9}")
+            echantillon = alea.sample(cours, min(self.repetitions, len(cours)))
+            self._ligne("cours (requête indexée)", [c.clean for c in echantillon], ignorer=ValidationError)
+            self._ligne("cours (tous ses cours lus)", [lambda c=c: _naif_clean(c) for c in echantillon])
+            participations = [Participation(cours=c, cavalier=alea.choice(self.cavaliers),
+                                            cheval=alea.choice(self.chevaux)) for c in echantillon]
+            self._ligne("participation (validate_many)", [lambda p=p: validate_many([p]) for p in participations])
+
+            lignes = list(Cours.objects.filter(entraineur__isnull=False)
+                          .values_list('entraineur_id', 'jour', 'heure_debut', 'heure_fin', 'pk'))
+            debut = time.perf_counter()
+            balayage = conflits(((m, j), d, f, pk) for m, j, d, f, pk in lignes)
+            duree_balayage = time.perf_counter() - debut
+            debut = time.perf_counter()
+            couples = _pairs(sorted(lignes))
+            duree_couples = time.perf_counter() - debut
+            self.stdout.write(
+                f"moniteurs, {len(lignes)} cours : tri et balayage {duree_balayage * 1000:.1f} ms "
+                f"({len(balayage)} conflits), tous les couples {duree_couples * 1000:.1f} ms "
+                f"({len(couples)} couples en conflit)"
+            )
+            debut = time.perf_counter()
+            resultat = rapport()
+            self.stdout.write(
+                f"rapport complet : {(time.perf_counter() - debut) * 1000:.1f} ms "
+                + ", ".join(f"{nom} {len(v)}" for nom, v in resultat.items())
+            )
+            transaction.set_rollback(True)
+
+    def _club(self, alea, options):
+        """Cours de durées variées, répartis sur six jours, cinq participations au hasard chacun."""
+        moniteurs = Moniteur.objects.bulk_create(
+            Moniteur(nom=f"creneaux-{i}", prenom="M", email=f"creneaux-{i}@club.example", specialite="CSO")
+            for i in range(options['moniteurs'])
+        )
+        jours = [j for j, _ in Cours.JOUR_CHOICES]
+        cours = []
+        for i in range(options['cours']):
+            debut = alea.randrange(8 * 4, 20 * 4)
+            fin = min(debut + alea.choice((3, 4, 6, 8)), 22 * 4)
+            cours.append(Cours(niveau="bench-creneaux", niveau_normalise="bench-creneaux", jour=jours[i % 6],
+                               heure_debut=heure(debut // 4, debut % 4 * 15), heure_fin=heure(fin // 4, fin % 4 * 15),
+                               entraineur=alea.choice(moniteurs)))
+        cours = Cours.objects.bulk_create(cours)
+        Seance.objects.generer(1, cours=Cours.objects.filter(pk__in=[c.pk for c in cours]))
+        self.cavaliers = Cavalier.objects.bulk_create(
+            Cavalier(nom="creneaux", prenom=str(i), age=30, email=f"creneaux-{i}@club.example")
+            for i in range(options['cavaliers'])
+        )
+        self.chevaux = Cheval.objects.bulk_create(
+            Cheval(nom=f"creneaux-{i}", race="bench", age=10) for i in range(options['chevaux'])
+        )
+        Participation.objects.bulk_create(
+            [Participation(cours=c, date=prochaine_date(c.jour), cavalier=cavalier, cheval=cheval)
+             for c in cours
+             for cavalier, cheval in zip(alea.sample(self.cavaliers, 5), alea.sample(self.chevaux, 5))],
+            batch_size=1000,
+        )
+
+    def _ligne(self, nom, appels, ignorer=()):
+        durees = []
+        for appel in appels:
+            debut = time.perf_counter()
+            try:
+                appel()
+            except ignorer:
+                pass
+            durees.append((time.perf_counter() - debut) * 1000)
+        self.stdout.write(f"{nom:28} {statistics.median(durees):7.2f}ms")
@@ -0,0 +1,83 @@
+import random
+import statistics
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from club.calendrier import aujourd_hui
+from club.disponibilites import disponibilites
+from club.generation import generer_club, generer_historique
+from club.inscriptions import inscrire
+from club.models import Cavalier, Cheval, ChevalJour, Cours, Participation, participants_du_cours
+
+
+def _ancienne_page(cavalier):
+    """L'ancienne page : tous les cours et les chevaux libres aujourd'hui, les règles découvertes au POST."""
+    return list(Cours.objects.annotate(nb=participants_du_cours())), \
+        list(Cheval.objects.filter(disponible=True).exclude(pk__in=ChevalJour.objects.pleins(aujourd_hui())))
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure le service de disponibilités à l'échelle d'un club (requêtes, durée) "
+        "contre l'ancienne page d'inscription, dont les choix n'étaient vérifiés qu'au POST. "
+        "Les données sont créées dans une transaction annulée à la fin."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cavaliers', type=int, default=2000)
+        parser.add_argument('--chevaux', type=int, default=150)
+        parser.add_argument('--cours', type=int, default=60)
+        parser.add_argument('--participations', type=int, default=20000, help="Participations passées ajoutées")
+        parser.add_argument('--repetitions', type=int, default=30)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        alea = random.Random(options['seed'])
+        cache_prive = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bench_disponibilites'}}
+        with override_settings(CACHES=cache_prive), transaction.atomic():
+            generer_club(cavaliers=options['cavaliers'], chevaux=options['chevaux'], cours=options['cours'],
+                         seed=options['seed'], marque="bench-disponibilites", semaines=1)
+            generer_historique(options['participations'], seed=options['seed'])
+            self.stdout.write(f"{Participation.objects.count()} participations, {Cheval.objects.count()} chevaux, "
+                              f"{Cours.objects.count()} cours")
+
+            cavaliers = alea.sample(list(Cavalier.objects.all()), options['repetitions'])
+            self.stdout.write(f"{'page':22} {'requêtes':>9} {'durée':>9}")
+            for nom, lecture in (("ancienne (sans règles)", _ancienne_page),
+                                 ("disponibilités", lambda c: disponibilites(c, complets=True))):
+                requetes, durees = [], []
+                for cavalier in cavaliers:
+                    with CaptureQueriesContext(connection) as q:
+                        debut = time.perf_counter()
+                        lecture(cavalier)
+                        durees.append((time.perf_counter() - debut) * 1000)
+                    requetes.append(len(q))
+                self.stdout.write(f"{nom:22} {max(requetes):9} {statistics.median(durees):7.2f}ms")
+
+            # Chaque choix proposé, essayé au POST dans un savepoint annulé
+            ancienne = nouvelle = (0, 0)
+            for cavalier in cavaliers[:5]:
+                cours, chevaux = _ancienne_page(cavalier)
+                ancienne = self._essayer(ancienne, cavalier, [(c, alea.choice(chevaux)) for c in cours])
+                nouvelle = self._essayer(nouvelle, cavalier, [
+                    (s.cours, alea.choice(s.chevaux)) for s in disponibilites(cavalier)
+                ])
+            for nom, (refus, essais) in (("ancienne", ancienne), ("disponibilités", nouvelle)):
+                self.stdout.write(f"{nom} : {refus}/{essais} choix (cours, cheval) refusés au POST")
+            transaction.set_rollback(True)
+
+    def _essayer(self, compte, cavalier, choix):
+        refus, essais = compte
+        for cours, cheval in choix:
+            essais += 1
+            try:
+                with transaction.atomic():
+                    inscrire(cavalier, cours, cheval=cheval)
+                    transaction.set_rollback(True)
+            except ValidationError:
+                refus += 1
+        return refus, essais
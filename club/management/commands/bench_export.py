@@ -0,0 +1,202 @@
+import asyncio
+import io
+import logging
+import os
+import threading
+import time
+
+from asgiref.sync import async_to_sync
+from django.core import signals
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import close_old_connections, transaction
+from django.http import HttpResponse
+from django.test.utils import override_settings
+from django.urls import path
+
+from club import exports
+from club.generation import generer_club, generer_historique
+from club.models import Participation
+
+
+class _Memoire(threading.Thread):
+    """Relève la mémoire résidente du processus pendant une mesure ; ``pic`` est le maximum vu."""
+
+    def __init__(self, intervalle=0.005):
+        super().__init__(daemon=True)
+        self.intervalle = intervalle
+        self.page = os.sysconf('SC_PAGE_SIZE')
+        self.depart = self.pic = self.rss()
+        self.fini = threading.Event()
+
+    def rss(self):
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * self.page
+
+    def run(self):
+        while not self.fini.wait(self.intervalle):
+            self.pic = max(self.pic, self.rss())
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.fini.set()
+        self.join()
+        self.pic = max(self.pic, self.rss())
+
+
+class _Lignes:
+    """Corps de la réponse envoyé dans /dev/null ; compte les lignes reçues."""
+
+    def __enter__(self):
+        self.sortie = open(os.devnull, 'wb')
+        self.lignes = 0
+        return self
+
+    def write(self, morceau):
+        self.lignes += morceau.count(b'\n')
+        self.sortie.write(morceau)
+
+    def __exit__(self, *exc):
+        self.sortie.close()
+
+
+def _naif(queryset):
+    """L'export tel qu'on l'écrirait sans y penser : objets modèles chargés d'un bloc."""
+    lignes = []
+    for p in list(queryset.select_related('cours', 'cavalier', 'cheval').order_by('date', 'cheval')):
+        lignes.append([p.date, p.cours.jour, p.cours.heure_debut, p.cours.heure_fin, p.cours.niveau,
+                       p.cavalier.prenom, p.cavalier.nom, p.cavalier.email, p.cheval.nom])
+    return ["date", "jour", "debut", "fin", "niveau", "prenom", "nom", "email", "cheval"], lignes
+
+
+# === URLS MESURÉES ===
+# Les vues de l'export, sans l'admin (ni session ni CSRF) : seul le chemin de
+# la réponse HTTP compte.
+
+def _en_flux(request):
+    return exports.reponse_csv(request, "participations", exports.participations())
+
+
+def _d_un_bloc(request):
+    return HttpResponse("".join(exports.lignes_csv(*_naif(Participation.objects.all()))),
+                        content_type="text/csv; charset=utf-8")
+
+
+class UrlsExport:
+    urlpatterns = [path('en-flux/', _en_flux), path('d-un-bloc/', _d_un_bloc)]
+
+
+# === CLIENTS WSGI ET ASGI ===
+def _wsgi(application, chemin, sortie):
+    """Une requête GET passée à l'application WSGI ; renvoie le statut."""
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': chemin, 'QUERY_STRING': '', 'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80', 'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(),
+    }
+    statut = []
+    corps = application(environ, lambda s, entetes: statut.append(s))
+    try:
+        for morceau in corps:
+            sortie.write(morceau)
+    finally:
+        corps.close()
+    return int(statut[0].split()[0])
+
+
+async def _asgi(application, chemin, sortie):
+    """Une requête GET passée à l'application ASGI comme le ferait uvicorn ; renvoie le statut."""
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'http', 'path': chemin, 'raw_path': chemin.encode(),
+        'query_string': b'', 'root_path': '', 'headers': [(b'host', b'localhost')],
+        'client': ('127.0.0.1', 50000), 'server': ('localhost', 80),
+    }
+    corps_envoye = False
+    fini = asyncio.Event()
+    statut = None
+
+    async def receive():
+        nonlocal corps_envoye
+        if not corps_envoye:
+            corps_envoye = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await fini.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        nonlocal statut
+        if message['type'] == 'http.response.start':
+            statut = message['status']
+        elif message['type'] == 'http.response.body':
+            sortie.write(message.get('body', b''))
+            if not message.get('more_body'):
+                fini.set()
+
+    await application(scope, receive, send)
+    return statut
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure l'export CSV des participations servi en HTTP (lignes par seconde, "
+        "pic de mémoire résidente) : en flux sous WSGI et sous ASGI, contre l'export "
+        "chargé d'un bloc. Les données sont créées dans une transaction annulée à la fin."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lignes', type=int, default=200000, help="Participations passées ajoutées")
+        parser.add_argument('--cavaliers', type=int, default=2000)
+        parser.add_argument('--chevaux', type=int, default=150)
+        parser.add_argument('--cours', type=int, default=60)
+        parser.add_argument('--sans-naif', action='store_true', help="Ne mesure que l'export en flux")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if not os.path.exists('/proc/self/statm'):
+            raise CommandError("La mémoire résidente est lue dans /proc : Linux uniquement.")
+
+        cache_prive = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bench_export'}}
+        reglages = override_settings(CACHES=cache_prive, DEBUG=False, ALLOWED_HOSTS=['localhost'],
+                                     ROOT_URLCONF=UrlsExport)
+        # Comme le client de test : les requêtes ne ferment pas la connexion, sinon
+        # la transaction qui porte les données du banc serait perdue
+        signals.request_started.disconnect(close_old_connections)
+        signals.request_finished.disconnect(close_old_connections)
+        try:
+            with reglages, transaction.atomic():
+                generer_club(cavaliers=options['cavaliers'], chevaux=options['chevaux'], cours=options['cours'],
+                             seed=options['seed'], marque="bench-export", semaines=1)
+                generer_historique(options['lignes'], seed=options['seed'])
+                total = Participation.objects.count()
+                self.stdout.write(f"{total} participations à exporter")
+
+                wsgi, asgi = get_wsgi_application(), get_asgi_application()
+                # Une ligne de journal seulement pour les requêtes lentes (après
+                # get_*_application(), qui reconfigurent la journalisation)
+                logging.getLogger('club.instrumentation').setLevel(logging.WARNING)
+                # async_to_sync depuis ce thread : les parties synchrones de la requête ASGI
+                # (vue, lecture des paquets) y reviennent et voient la transaction
+                variantes = [("WSGI, en flux", lambda s: _wsgi(wsgi, '/en-flux/', s)),
+                             ("ASGI, en flux", lambda s: async_to_sync(_asgi)(asgi, '/en-flux/', s))]
+                if not options['sans_naif']:
+                    variantes.append(("chargé d'un bloc", lambda s: _wsgi(wsgi, '/d-un-bloc/', s)))
+                for nom, requete in variantes:
+                    with _Lignes() as sortie, _Memoire() as memoire:
+                        debut = time.perf_counter()
+                        statut = requete(sortie)
+                        duree = time.perf_counter() - debut
+                    if statut != 200:
+                        raise CommandError(f"{nom} : réponse {statut}")
+                    n = sortie.lignes - 1
+                    self.stdout.write(
+                        f"{nom:17} {n / duree:10.0f} lignes/s  {duree:6.2f} s  "
+                        f"pic RSS +{(memoire.pic - memoire.depart) / 2**20:6.1f} Mo"
+                    )
+                transaction.set_rollback(True)
+        finally:
+            signals.request_started.connect(close_old_connections)
+            signals.request_finished.connect(close_old_connections)
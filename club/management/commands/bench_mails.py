@@ -0,0 +1,160 @@
+import random
+import socketserver
+import threading
+import time
+from collections import Counter
+from datetime import time as heure
+
+from django.core import mail
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+
+from club.calendrier import prochaine_date
+from club.mails import annoncer, annoncer_programmes
+from club.models import Avis, Cavalier, Cheval, Cours, Participation, Seance, Tache
+from club.taches import prendre, traiter
+
+
+class _SessionSMTP(socketserver.StreamRequestHandler):
+    """Le strict nécessaire du protocole pour smtplib : tout est accepté, rien n'est transmis."""
+
+    def handle(self):
+        self.server.compter('connexions')
+        self._repondre("220 bench")
+        while ligne := self.rfile.readline():
+            commande = ligne[:4].upper()
+            if commande == b"DATA":
+                self._repondre("354 fin par <CRLF>.<CRLF>")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                self.server.compter('messages')
+                self._repondre("250 ok")
+            elif commande == b"QUIT":
+                self._repondre("221 au revoir")
+                return
+            else:
+                self._repondre("250 ok")
+
+    def _repondre(self, texte):
+        self.wfile.write(texte.encode() + b"\r\n")
+
+
+class ServeurSMTP(socketserver.ThreadingTCPServer):
+    """Serveur SMTP local qui compte connexions et messages, lancé dans un thread."""
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _SessionSMTP)
+        self.verrou = threading.Lock()
+        self.connexions = self.messages = 0
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def compter(self, nom):
+        with self.verrou:
+            setattr(self, nom, getattr(self, nom) + 1)
+
+    def reglages(self):
+        return {'EMAIL_BACKEND': 'django.core.mail.backends.smtp.EmailBackend', 'EMAIL_HOST': "127.0.0.1",
+                'EMAIL_PORT': self.server_address[1], 'EMAIL_USE_TLS': False, 'EMAIL_HOST_USER': ""}
+
+
+def _vider(lot):
+    """Exécute la file comme run_worker ; renvoie la durée en secondes."""
+    debut = time.perf_counter()
+    while taches := prendre(lot):
+        traiter(taches)
+    return time.perf_counter() - debut
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure l'envoi des mails pour un club de --cavaliers cavaliers : confirmations "
+        "regroupées par cavalier et programmes de la semaine, envoyés par lots sur une "
+        "connexion, contre un cavalier par lot. Backend locmem, ou --smtp pour un "
+        "serveur SMTP local. Les données sont créées dans une transaction annulée à la fin."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cavaliers', type=int, default=10000)
+        parser.add_argument('--cours', type=int, default=300)
+        parser.add_argument('--chevaux', type=int, default=500)
+        parser.add_argument('--lot', type=int, default=200, help="Tâches prises à chaque tour du worker")
+        parser.add_argument('--echantillon', type=int, default=1000, help="Avis envoyés sans lots, pour comparer")
+        parser.add_argument('--smtp', action='store_true', help="Envoie à un serveur SMTP local")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        alea = random.Random(options['seed'])
+        serveur = ServeurSMTP() if options['smtp'] else None
+        reglages = {
+            'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bench_mails'}},
+            'TACHES_SYNCHRONES': False,
+            **(serveur.reglages() if serveur else {'EMAIL_BACKEND': 'django.core.mail.backends.locmem.EmailBackend'}),
+        }
+        try:
+            with override_settings(**reglages), transaction.atomic():
+                participations = self._club(alea, options)
+                self.stdout.write(f"{len(self.cavaliers)} cavaliers, {len(participations)} participations, "
+                                  f"{'SMTP local' if serveur else 'locmem'}")
+
+                # Chaque participation annoncée comme une inscription : une tâche par cavalier
+                debut = time.perf_counter()
+                for p in participations:
+                    annoncer(Avis.INSCRIPTION, p)
+                duree_file = time.perf_counter() - debut
+                self.stdout.write(f"{len(participations)} avis notés en {duree_file:.1f} s "
+                                  f"({duree_file / len(participations) * 1000:.2f} ms chacun), "
+                                  f"{Tache.objects.count()} tâches en file")
+                self._mesurer("confirmations", serveur, lambda: _vider(options['lot']))
+
+                annoncer_programmes(participations[0].date)
+                self._mesurer("programmes", serveur, lambda: _vider(options['lot']))
+
+                # Même travail sans lots : un cavalier par tâche exécutée, donc une connexion par mail
+                for p in participations[:options['echantillon']]:
+                    annoncer(Avis.INSCRIPTION, p)
+                self._mesurer("un cavalier par lot", serveur, lambda: _vider(1))
+                transaction.set_rollback(True)
+        finally:
+            if serveur:
+                serveur.shutdown()
+                serveur.server_close()
+
+    def _club(self, alea, options):
+        """Cours sur six jours, une à trois participations par cavalier la semaine prochaine."""
+        jours = [j for j, _ in Cours.JOUR_CHOICES]
+        cours = Cours.objects.bulk_create(
+            Cours(niveau=f"Galop {i % 7 + 1}", jour=jours[i % 6], heure_debut=heure(8 + i % 12),
+                  heure_fin=heure(9 + i % 12)) for i in range(options['cours'])
+        )
+        Seance.objects.generer(1, cours=Cours.objects.filter(pk__in=[c.pk for c in cours]))
+        self.cavaliers = Cavalier.objects.bulk_create(
+            Cavalier(nom="mails", prenom=str(i), age=30, email=f"bench-mails-{i}@club.example")
+            for i in range(options['cavaliers'])
+        )
+        chevaux = Cheval.objects.bulk_create(
+            Cheval(nom=f"mails-{i}", race="bench", age=10) for i in range(options['chevaux'])
+        )
+        # Chevaux pris à tour de rôle dans chaque cours : jamais deux fois le même par séance
+        rang = Counter()
+        participations = []
+        for cavalier in self.cavaliers:
+            for c in alea.sample(cours, alea.randint(1, 3)):
+                participations.append(Participation(cours=c, date=prochaine_date(c.jour), cavalier=cavalier,
+                                                    cheval=chevaux[rang[c.pk] % len(chevaux)]))
+                rang[c.pk] += 1
+        return Participation.objects.bulk_create(participations, batch_size=1000)
+
+    def _mesurer(self, nom, serveur, envoi):
+        mail.outbox = []
+        avant = (serveur.connexions, serveur.messages) if serveur else (0, 0)
+        duree = envoi()
+        if serveur:
+            connexions, envoyes = serveur.connexions - avant[0], serveur.messages - avant[1]
+        else:
+            connexions, envoyes = None, len(mail.outbox)
+        self.stdout.write(
+            f"{nom:22} {envoyes:6} mails en {duree:6.2f} s ({envoyes / duree:6.0f}/s)"
+            + (f", {connexions} connexions" if connexions is not None else "")
+        )
@@ -0,0 +1,85 @@
+import random
+import statistics
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q
+from django.test.utils import override_settings
+
+from club.calendrier import aujourd_hui, sept_jours
+from club.generation import generer_club, generer_historique
+from club.inscriptions import inscrire
+from club.models import Cavalier, Cheval, ChevalJour, Cours, Participation, participants_du_cours
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare les lectures des écrans d'inscription (chevaux libres, places des cours) "
+        "en comptant les participations et en lisant l'occupation matérialisée, et mesure "
+        "le coût d'une inscription. Les données sont créées dans une transaction annulée à la fin."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--participations', type=int, default=50000)
+        parser.add_argument('--chevaux', type=int, default=1000)
+        parser.add_argument('--cavaliers', type=int, default=5000)
+        parser.add_argument('--cours', type=int, default=300)
+        parser.add_argument('--repetitions', type=int, default=30)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        alea = random.Random(options['seed'])
+        self.repetitions = options['repetitions']
+        cache_prive = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bench_occupation'}}
+        with override_settings(CACHES=cache_prive), transaction.atomic():
+            generer_club(cavaliers=options['cavaliers'], chevaux=options['chevaux'], cours=options['cours'],
+                         seed=options['seed'], marque="bench-occupation", semaines=1)
+            generer_historique(options['participations'] - Participation.objects.count(), seed=options['seed'])
+            self.stdout.write(f"{Participation.objects.count()} participations, {Cheval.objects.count()} chevaux")
+
+            jour, jours = aujourd_hui(), sept_jours()
+            cours = list(Cours.objects.all())
+            # (écran, lecture en comptant les participations, lecture de l'occupation)
+            lectures = [
+                ("chevaux libres du jour",
+                 lambda: list(Cheval.objects.filter(disponible=True).annotate(
+                     nb=Count('participation', filter=Q(participation__date=jour))).filter(nb__lt=2)),
+                 lambda: list(Cheval.objects.filter(disponible=True).exclude(pk__in=ChevalJour.objects.pleins(jour)))),
+                ("places des cours",
+                 lambda: list(Cours.objects.annotate(
+                     nb=Count('participations', filter=Q(participations__date__range=jours))).filter(nb__lt=5)),
+                 lambda: list(Cours.objects.annotate(nb=participants_du_cours(jours)).filter(nb__lt=5))),
+                ("chevaux pleins (séance)",
+                 lambda: list(Participation.objects.filter(date=jours[0]).order_by()
+                              .values('cheval').annotate(n=Count('pk')).filter(n__gte=2)),
+                 lambda: list(ChevalJour.objects.pleins(jours[0]))),
+            ]
+            self.stdout.write(f"{'écran':26} {'comptage':>10} {'occupation':>11}")
+            for nom, avant, apres in lectures:
+                self.stdout.write(f"{nom:26} {self._mediane(avant):8.2f}ms {self._mediane(apres):9.2f}ms")
+
+            # Écriture : l'occupation ajoute quelques UPDATE à chaque inscription
+            cavaliers = list(Cavalier.objects.order_by('?')[:options['repetitions']])
+            durees = []
+            for cavalier in cavaliers:
+                debut = time.perf_counter()
+                try:
+                    with transaction.atomic():
+                        inscrire(cavalier, alea.choice(cours))
+                except ValidationError:
+                    continue
+                durees.append((time.perf_counter() - debut) * 1000)
+            if durees:
+                self.stdout.write(f"inscription (occupation tenue à jour) : {statistics.median(durees):.2f} ms "
+                                  f"sur {len(durees)} inscriptions acceptées")
+            transaction.set_rollback(True)
+
+    def _mediane(self, lecture):
+        durees = []
+        for _ in range(self.repetitions):
+            debut = time.perf_counter()
+            lecture()
+            durees.append((time.perf_counter() - debut) * 1000)
+        return statistics.median(durees)
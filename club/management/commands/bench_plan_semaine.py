@@ -0,0 +1,59 @@
+import random
+import time
+from datetime import time as heure
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from club.models import Cavalier, Cheval, Cours, Inscription
+from club.planning import appliquer, planifier_semaine
+
+class Command(BaseCommand):
+    help = (
+        "Mesure planifier_semaine sur un club fictif "
+        "(les données sont créées dans une transaction annulée à la fin)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cavaliers', type=int, default=500)
+        parser.add_argument('--chevaux', type=int, default=150)
+        parser.add_argument('--cours', type=int, default=150)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        alea = random.Random(options['seed'])
+        with transaction.atomic():
+            cours = [
+                Cours.objects.create(
+                    niveau=alea.choice(["Débutant", "Galop 3", "Galop 5", "Concours"]),
+                    jour=Cours.JOUR_CHOICES[i % 6][0],
+                    heure_debut=heure(8 + i % 10), heure_fin=heure(9 + i % 10),
+                )
+                for i in range(options['cours'])
+            ]
+            Cheval.objects.bulk_create(
+                Cheval(nom=f"bench-{i}", race="bench", age=alea.randint(4, 20))
+                for i in range(options['chevaux'])
+            )
+            cavaliers = Cavalier.objects.bulk_create(
+                Cavalier(nom="bench", prenom=str(i), age=20, email=f"bench-{i}@example.com")
+                for i in range(options['cavaliers'])
+            )
+            inscriptions = []
+            for cavalier in cavaliers:
+                for co in alea.sample(cours, alea.randint(1, 3)):
+                    inscriptions.append(Inscription(cavalier=cavalier, cours=co))
+            Inscription.objects.bulk_create(inscriptions)
+
+            debut = time.perf_counter()
+            plan = planifier_semaine()
+            calcul = time.perf_counter() - debut
+            appliquer(plan)
+            ecriture = time.perf_counter() - debut - calcul
+
+            self.stdout.write(
+                f"{len(inscriptions)} inscriptions, {options['chevaux']} chevaux : "
+                f"{len(plan.affectations)} affectées, {len(plan.refus)} refusées ; "
+                f"calcul {calcul:.2f} s, écriture {ecriture:.2f} s"
+            )
+            transaction.set_rollback(True)
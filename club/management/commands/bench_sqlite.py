@@ -0,0 +1,52 @@
+import os
+import re
+import sqlite3
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+PROFILS = ('developpement', 'production')
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare le débit d'écriture des profils SQLite (développement et "
+        "production) avec stress_inscriptions, chacun sur une copie de la base"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=20)
+        parser.add_argument('--inscriptions', type=int, default=600)
+        parser.add_argument('--cours', type=int, default=120)
+        parser.add_argument('--chevaux', type=int, default=300)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("Ce banc d'essai compare des profils SQLite.")
+        source = str(settings.DATABASES['default']['NAME'])
+        argv = [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'stress_inscriptions'] + [
+            f"--{nom}={options[nom]}" for nom in ('threads', 'inscriptions', 'cours', 'chevaux')
+        ]
+
+        debits = {}
+        with tempfile.TemporaryDirectory() as dossier:
+            for profil in PROFILS:
+                # Copie propre à chaque profil : le mode WAL est enregistré dans le fichier
+                copie = os.path.join(dossier, f"{profil}.sqlite3")
+                with sqlite3.connect(source) as src, sqlite3.connect(copie) as dst:
+                    src.backup(dst)
+                env = {**os.environ, 'DJANGO_PROFIL': profil, 'DJANGO_DB_NAME': copie}
+                env.pop('DJANGO_DB_ENGINE', None)
+                sortie = subprocess.run(argv, env=env, capture_output=True, text=True)
+                if sortie.returncode:
+                    raise CommandError(f"{profil} : {sortie.stderr.strip().splitlines()[-1]}")
+                resultat = sortie.stdout.strip().splitlines()[0]
+                self.stdout.write(f"{profil:14} {resultat}")
+                debits[profil] = float(re.search(r"\((\d+)/s\)", resultat).group(1))
+
+        gain = debits['production'] / debits['developpement']
+        self.stdout.write(self.style.SUCCESS(f"Débit d'écriture du profil de production : ×{gain:.2f}"))
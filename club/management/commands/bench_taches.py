@@ -0,0 +1,96 @@
+import random
+import statistics
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from club.generation import generer_club
+from club.inscriptions import inscrire
+from club.models import Cavalier, Cheval, Cours, Tache
+from club.taches import prendre, traiter
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure ce que la file de tâches retire des requêtes : durée d'une inscription "
+        "et de l'enregistrement d'un cheval avec le travail qui suit (tâches synchrones) "
+        "ou mis en file, puis le débit de run_worker sur la file remplie. Les données "
+        "sont créées dans une transaction annulée à la fin."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cavaliers', type=int, default=2000)
+        parser.add_argument('--chevaux', type=int, default=150)
+        parser.add_argument('--cours', type=int, default=60)
+        parser.add_argument('--repetitions', type=int, default=200)
+        parser.add_argument('--lot', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        alea = random.Random(options['seed'])
+        cache_prive = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bench_taches'}}
+        locmem = 'django.core.mail.backends.locmem.EmailBackend'
+        with override_settings(CACHES=cache_prive, EMAIL_BACKEND=locmem), transaction.atomic():
+            # Transaction jamais validée : les recomptages lancés au commit sont exécutés ici
+            with TestCase.captureOnCommitCallbacks(execute=True):
+                generer_club(cavaliers=options['cavaliers'], chevaux=options['chevaux'], cours=options['cours'],
+                             seed=options['seed'], marque="bench-taches", semaines=1)
+            cavaliers, cours = list(Cavalier.objects.all()), list(Cours.objects.all())
+            chevaux = list(Cheval.objects.all())
+            n = options['repetitions']
+            inscriptions = [(alea.choice(cavaliers), alea.choice(cours)) for _ in range(n)]
+            enregistrements = alea.choices(chevaux, k=n)
+
+            self.stdout.write(f"{'requête':24} {'synchrones':>11} {'en file':>9}")
+            for nom, appels in (
+                ("inscription", [lambda c=c, co=co: inscrire(c, co) for c, co in inscriptions]),
+                ("cheval modifié", [h.save for h in enregistrements]),
+            ):
+                synchrones, en_file = self._mesurer(appels, True), self._mesurer(appels, False)
+                self.stdout.write(f"{nom:24} {synchrones:9.2f}ms {en_file:7.2f}ms")
+
+            # La file remplie par de vraies inscriptions, puis vidée comme par run_worker
+            with override_settings(TACHES_SYNCHRONES=False):
+                acceptees = 0
+                for cavalier, c in inscriptions:
+                    try:
+                        with transaction.atomic():
+                            inscrire(cavalier, c)
+                        acceptees += 1
+                    except ValidationError:
+                        pass
+                for h in enregistrements:
+                    h.save()
+            en_file = Tache.objects.count()
+            debut = time.perf_counter()
+            executees = 0
+            while taches := prendre(options['lot']):
+                executees += traiter(taches)[0]
+            duree = time.perf_counter() - debut
+            self.stdout.write(
+                f"{acceptees} inscriptions et {n} chevaux modifiés : {en_file} tâches en file après "
+                f"dédoublonnage, exécutées en {duree * 1000:.0f} ms ({executees / duree:.0f}/s) ; "
+                f"{Cheval.objects.seances_faussees().count()} compteurs de cheval faux ensuite"
+            )
+            transaction.set_rollback(True)
+
+    def _mesurer(self, appels, synchrones):
+        """Durée médiane d'un appel et du travail lancé au commit, chacun annulé ensuite."""
+        durees = []
+        with override_settings(TACHES_SYNCHRONES=synchrones):
+            for appel in appels:
+                with transaction.atomic():
+                    debut = time.perf_counter()
+                    # Les fonctions on_commit qu'un vrai commit lancerait dans la requête
+                    with TestCase.captureOnCommitCallbacks(execute=True):
+                        try:
+                            appel()
+                        except ValidationError:
+                            pass
+                    durees.append((time.perf_counter() - debut) * 1000)
+                    transaction.set_rollback(True)
+        return statistics.median(durees)
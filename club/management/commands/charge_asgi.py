@@ -0,0 +1,199 @@
+import asyncio
+import json
+import logging
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Max
+from django.shortcuts import render
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import path
+
+from club.cache import fragment_planning, participations_du_cavalier
+from club.disponibilites import seances_ouvertes
+from club.generation import generer_club
+from club.inscriptions import PLACES_PAR_COURS
+from club.models import Cavalier, Cheval, Cours, Moniteur
+
+import monsite.urls
+
+VUES = {
+    'accueil': '/',
+    'dashboard': '/dashboard/',
+    'statut': '/dashboard/statut/',
+    'concours': '/dashboard/concours/',
+    'chevaux': '/dashboard/chevaux/',
+}
+
+
+# === VARIANTE SYNCHRONE ===
+# Les vues de lecture telles qu'elles étaient avant le passage à l'ORM
+# asynchrone (mêmes requêtes, mêmes gabarits), servies par le même ASGIHandler.
+
+def _accueil(request):
+    return render(request, 'accueil.html')
+
+
+def _dashboard(request):
+    cavalier = Cavalier.objects.get(user=request.user)
+    return render(request, 'dashboard.html', {
+        'cavalier': cavalier, 'participations': participations_du_cavalier(cavalier),
+    })
+
+
+def _statut(request):
+    cavalier = Cavalier.objects.get(user=request.user)
+    return render(request, 'statut.html', {'planning': fragment_planning(cavalier)})
+
+
+def _concours(request):
+    cavalier = Cavalier.objects.get(user=request.user)
+    concours = seances_ouvertes(cavalier, niveau="concours", complets=True)
+    return render(request, 'concours.html', {'concours': concours, 'message': "", 'places': PLACES_PAR_COURS})
+
+
+def _chevaux(request):
+    return render(request, 'chevaux.html', {'chevaux': Cheval.objects.all()})
+
+
+class UrlsSynchrones:
+    urlpatterns = [
+        path('', _accueil, name='accueil'),
+        path('dashboard/', _dashboard, name='dashboard'),
+        path('dashboard/statut/', _statut, name='statut'),
+        path('dashboard/concours/', _concours, name='concours'),
+        path('dashboard/chevaux/', _chevaux, name='chevaux'),
+        *monsite.urls.urlpatterns,
+    ]
+
+
+# === CLIENT ASGI ===
+async def _requete(application, chemin, cookie):
+    """Une requête GET passée à l'application comme le ferait uvicorn ; renvoie le statut."""
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'http', 'path': chemin, 'raw_path': chemin.encode(),
+        'query_string': b'', 'root_path': '',
+        'headers': [(b'host', b'localhost'), (b'cookie', cookie.encode())],
+        'client': ('127.0.0.1', 50000), 'server': ('localhost', 80),
+    }
+    corps_envoye = False
+    deconnexion = asyncio.Event()
+    statut = None
+
+    async def receive():
+        nonlocal corps_envoye
+        if not corps_envoye:
+            corps_envoye = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await deconnexion.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        nonlocal statut
+        if message['type'] == 'http.response.start':
+            statut = message['status']
+
+    await application(scope, receive, send)
+    return statut
+
+
+async def _charge(application, chemins, cookie, requetes, concurrence):
+    durees, erreurs = [], 0
+    restantes = iter(range(requetes))
+
+    async def client():
+        nonlocal erreurs
+        for i in restantes:
+            debut = time.perf_counter()
+            statut = await _requete(application, chemins[i % len(chemins)], cookie)
+            durees.append((time.perf_counter() - debut) * 1000)
+            if statut != 200:
+                erreurs += 1
+
+    debut = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrence)))
+    total = time.perf_counter() - debut
+    centiles = statistics.quantiles(durees, n=100, method='inclusive')
+    return {
+        "requetes_par_s": round(requetes / total, 1),
+        "p50_ms": round(centiles[49], 2),
+        "p99_ms": round(centiles[98], 2),
+        "erreurs": erreurs,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Test de charge ASGI des vues de lecture : variante synchrone contre "
+        "variante asynchrone, en requêtes par seconde et p99 (données temporaires "
+        "supprimées à la fin)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrence', type=int, default=50)
+        parser.add_argument('--requetes', type=int, default=2000)
+        parser.add_argument('--cavaliers', type=int, default=1000)
+        parser.add_argument('--chevaux', type=int, default=100)
+        parser.add_argument('--cours', type=int, default=60)
+        parser.add_argument('--vues', default=','.join(VUES),
+                            help=f"Vues à charger, parmi : {', '.join(VUES)}")
+        parser.add_argument('--json', metavar='FICHIER')
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite' and connection.settings_dict['NAME'] in ('', ':memory:'):
+            raise CommandError("Une base SQLite sur disque est nécessaire : les requêtes passent par plusieurs threads.")
+        if options['requetes'] < 2:
+            raise CommandError("--requetes doit valoir au moins 2.")
+        inconnues = set(options['vues'].split(',')) - set(VUES)
+        if inconnues:
+            raise CommandError(f"Vues inconnues : {', '.join(sorted(inconnues))}")
+        chemins = [VUES[nom] for nom in options['vues'].split(',')]
+
+        modeles = (Cours, Cavalier, Cheval, Moniteur)
+        avant = {m: m.objects.aggregate(n=Max('pk'))['n'] or 0 for m in modeles}
+        generer_club(cavaliers=options['cavaliers'], chevaux=options['chevaux'], cours=options['cours'],
+                     marque=f"charge-{time.time_ns()}")
+        utilisateur = None
+        try:
+            cavalier = Cavalier.objects.filter(pk__gt=avant[Cavalier]) \
+                .annotate(n=Count('participation')).order_by('-n', 'pk').first()
+            utilisateur = User.objects.create_user(f"charge-{time.time_ns()}", cavalier.email)
+            cavalier.user = utilisateur
+            cavalier.save(update_fields=['user'])
+            client = Client()
+            client.force_login(utilisateur)
+            cookie = f"sessionid={client.cookies['sessionid'].value}"
+
+            resultats = {}
+            for variante, urls in (("synchrone", UrlsSynchrones), ("asynchrone", 'monsite.urls')):
+                with override_settings(DEBUG=False, ALLOWED_HOSTS=['localhost'], ROOT_URLCONF=urls):
+                    application = get_asgi_application()
+                    # Réglages de production : pas de DEBUG (journal des requêtes SQL), une
+                    # ligne de journal seulement pour les requêtes lentes. Après
+                    # get_asgi_application(), qui reconfigure la journalisation.
+                    logging.getLogger('club.instrumentation').setLevel(logging.WARNING)
+                    asyncio.run(_charge(application, chemins, cookie, max(options['concurrence'], 10), options['concurrence']))  # chauffe
+                    resultats[variante] = asyncio.run(
+                        _charge(application, chemins, cookie, options['requetes'], options['concurrence'])
+                    )
+        finally:
+            for modele in modeles:
+                modele.objects.filter(pk__gt=avant[modele]).delete()
+            if utilisateur is not None:
+                utilisateur.delete()
+
+        for variante, r in resultats.items():
+            self.stdout.write(
+                f"{variante:11} {r['requetes_par_s']:8.1f} req/s  p50 {r['p50_ms']:7.2f} ms  "
+                f"p99 {r['p99_ms']:7.2f} ms  {r['erreurs']} erreur(s)"
+            )
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as f:
+                json.dump({"options": {k: options[k] for k in ('concurrence', 'requetes', 'vues')},
+                           "resultats": resultats}, f, indent=2, ensure_ascii=False)
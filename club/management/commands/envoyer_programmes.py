@@ -0,0 +1,22 @@
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from club.mails import annoncer_programmes
+
+
+class Command(BaseCommand):
+    help = (
+        "Met en file le programme de la semaine prochaine (ou de la semaine de --jour) "
+        "de chaque cavalier et de chaque moniteur : un mail chacun, envoyé par run_worker. "
+        "À lancer chaque fin de semaine."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jour', type=date.fromisoformat, help="Un jour de la semaine voulue (AAAA-MM-JJ)")
+
+    def handle(self, *args, **options):
+        n = annoncer_programmes(options['jour'])
+        quand = "envoyés" if getattr(settings, 'TACHES_SYNCHRONES', True) else "mis en file"
+        self.stdout.write(self.style.SUCCESS(f"{n} programmes {quand}."))
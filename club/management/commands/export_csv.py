@@ -0,0 +1,46 @@
+import sys
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from club import exports
+from club.models import Participation
+
+EXPORTS = ('participations', 'plannings', 'chevaux')
+
+
+class Command(BaseCommand):
+    help = "Exporte en CSV, au fil de la lecture : participations, plannings des cavaliers ou charge des chevaux"
+
+    def add_arguments(self, parser):
+        parser.add_argument('export', choices=EXPORTS)
+        parser.add_argument('--sortie', default='-', help='Fichier CSV écrit (« - » pour la sortie standard)')
+        parser.add_argument('--depuis', type=date.fromisoformat, metavar='AAAA-MM-JJ')
+        parser.add_argument('--jusqu-au', type=date.fromisoformat, metavar='AAAA-MM-JJ', dest='jusqu_au',
+                            help="Dernier jour inclus (pour chevaux : la semaine en cours sans --depuis ni --jusqu-au)")
+
+    def handle(self, *args, **options):
+        debut, fin = options['depuis'], options['jusqu_au']
+        if options['export'] == 'chevaux':
+            export = exports.charge_chevaux(debut=debut, fin=fin)
+        else:
+            queryset = Participation.objects.all()
+            if debut:
+                queryset = queryset.filter(date__gte=debut)
+            if fin:
+                queryset = queryset.filter(date__lte=fin)
+            export = getattr(exports, options['export'])(queryset)
+
+        if options['sortie'] == '-':
+            self._ecrire(sys.stdout, export)
+        else:
+            with open(options['sortie'], 'w', encoding='utf-8', newline='') as f:
+                n = self._ecrire(f, export)
+            self.stderr.write(f"{n} lignes écrites dans {options['sortie']}.")
+
+    def _ecrire(self, fichier, export):
+        n = -1  # sans l'en-tête
+        for ligne in exports.lignes_csv(*export):
+            fichier.write(ligne)
+            n += 1
+        return n
@@ -0,0 +1,24 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from club.models import Seance
+
+
+class Command(BaseCommand):
+    help = "Crée à l'avance les séances datées des cours pour les semaines à venir (celles qui existent sont gardées)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--semaines', type=int, default=4)
+        parser.add_argument(
+            '--depuis', type=date.fromisoformat, metavar='AAAA-MM-JJ',
+            help="Première date (aujourd'hui par défaut)",
+        )
+
+    def handle(self, *args, **options):
+        if options['semaines'] < 1:
+            raise CommandError("--semaines doit valoir au moins 1.")
+        creees = Seance.objects.generer(options['semaines'], depuis=options['depuis'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{creees} séances créées ({Seance.objects.count()} au total)."
+        ))
@@ -1,30 +1,11 @@
-import csv
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
-from club.models import Cavalier
 
 class Command(BaseCommand):
-    help = 'Importe les cavaliers depuis un fichier CSV'
+    help = 'Importe les cavaliers depuis un fichier CSV (raccourci de import_csv)'
 
-    def handle(self, *args, **kwargs):
-        csv_path = "cavaliers_final_gmail.csv"  # Ton fichier CSV
-        print(f"Import depuis : {csv_path}")
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default="cavaliers_final_gmail.csv")
 
-        try:
-            with open(csv_path, newline='', encoding='utf-8') as csvfile:
-                reader = csv.DictReader(csvfile)
-                count = 0
-                for row in reader:
-                    Cavalier.objects.create(
-                        nom=row["nom"],
-                        prenom=row["prenom"],
-                        age=int(row["age"]),
-                        email=row["email"]
-                    )
-                    count += 1
-
-            self.stdout.write(self.style.SUCCESS(f"{count} cavaliers importés avec succès."))
-
-        except FileNotFoundError:
-            self.stdout.write(self.style.ERROR(f"Fichier non trouvé : {csv_path}"))
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f"Erreur : {e}"))
+    def handle(self, *args, **options):
+        call_command('import_csv', 'cavaliers', path=options['path'], upsert=True, stdout=self.stdout)
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+from club.importation import FORMATS, importer_csv, importer_csv_ligne_par_ligne
+
+class Command(BaseCommand):
+    help = 'Importe des cavaliers ou des chevaux depuis un CSV, par lots'
+
+    def add_arguments(self, parser):
+        parser.add_argument('format', choices=sorted(FORMATS))
+        parser.add_argument('--path', required=True, help='Fichier CSV à importer')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Valide le fichier sans rien écrire')
+        parser.add_argument(
+            '--upsert', action='store_true',
+            help='Met à jour les lignes existantes (email pour les cavaliers, nom pour les chevaux)',
+        )
+        parser.add_argument(
+            '--row-by-row', action='store_true',
+            help='Ancien import ligne par ligne, pour comparer les performances',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        self.stdout.write(f"Import depuis : {path}")
+
+        try:
+            if options['row_by_row']:
+                rapport = importer_csv_ligne_par_ligne(path, options['format'])
+            else:
+                rapport = importer_csv(
+                    path, options['format'],
+                    batch_size=options['batch_size'],
+                    dry_run=options['dry_run'],
+                    upsert=options['upsert'],
+                )
+        except FileNotFoundError:
+            raise CommandError(f"Fichier non trouvé : {path}")
+
+        for numero, erreur in rapport.rejets:
+            self.stdout.write(self.style.WARNING(f"Ligne {numero} ignorée : {erreur}"))
+
+        prefixe = "[dry-run] " if options['dry_run'] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefixe}{rapport.lus} lignes lues, {rapport.crees} créées, "
+            f"{rapport.mis_a_jour} mises à jour, {len(rapport.rejets)} rejetées "
+            f"en {rapport.duree:.2f} s ({rapport.lignes_par_seconde:.0f} lignes/s)."
+        ))
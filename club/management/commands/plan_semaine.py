@@ -0,0 +1,35 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from club.planning import appliquer, planifier_semaine
+
+class Command(BaseCommand):
+    help = 'Affecte en une fois un cheval à chaque inscription, pour les séances des sept prochains jours'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--replanifier', action='store_true',
+            help='Réaffecte aussi les participations existantes',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Calcule le plan sans rien écrire')
+        parser.add_argument(
+            '--depuis', type=date.fromisoformat, metavar='AAAA-MM-JJ',
+            help="Premier des sept jours planifiés (aujourd'hui par défaut)",
+        )
+
+    def handle(self, *args, **options):
+        debut = time.perf_counter()
+        plan = planifier_semaine(replanifier=options['replanifier'], depuis=options['depuis'])
+        duree = time.perf_counter() - debut
+
+        for cavalier, cours, motif in plan.refus:
+            self.stdout.write(self.style.WARNING(f"{cavalier} – {cours} : {motif}"))
+        if not options['dry_run']:
+            appliquer(plan)
+
+        prefixe = "[dry-run] " if options['dry_run'] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefixe}{len(plan.affectations)} participations planifiées, "
+            f"{len(plan.refus)} refusées en {duree:.2f} s."
+        ))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from club.models import Cheval
+
+class Command(BaseCommand):
+    help = 'Recalcule les séances de travail et la disponibilité de tous les chevaux'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help="Signale les compteurs faux sans les corriger (échoue s'il y en a)",
+        )
+
+    def handle(self, *args, **options):
+        faux = Cheval.objects.seances_faussees().count()
+
+        if options['check']:
+            if faux:
+                raise CommandError(f"{faux} chevaux ont un compteur de séances faux.")
+            self.stdout.write(self.style.SUCCESS("Tous les compteurs de séances sont justes."))
+            return
+
+        total = Cheval.objects.recalculer_seances()
+        self.stdout.write(self.style.SUCCESS(f"{total} chevaux recalculés ({faux} corrigés)."))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from club.models import CavalierSemaine, ChevalJour, Participation, Seance
+
+
+class Command(BaseCommand):
+    help = (
+        "Vérifie et reconstruit l'occupation matérialisée : participants par séance, "
+        "séances par cheval et par jour, cours par cavalier et par semaine"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help="Signale les compteurs faux sans les corriger (échoue s'il y en a)",
+        )
+
+    def handle(self, *args, **options):
+        seances = Seance.objects.participants_faux().count()
+        jours = len(ChevalJour.objects.faux(Participation.objects.all()))
+        semaines = len(CavalierSemaine.objects.faux(Participation.objects.all()))
+
+        if options['check']:
+            if seances or jours or semaines:
+                raise CommandError(
+                    f"Occupation fausse : {seances} séances, {jours} jours de cheval et "
+                    f"{semaines} semaines de cavalier mal comptés."
+                )
+            self.stdout.write(self.style.SUCCESS("L'occupation est juste."))
+            return
+
+        with transaction.atomic():
+            total_seances = Seance.objects.recalculer_participants()
+            total_jours = ChevalJour.objects.all().reconstruire(Participation.objects.all())
+            total_semaines = CavalierSemaine.objects.all().reconstruire(Participation.objects.all())
+        self.stdout.write(self.style.SUCCESS(
+            f"{total_seances} séances recomptées ({seances} corrigées), "
+            f"{total_jours} jours de cheval reconstruits ({jours} corrigés), "
+            f"{total_semaines} semaines de cavalier reconstruites ({semaines} corrigées)."
+        ))
@@ -0,0 +1,65 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection, connections
+
+from club.models import Tache
+from club.taches import executer, prendre, traiter
+
+
+def _executer_dans_le_pool(nom, arguments):
+    """``executer`` dans un thread ou un processus du pool, qui ne garde pas sa connexion ouverte."""
+    try:
+        return executer(nom, arguments)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Exécute les tâches de fond mises en file (DJANGO_TACHES=file) : lots pris "
+        "par un UPDATE conditionnel (plusieurs workers possibles), exécutés dans un "
+        "pool de threads ou de processus, échecs replanifiés avec un délai croissant."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lot', type=int, default=200, help="Tâches prises à chaque tour")
+        parser.add_argument('--parallele', type=int, default=4, help="Threads ou processus du pool")
+        parser.add_argument('--processus', action='store_true', help="Pool de processus au lieu de threads")
+        parser.add_argument('--attente', type=float, default=1.0, help="Secondes entre deux tours à vide")
+        parser.add_argument('--une-fois', action='store_true', help="S'arrête quand la file est vide")
+
+    def handle(self, *args, **options):
+        parallele = options['parallele']
+        if options['processus']:
+            # Les processus ouvrent leurs propres connexions : aucune ne doit être héritée
+            connections.close_all()
+            pool = ProcessPoolExecutor(max_workers=parallele)
+        else:
+            pool = ThreadPoolExecutor(max_workers=parallele)
+
+        total = echecs = 0
+        debut = time.perf_counter()
+        try:
+            with pool:
+                while True:
+                    close_old_connections()
+                    taches = prendre(options['lot'])
+                    if not taches:
+                        if options['une_fois']:
+                            break
+                        time.sleep(options['attente'])
+                        continue
+                    reussies, echouees = traiter(taches, pool, parallele, fonction=_executer_dans_le_pool)
+                    total += reussies
+                    echecs += echouees
+                    self.stdout.write(f"{reussies} tâches exécutées, {echouees} en échec")
+        except KeyboardInterrupt:
+            pass
+
+        abandonnees = Tache.objects.filter(abandonnee_le__isnull=False).count()
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} tâches exécutées en {time.perf_counter() - debut:.1f} s, {echecs} échecs, "
+            f"{abandonnees} abandonnées en base."
+        ))
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+
+from club.generation import generer_club
+from club.models import Cavalier, Cheval, Cours, Inscription, Moniteur, Participation, Seance
+
+class Command(BaseCommand):
+    help = "Remplit la base avec un club fictif reproductible (voir club.generation)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cavaliers', type=int, default=10000)
+        parser.add_argument('--chevaux', type=int, default=500)
+        parser.add_argument('--cours', type=int, default=300)
+        parser.add_argument('--moniteurs', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--semaines', type=int, default=4, help="Semaines de séances créées à l'avance")
+        parser.add_argument('--vider', action='store_true',
+                            help="Supprime d'abord toutes les données du club (pas les comptes utilisateurs)")
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive')
+
+    def handle(self, *args, **options):
+        if options['vider'] and options['interactive']:
+            reponse = input("Toutes les données du club vont être supprimées. Continuer ? [oui/non] ")
+            if reponse != "oui":
+                raise CommandError("Annulé.")
+
+        debut = time.perf_counter()
+        with transaction.atomic():
+            if options['vider']:
+                # DELETE directs : tout part, inutile de passer par les signaux ligne à ligne.
+                # Les identifiants pouvant être réutilisés, le cache est vidé aussi.
+                for modele in (Participation, Inscription, Seance, Cours, Cavalier, Cheval, Moniteur):
+                    modele.objects.all()._raw_delete(modele.objects.db)
+                transaction.on_commit(cache.clear)
+            try:
+                crees = generer_club(
+                    cavaliers=options['cavaliers'], chevaux=options['chevaux'], cours=options['cours'],
+                    moniteurs=options['moniteurs'], seed=options['seed'], semaines=options['semaines'],
+                )
+            except IntegrityError as e:
+                raise CommandError(
+                    "Ce club existe déjà (emails en double) : relancez avec --vider ou un autre --seed."
+                ) from e
+
+        self.stdout.write(", ".join(f"{n} {nom}" for nom, n in crees.items()))
+        self.stdout.write(self.style.SUCCESS(f"Club généré en {time.perf_counter() - debut:.1f} s."))
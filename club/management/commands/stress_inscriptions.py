@@ -0,0 +1,147 @@
+import threading
+import time
+import uuid
+from datetime import time as heure
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, transaction
+from django.db.models import Count
+from django.test.utils import override_settings
+
+from club.inscriptions import PLACES_PAR_COURS, inscrire, inscrire_ou_attendre
+from club.models import Attente, Cavalier, Cheval, Cours, Participation
+
+
+def _en_parallele(taches, fonction, nb_threads):
+    """Passe chaque tâche à ``fonction`` depuis ``nb_threads`` threads ; compte les issues renvoyées."""
+    resultats = {'ok': 0, 'refus': 0, 'verrou': 0}
+    verrou_resultats = threading.Lock()
+    taches = iter(taches)
+    verrou_taches = threading.Lock()
+
+    def travailleur():
+        try:
+            while True:
+                with verrou_taches:
+                    tache = next(taches, None)
+                if tache is None:
+                    return
+                try:
+                    fonction(tache)
+                    issue = 'ok'
+                except ValidationError:
+                    issue = 'refus'
+                except OperationalError:
+                    issue = 'verrou'
+                with verrou_resultats:
+                    resultats[issue] += 1
+        finally:
+            connection.close()
+
+    debut = time.perf_counter()
+    threads = [threading.Thread(target=travailleur) for _ in range(nb_threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return resultats, time.perf_counter() - debut
+
+
+class Command(BaseCommand):
+    help = (
+        "Lance des inscriptions simultanées depuis plusieurs threads, puis des "
+        "désinscriptions simultanées qui promeuvent la liste d'attente, et vérifie "
+        "qu'aucune limite n'est dépassée (données temporaires supprimées à la fin)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=20)
+        parser.add_argument('--inscriptions', type=int, default=300)
+        parser.add_argument('--cours', type=int, default=12)
+        parser.add_argument('--chevaux', type=int, default=10)
+        parser.add_argument('--attentes', type=int, default=60,
+                            help="Cavaliers mis en liste d'attente avant les désinscriptions")
+
+    # Les mails de confirmation restent en mémoire : la console ne montre que le bilan
+    @override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite' and connection.settings_dict['NAME'] in ('', ':memory:'):
+            raise CommandError("Une base SQLite sur disque est nécessaire pour tester plusieurs connexions.")
+
+        marque = f"stress-{uuid.uuid4().hex[:8]}"
+        with transaction.atomic():
+            cours = [
+                Cours.objects.create(
+                    niveau=marque, jour=Cours.JOUR_CHOICES[i % 6][0],
+                    heure_debut=heure(8 + i % 12), heure_fin=heure(9 + i % 12),
+                )
+                for i in range(options['cours'])
+            ]
+            chevaux = Cheval.objects.bulk_create(
+                Cheval(nom=f"{marque}-{i}", race=marque, age=10) for i in range(options['chevaux'])
+            )
+            cavaliers = Cavalier.objects.bulk_create(
+                Cavalier(nom=marque, prenom=str(i), age=20, email=f"{marque}-{i}@example.com")
+                for i in range(options['inscriptions'])
+            )
+
+        resultats, duree = _en_parallele(
+            enumerate(cavaliers),
+            lambda t: inscrire(t[1], cours[t[0] % len(cours)], cheval=chevaux[t[0] % len(chevaux)]),
+            options['threads'],
+        )
+
+        # Listes d'attente, puis désinscriptions simultanées : chaque place
+        # libérée est donnée à une seule demande
+        en_attente = Cavalier.objects.bulk_create(
+            Cavalier(nom=marque, prenom=f"attente-{i}", age=20, email=f"{marque}-attente-{i}@example.com")
+            for i in range(options['attentes'])
+        )
+        for i, cavalier in enumerate(en_attente):
+            try:
+                inscrire_ou_attendre(cavalier, cours[i % len(cours)])
+            except ValidationError:
+                pass
+        a_annuler = list(Participation.objects.filter(cours__niveau=marque).values_list('pk', flat=True))
+        annulations, duree_annulations = _en_parallele(
+            a_annuler, lambda pk: Participation.objects.get(pk=pk).delete(), options['threads'],
+        )
+
+        try:
+            participations = Participation.objects.filter(cours__niveau=marque)
+            trop_pleins = participations.values('seance').annotate(n=Count('id')).filter(n__gt=PLACES_PAR_COURS)
+            chevaux_surmenes = participations.values('cheval', 'date').annotate(n=Count('id')).filter(n__gt=2)
+            doublons = participations.values('cheval', 'seance').annotate(n=Count('id')).filter(n__gt=1)
+            promues = Attente.objects.filter(seance__cours__niveau=marque, promue_le__isnull=False)
+            promues_sans_place = sum(
+                not participations.filter(cavalier_id=c, seance_id=s).exists()
+                for c, s in promues.values_list('cavalier_id', 'seance_id')
+            )
+            nb_promues = promues.count()
+            erreurs = [
+                f"{trop_pleins.count()} cours au-delà de {PLACES_PAR_COURS} cavaliers" if trop_pleins.exists() else None,
+                f"{chevaux_surmenes.count()} chevaux montés plus de 2 fois par jour" if chevaux_surmenes.exists() else None,
+                f"{doublons.count()} chevaux montés deux fois dans le même cours" if doublons.exists() else None,
+                f"{promues_sans_place} demandes promues sans participation" if promues_sans_place else None,
+            ]
+        finally:
+            Cours.objects.filter(niveau=marque).delete()
+            Cheval.objects.filter(race=marque).delete()
+            Cavalier.objects.filter(nom=marque).delete()
+
+        total = sum(resultats.values())
+        self.stdout.write(
+            f"{total} inscriptions en {duree:.2f} s ({total / duree:.0f}/s) : "
+            f"{resultats['ok']} acceptées, {resultats['refus']} refusées, "
+            f"{resultats['verrou']} abandonnées sur verrou."
+        )
+        self.stdout.write(
+            f"{len(a_annuler)} désinscriptions en {duree_annulations:.2f} s : "
+            f"{nb_promues} demandes promues sur {options['attentes']}, "
+            f"{annulations['verrou']} abandonnées sur verrou."
+        )
+        erreurs = [e for e in erreurs if e]
+        if erreurs:
+            raise CommandError("Limites dépassées : " + ", ".join(erreurs))
+        self.stdout.write(self.style.SUCCESS("Aucune limite dépassée."))
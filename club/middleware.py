@@ -0,0 +1,179 @@
+import heapq
+import json
+import logging
+import os
+import sysconfig
+import time
+import traceback
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger('club.instrumentation')
+logger_lent = logging.getLogger('club.instrumentation.lent')
+
+PAR_DEFAUT = {
+    'SERVER_TIMING': True,    # en-tête Server-Timing sur chaque réponse
+    'SEUIL_VUE_MS': 500,      # au-delà : journal des requêtes lentes
+    'SEUIL_REQUETE_MS': 100,  # une seule requête SQL au-delà : idem
+    'SEUIL_REQUETES': 50,     # plus de requêtes SQL que cela : idem
+    'REQUETES_LENTES': 3,     # nombre de requêtes SQL les plus lentes gardées
+    'PILE': 8,                # lignes de pile gardées pour une requête répétée
+}
+
+
+def reglages():
+    return {**PAR_DEFAUT, **getattr(settings, 'INSTRUMENTATION', {})}
+
+
+# Django, bibliothèques et Python lui-même : exclus des piles relevées
+_EXTERNES = tuple({sysconfig.get_paths()[cle] for cle in ('stdlib', 'platstdlib', 'purelib', 'platlib')})
+
+
+def _pile():
+    """Appels du code du projet (hors Django et bibliothèques) qui ont mené à la requête SQL."""
+    base = str(settings.BASE_DIR) + os.sep
+    return [
+        f"{c.filename.removeprefix(base)}:{c.lineno} {c.name}"
+        for c in traceback.extract_stack()
+        if c.filename != __file__ and not c.filename.startswith(_EXTERNES)
+    ]
+
+
+class Releve:
+    """Requêtes SQL d'une requête HTTP, relevées par ``_relever``."""
+
+    def __init__(self, lentes, profondeur):
+        self.nombre = 0
+        self.duree = 0.0
+        self.lentes = []      # tas des (durée, sql) les plus lentes
+        self.nb_lentes = lentes
+        self.profondeur = profondeur
+        self.occurrences = {} # sql -> nombre d'exécutions
+        self.piles = {}       # sql -> pile de la première répétition
+
+    def __call__(self, execute, sql, params, many, context):
+        debut = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duree = time.perf_counter() - debut
+            self.nombre += 1
+            self.duree += duree
+            if len(self.lentes) < self.nb_lentes:
+                heapq.heappush(self.lentes, (duree, sql))
+            elif duree > self.lentes[0][0]:
+                heapq.heapreplace(self.lentes, (duree, sql))
+            n = self.occurrences[sql] = self.occurrences.get(sql, 0) + 1
+            # La pile n'est relevée qu'une fois par requête répétée : le coût reste marginal
+            if n == 2:
+                self.piles[sql] = _pile()[-self.profondeur:]
+
+    def doublons(self):
+        return [
+            {"sql": sql, "fois": self.occurrences[sql], "pile": pile}
+            for sql, pile in sorted(self.piles.items(), key=lambda e: -self.occurrences[e[0]])
+        ]
+
+
+# === BRANCHEMENT SUR LES CONNEXIONS ===
+# Le relevé de la requête HTTP en cours suit le contexte : sync_to_async le
+# transmet au thread où l'ORM asynchrone exécute ses requêtes, sans qu'il
+# faille brancher un wrapper sur la connexion de ce thread à chaque requête.
+_releve_courant = ContextVar('releve_sql', default=None)
+
+
+def _relever(execute, sql, params, many, context):
+    releve = _releve_courant.get()
+    if releve is None:
+        return execute(sql, params, many, context)
+    return releve(execute, sql, params, many, context)
+
+
+def _brancher(connection):
+    if _relever not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_relever)
+
+
+@receiver(connection_created)
+def _connexion_ouverte(sender, connection, **kwargs):
+    _brancher(connection)
+
+
+class InstrumentationMiddleware:
+    """
+    Mesure chaque requête HTTP : nombre et durée des requêtes SQL, requêtes
+    les plus lentes, durée de la vue.
+
+    Le résultat part dans l'en-tête ``Server-Timing`` et dans une ligne JSON
+    du journal ``club.instrumentation``. Au-delà des seuils de
+    ``settings.INSTRUMENTATION``, le détail (requêtes lentes, requêtes
+    répétées et le code qui les a lancées) va dans ``club.instrumentation.lent``.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.reglages = reglages()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        # Connexions ouvertes avant le chargement de ce module
+        for alias in connections:
+            _brancher(connections[alias])
+        releve = Releve(self.reglages['REQUETES_LENTES'], self.reglages['PILE'])
+        debut = time.perf_counter()
+        jeton = _releve_courant.set(releve)
+        try:
+            response = self.get_response(request)
+        finally:
+            _releve_courant.reset(jeton)
+        return self._conclure(request, response, releve, debut)
+
+    async def __acall__(self, request):
+        releve = Releve(self.reglages['REQUETES_LENTES'], self.reglages['PILE'])
+        debut = time.perf_counter()
+        jeton = _releve_courant.set(releve)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _releve_courant.reset(jeton)
+        return self._conclure(request, response, releve, debut)
+
+    def _conclure(self, request, response, releve, debut):
+        r = self.reglages
+        vue_ms = (time.perf_counter() - debut) * 1000
+        sql_ms = releve.duree * 1000
+
+        if r['SERVER_TIMING']:
+            response.headers['Server-Timing'] = (
+                f'sql;dur={sql_ms:.1f};desc="{releve.nombre} SQL", vue;dur={vue_ms:.1f}'
+            )
+
+        mesure = {
+            "methode": request.method,
+            "chemin": request.path,
+            "statut": response.status_code,
+            "vue_ms": round(vue_ms, 1),
+            "sql_ms": round(sql_ms, 1),
+            "requetes": releve.nombre,
+        }
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(mesure, ensure_ascii=False))
+
+        lentes = sorted(releve.lentes, reverse=True)
+        if (vue_ms > r['SEUIL_VUE_MS'] or releve.nombre > r['SEUIL_REQUETES']
+                or (lentes and lentes[0][0] * 1000 > r['SEUIL_REQUETE_MS'])):
+            mesure["plus_lentes"] = [{"ms": round(d * 1000, 1), "sql": sql} for d, sql in lentes]
+            mesure["doublons"] = releve.doublons()
+            logger_lent.warning(json.dumps(mesure, ensure_ascii=False))
+        return response
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:24
+
+from django.db import migrations, models
+
+
+def normaliser_niveaux(apps, schema_editor):
+    Cours = apps.get_model('club', 'Cours')
+    cours = list(Cours.objects.all())
+    for c in cours:
+        c.niveau_normalise = c.niveau.strip().lower()
+    Cours.objects.bulk_update(cours, ['niveau_normalise'], batch_size=500)
+
+
+def verifier_emails(apps, schema_editor):
+    """
+    Refuse de migrer tant que deux cavaliers partagent un email : les fusionner
+    (participations, compte utilisateur) demande un choix humain.
+    """
+    Cavalier = apps.get_model('club', 'Cavalier')
+    doublons = (Cavalier.objects.values('email').annotate(n=models.Count('pk')).filter(n__gt=1)
+                .order_by('email').values_list('email', flat=True))
+    if doublons:
+        lignes = [
+            f"  {email} : cavaliers "
+            + ", ".join(map(str, Cavalier.objects.filter(email=email).order_by('pk').values_list('pk', flat=True)))
+            for email in doublons
+        ]
+        raise RuntimeError(
+            "Emails de cavaliers en double : corrigez-les dans l'admin avant de migrer.\n" + "\n".join(lignes)
+        )
+
+
+def supprimer_participations_en_double(apps, schema_editor):
+    """
+    Sans date, deux participations du même cheval (ou du même cavalier) au même
+    cours sont redondantes : seule la plus ancienne est gardée.
+    """
+    Participation = apps.get_model('club', 'Participation')
+    for champ in ('cheval', 'cavalier'):
+        premieres = Participation.objects.values(champ, 'cours').annotate(pk_min=models.Min('pk')).values('pk_min')
+        Participation.objects.exclude(pk__in=premieres).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('club', '0006_cavalier_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cours',
+            name='niveau_normalise',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.RunPython(normaliser_niveaux, migrations.RunPython.noop),
+        migrations.RunPython(verifier_emails, migrations.RunPython.noop),
+        migrations.RunPython(supprimer_participations_en_double, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='cavalier',
+            name='email',
+            field=models.EmailField(max_length=254, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='cours',
+            name='jour',
+            field=models.CharField(choices=[('lundi', 'Lundi'), ('mardi', 'Mardi'), ('mercredi', 'Mercredi'), ('jeudi', 'Jeudi'), ('vendredi', 'Vendredi'), ('samedi', 'Samedi')], db_index=True, max_length=10),
+        ),
+        migrations.AddConstraint(
+            model_name='participation',
+            constraint=models.UniqueConstraint(fields=('cheval', 'cours'), name='un_cheval_par_cours',
+                violation_error_message="Ce cheval est déjà monté dans ce cours."),
+        ),
+        migrations.AddConstraint(
+            model_name='participation',
+            constraint=models.UniqueConstraint(fields=('cavalier', 'cours'), name='une_inscription_par_cours',
+                violation_error_message="Ce cavalier participe déjà à ce cours."),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:30
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def creer_revision(apps, schema_editor):
+    apps.get_model('club', 'Revision').objects.get_or_create(nom='club')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('club', '0007_index_et_contraintes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Revision',
+            fields=[
+                ('nom', models.CharField(max_length=30, primary_key=True, serialize=False)),
+                ('numero', models.PositiveBigIntegerField(default=0)),
+                ('modifie', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.RunPython(creer_revision, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,99 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from club.calendrier import aujourd_hui, lundi, prochaine_date
+
+
+def rattacher_participations(apps, schema_editor):
+    """
+    Sans date, une participation était la réservation en cours de son cours :
+    elle va à la séance de ce cours dans la semaine courante. Celles d'un jour
+    déjà passé deviennent de l'historique et ne prennent pas de place dans les
+    séances à venir.
+    """
+    Participation = apps.get_model('club', 'Participation')
+    Seance = apps.get_model('club', 'Seance')
+    debut = lundi(aujourd_hui())
+    seances = {}
+    a_jour = []
+    for p in Participation.objects.select_related('cours').iterator():
+        if p.cours_id not in seances:
+            seances[p.cours_id], _ = Seance.objects.get_or_create(
+                cours_id=p.cours_id, date=prochaine_date(p.cours.jour, depuis=debut),
+            )
+        p.seance = seances[p.cours_id]
+        p.date = p.seance.date
+        a_jour.append(p)
+    Participation.objects.bulk_update(a_jour, ['seance', 'date'], batch_size=500)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('club', '0008_revision'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Seance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(db_index=True)),
+                ('cours', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seances', to='club.cours')),
+            ],
+            options={
+                'ordering': ['date'],
+                'constraints': [models.UniqueConstraint(fields=('cours', 'date'), name='une_seance_par_cours_et_date')],
+            },
+        ),
+        migrations.RemoveConstraint(
+            model_name='participation',
+            name='un_cheval_par_cours',
+        ),
+        migrations.RemoveConstraint(
+            model_name='participation',
+            name='une_inscription_par_cours',
+        ),
+        migrations.AddField(
+            model_name='participation',
+            name='seance',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='participations', to='club.seance'),
+        ),
+        migrations.AddField(
+            model_name='participation',
+            name='date',
+            field=models.DateField(editable=False, null=True),
+        ),
+        migrations.RunPython(rattacher_participations, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='participation',
+            name='seance',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='participations', to='club.seance'),
+        ),
+        migrations.AlterField(
+            model_name='participation',
+            name='date',
+            field=models.DateField(editable=False),
+        ),
+        migrations.AddConstraint(
+            model_name='participation',
+            constraint=models.UniqueConstraint(fields=('cheval', 'seance'), name='un_cheval_par_seance', violation_error_message='Ce cheval est déjà monté dans ce cours.'),
+        ),
+        migrations.AddConstraint(
+            model_name='participation',
+            constraint=models.UniqueConstraint(fields=('cavalier', 'seance'), name='une_inscription_par_seance', violation_error_message='Ce cavalier participe déjà à ce cours.'),
+        ),
+        migrations.AddIndex(
+            model_name='participation',
+            index=models.Index(fields=['cavalier', 'date'], name='participation_cavalier_date'),
+        ),
+        migrations.AddIndex(
+            model_name='participation',
+            index=models.Index(fields=['cheval', 'date'], name='participation_cheval_date'),
+        ),
+        migrations.AddIndex(
+            model_name='participation',
+            index=models.Index(fields=['date', 'cheval'], name='participation_date_cheval'),
+        ),
+    ]
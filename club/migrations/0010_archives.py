@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('club', '0009_seances'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InscriptionArchivee',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('date_inscription', models.DateField()),
+                ('cavalier', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='club.cavalier')),
+                ('cours', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='club.cours')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ParticipationArchivee',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('date', models.DateField(db_index=True)),
+                ('niveau', models.CharField(max_length=100)),
+                ('cavalier', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='club.cavalier')),
+                ('cheval', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='club.cheval')),
+                ('cours', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='club.cours')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BilanCavalier',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('saison', models.CharField(max_length=9)),
+                ('seances', models.PositiveIntegerField(default=0)),
+                ('concours', models.PositiveIntegerField(default=0)),
+                ('cavalier', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='club.cavalier')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('cavalier', 'saison'), name='un_bilan_par_cavalier_et_saison')],
+            },
+        ),
+        migrations.CreateModel(
+            name='BilanCheval',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('saison', models.CharField(max_length=9)),
+                ('seances', models.PositiveIntegerField(default=0)),
+                ('cheval', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='club.cheval')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('cheval', 'saison'), name='un_bilan_par_cheval_et_saison')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:54
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('club', '0010_archives'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Attente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('demandee_le', models.DateTimeField(default=django.utils.timezone.now)),
+                ('promue_le', models.DateTimeField(blank=True, null=True)),
+                ('cavalier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='club.cavalier')),
+                ('cheval', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='club.cheval')),
+                ('seance', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attentes', to='club.seance')),
+            ],
+            options={
+                'ordering': ['pk'],
+                'indexes': [models.Index(condition=models.Q(('promue_le__isnull', True)), fields=['seance', 'id'], name='attente_file')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('promue_le__isnull', True)), fields=('cavalier', 'seance'), name='une_attente_par_seance', violation_error_message='Ce cavalier attend déjà une place dans ce cours.')],
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def compter_occupation(apps, schema_editor):
+    Participation = apps.get_model('club', 'Participation')
+    Seance = apps.get_model('club', 'Seance')
+    ChevalJour = apps.get_model('club', 'ChevalJour')
+    Seance.objects.update(participants=Coalesce(Subquery(
+        Participation.objects.filter(seance=OuterRef('pk'))
+        .order_by().values('seance').annotate(n=Count('pk')).values('n')
+    ), Value(0)))
+    comptes = Participation.objects.order_by().values_list('cheval', 'date').annotate(n=Count('pk'))
+    ChevalJour.objects.bulk_create(
+        [ChevalJour(cheval_id=c, date=d, seances=n) for c, d, n in comptes.iterator()], batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('club', '0011_attentes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='seance',
+            name='participants',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='ChevalJour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('seances', models.PositiveSmallIntegerField(default=0)),
+                ('cheval', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='jours', to='club.cheval')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date', 'cheval'), name='un_compte_par_jour_et_cheval')],
+            },
+        ),
+        migrations.RunPython(compter_occupation, migrations.RunPython.noop),
+    ]
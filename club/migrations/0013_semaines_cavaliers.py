@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncWeek
+
+
+def compter_semaines(apps, schema_editor):
+    Participation = apps.get_model('club', 'Participation')
+    CavalierSemaine = apps.get_model('club', 'CavalierSemaine')
+    comptes = Participation.objects.order_by().values_list('cavalier', TruncWeek('date')).annotate(n=Count('pk'))
+    CavalierSemaine.objects.bulk_create(
+        [CavalierSemaine(cavalier_id=c, lundi=l, cours=n) for c, l, n in comptes.iterator()], batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('club', '0012_occupation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CavalierSemaine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lundi', models.DateField()),
+                ('cours', models.PositiveSmallIntegerField(default=0)),
+                ('cavalier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='semaines', to='club.cavalier')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('cavalier', 'lundi'), name='un_compte_par_semaine_et_cavalier')],
+            },
+        ),
+        migrations.RunPython(compter_semaines, migrations.RunPython.noop),
+    ]
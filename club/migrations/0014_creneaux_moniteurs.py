@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('club', '0013_semaines_cavaliers'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cours',
+            index=models.Index(fields=['entraineur', 'jour', 'heure_debut'], name='cours_moniteur_creneau'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:31
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('club', '0014_creneaux_moniteurs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nom', models.CharField(max_length=50)),
+                ('cle', models.CharField(max_length=200)),
+                ('arguments', models.JSONField(default=dict)),
+                ('essais', models.PositiveSmallIntegerField(default=0)),
+                ('executer_apres', models.DateTimeField(default=django.utils.timezone.now)),
+                ('prise_le', models.DateTimeField(blank=True, null=True)),
+                ('jeton', models.CharField(blank=True, max_length=32)),
+                ('abandonnee_le', models.DateTimeField(blank=True, null=True)),
+                ('erreur', models.TextField(blank=True)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('abandonnee_le__isnull', True)), fields=['executer_apres'], name='taches_a_executer')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('abandonnee_le__isnull', True), ('prise_le__isnull', True)), fields=('cle',), name='une_tache_en_attente_par_cle')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:35
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('club', '0015_taches'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Avis',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nature', models.CharField(choices=[('inscription', 'Inscription'), ('annulation', 'Annulation')], max_length=12)),
+                ('cree_le', models.DateTimeField(default=django.utils.timezone.now)),
+                ('cavalier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='avis', to='club.cavalier')),
+                ('cheval', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='club.cheval')),
+                ('seance', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='club.seance')),
+            ],
+            options={
+                'verbose_name_plural': 'avis',
+                'ordering': ['pk'],
+            },
+        ),
+    ]
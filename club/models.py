@@ -1,10 +1,53 @@
-from django.db import models
+from collections import Counter
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import models, transaction
 from django.core.exceptions import ValidationError
-from django.db.models import Count
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, TruncWeek
+from django.db.models.lookups import LessThanOrEqual
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
 from django.utils import timezone
 from django.contrib.auth.models import User
 
+from .calendrier import aujourd_hui, dates, lundi, prochaine_date, semaine, sept_jours
+
+# Au-delà de ce nombre de séances à venir (depuis le lundi de la semaine en
+# cours), le cheval n'est plus disponible
+LIMITE_SEANCES = 8
+
+# Envoyé par Participation.objects.bulk_create() et .update(), qui n'émettent
+# pas post_save : ``cavalier_ids`` liste les cavaliers concernés
+participations_modifiees = Signal()
+
+
 # === CHEVAL ===
+class ChevalQuerySet(models.QuerySet):
+    def recalculer_seances(self):
+        """
+        Recompte les séances à venir de tous les chevaux du queryset en un seul
+        UPDATE. À lancer chaque lundi (recompute_chevaux) : les séances de la
+        semaine passée sortent alors du compteur.
+        """
+        seances = Coalesce(Subquery(
+            Participation.objects.filter(cheval=OuterRef('pk'), date__gte=semaine()[0])
+            .order_by().values('cheval').annotate(n=Count('pk')).values('n')
+        ), Value(0))
+        with transaction.atomic(using=self.db):
+            n = self.update(
+                seances_travail=seances,
+                disponible=LessThanOrEqual(seances, LIMITE_SEANCES),
+            )
+            Revision.incrementer()
+        return n
+
+    def seances_faussees(self):
+        """Chevaux dont le compteur ne correspond plus aux participations."""
+        a_venir = Q(participation__date__gte=semaine()[0])
+        return self.annotate(n=Count('participation', filter=a_venir)).exclude(seances_travail=F('n'))
+
+
 class Cheval(models.Model):
     nom = models.CharField(max_length=100)
     race = models.CharField(max_length=100)
@@ -12,15 +55,21 @@ class Cheval(models.Model):
     disponible = models.BooleanField(default=True)
     seances_travail = models.IntegerField(default=0)
 
+    objects = ChevalQuerySet.as_manager()
+
+    @staticmethod
+    def a_recompter(cheval_ids):
+        """
+        Confie le recomptage des séances de ces chevaux à la file de tâches
+        (``club.taches``) : un recomptage complet, qui peut être dédoublonné
+        et rejoué sans fausser le compteur.
+        """
+        from .taches import mettre_en_file
+        mettre_en_file('chevaux', {pk: {'cheval': pk} for pk in cheval_ids if pk})
+
     def update_disponibilite(self):
-        from .models import Participation
-        semaine = Participation.objects.filter(
-            cheval=self,
-            cours__jour__in=['lundi', 'mardi', 'mercredi', 'jeudi', 'vendredi', 'samedi']
-        ).count()
-        self.seances_travail = semaine
-        self.disponible = semaine <= 8
-        self.save()
+        Cheval.objects.filter(pk=self.pk).recalculer_seances()
+        self.refresh_from_db(fields=['seances_travail', 'disponible'])
 
     def __str__(self):
         return self.nom
@@ -32,11 +81,12 @@ class Cavalier(models.Model):
     nom = models.CharField(max_length=100)
     prenom = models.CharField(max_length=100)
     age = models.IntegerField()
-    email = models.EmailField()
+    email = models.EmailField(unique=True)
     cheval_possede = models.ForeignKey(Cheval, on_delete=models.SET_NULL, null=True, blank=True)
 
-    def nb_cours(self):
-        return self.participation_set.count()
+    def nb_cours(self, jour=None):
+        """Nombre de cours de la semaine de ``jour`` (la semaine en cours par défaut), lu dans CavalierSemaine."""
+        return self.semaines.filter(lundi=lundi(jour or aujourd_hui())).values_list('cours', flat=True).first() or 0
 
     def __str__(self):
         return f"{self.prenom} {self.nom}"
@@ -54,6 +104,12 @@ class Moniteur(models.Model):
 
 
 # === COURS ===
+class CoursQuerySet(models.QuerySet):
+    def chevauchant(self, jour, debut, fin):
+        """Cours du ``jour`` dont le créneau chevauche [``debut``, ``fin``[ (voir ``creneaux``)."""
+        return self.filter(jour=jour, heure_debut__lt=fin, heure_fin__gt=debut)
+
+
 class Cours(models.Model):
     JOUR_CHOICES = [
         ('lundi', 'Lundi'),
@@ -65,70 +121,517 @@ class Cours(models.Model):
     ]
 
     niveau = models.CharField(max_length=100)
-    jour = models.CharField(max_length=10, choices=JOUR_CHOICES)
+    # Niveau en minuscules, indexé : remplace les filtres niveau__iexact
+    niveau_normalise = models.CharField(max_length=100, editable=False, db_index=True, default='')
+    jour = models.CharField(max_length=10, choices=JOUR_CHOICES, db_index=True)
     heure_debut = models.TimeField()
     heure_fin = models.TimeField()
     entraineur = models.ForeignKey(Moniteur, on_delete=models.SET_NULL, null=True)
 
+    objects = CoursQuerySet.as_manager()
+
+    def clean(self):
+        if self.heure_debut and self.heure_fin and self.heure_fin <= self.heure_debut:
+            raise ValidationError({'heure_fin': "Le cours doit finir après son début."})
+        # 🧑‍🏫 Moniteur déjà pris sur ce créneau ? (index moniteur, jour, début)
+        if self.entraineur_id and self.heure_debut and self.heure_fin:
+            autre = Cours.objects.filter(entraineur_id=self.entraineur_id).exclude(pk=self.pk) \
+                .chevauchant(self.jour, self.heure_debut, self.heure_fin).first()
+            if autre:
+                raise ValidationError(f"{self.entraineur} donne déjà le cours « {autre} » sur ce créneau.",
+                                      code='moniteur_creneau')
+
+    def save(self, *args, **kwargs):
+        self.niveau_normalise = self.niveau.strip().lower()
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.niveau} - {self.jour} {self.heure_debut.strftime('%H:%M')}"
 
     class Meta:
         ordering = ['jour', 'heure_debut']
+        indexes = [
+            # Créneaux d'un moniteur un jour donné, triés par début (chevauchements)
+            models.Index(fields=['entraineur', 'jour', 'heure_debut'], name='cours_moniteur_creneau'),
+        ]
+
+
+# === SÉANCE ===
+class SeanceQuerySet(models.QuerySet):
+    def generer(self, semaines=4, depuis=None, cours=None):
+        """
+        Crée à l'avance les séances datées des ``semaines`` à venir (à partir de
+        ``depuis``, aujourd'hui par défaut) ; celles qui existent déjà sont
+        gardées. Renvoie le nombre de séances créées.
+        """
+        depuis = depuis or aujourd_hui()
+        cours = Cours.objects.all() if cours is None else cours
+        seances = [
+            Seance(cours_id=pk, date=d)
+            for pk, jour in cours.values_list('pk', 'jour')
+            for d in dates(jour, depuis, semaines)
+        ]
+        avant = self.count()
+        self.bulk_create(seances, batch_size=500, ignore_conflicts=True)
+        return self.count() - avant
+
+    def obtenir(self, couples):
+        """
+        Séances ``{(cours_id, date): séance}`` des couples donnés : une requête
+        quand elles ont été générées à l'avance, deux de plus pour créer les autres.
+        """
+        couples = set(couples)
+        if not couples:
+            return {}
+
+        def lire():
+            trouvees = self.filter(cours_id__in={c for c, _ in couples}, date__in={d for _, d in couples})
+            return {(s.cours_id, s.date): s for s in trouvees if (s.cours_id, s.date) in couples}
+
+        seances = lire()
+        if len(seances) < len(couples):
+            self.bulk_create([Seance(cours_id=c, date=d) for c, d in couples - seances.keys()],
+                             ignore_conflicts=True)
+            seances = lire()
+        return seances
+
+    def recalculer_participants(self):
+        """Recompte les participants des séances du queryset en un seul UPDATE."""
+        return self.update(participants=Coalesce(Subquery(
+            Participation.objects.filter(seance=OuterRef('pk'))
+            .order_by().values('seance').annotate(n=Count('pk')).values('n')
+        ), Value(0)))
+
+    def participants_faux(self):
+        """Séances dont le compteur ne correspond plus aux participations."""
+        return self.annotate(n=Count('participations')).exclude(participants=F('n'))
+
+
+class Seance(models.Model):
+    """Occurrence datée d'un cours hebdomadaire, générée à l'avance."""
+    cours = models.ForeignKey(Cours, on_delete=models.CASCADE, related_name="seances")
+    date = models.DateField(db_index=True)
+    # Nombre de participations, tenu à jour par ajuster_occupation
+    participants = models.PositiveSmallIntegerField(default=0, editable=False)
+
+    objects = SeanceQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['date']
+        constraints = [
+            models.UniqueConstraint(fields=['cours', 'date'], name='une_seance_par_cours_et_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.cours} ({self.date:%d/%m/%Y})"
+
+
+# === OCCUPATION MATÉRIALISÉE ===
+# Participations par séance (Seance.participants), par cheval et par jour
+# (ChevalJour) et par cavalier et par semaine (CavalierSemaine), tenues à
+# jour à chaque changement de participation : les écrans d'inscription
+# lisent ces compteurs au lieu de compter les participations.
+# recompute_occupation vérifie et reconstruit.
+class ChevalJourQuerySet(models.QuerySet):
+    def pleins(self, date, limite=2):
+        """Chevaux (identifiants) déjà montés ``limite`` fois le ``date``."""
+        return self.filter(date=date, seances__gte=limite).values('cheval')
+
+    def _comptes(self, participations):
+        return participations.order_by().values_list('cheval', 'date').annotate(n=Count('pk'))
+
+    def reconstruire(self, participations):
+        """Remplace les lignes du queryset par les comptes de ``participations`` (mêmes chevaux, mêmes jours)."""
+        with transaction.atomic(using=self.db):
+            self.delete()
+            return len(ChevalJour.objects.bulk_create(
+                [ChevalJour(cheval_id=c, date=d, seances=n) for c, d, n in self._comptes(participations).iterator()],
+                batch_size=1000,
+            ))
+
+    def faux(self, participations):
+        """Couples ``(cheval_id, date)`` dont le compte diffère de celui de ``participations``."""
+        attendus = {(c, d): n for c, d, n in self._comptes(participations).iterator()}
+        actuels = {(c, d): n for c, d, n in self.filter(seances__gt=0).values_list('cheval', 'date', 'seances').iterator()}
+        return {cle for cle in attendus.keys() | actuels.keys() if attendus.get(cle) != actuels.get(cle)}
+
+
+class ChevalJour(models.Model):
+    """Nombre de séances d'un cheval un jour donné."""
+    cheval = models.ForeignKey(Cheval, on_delete=models.CASCADE, related_name="jours")
+    date = models.DateField()
+    seances = models.PositiveSmallIntegerField(default=0)
+
+    objects = ChevalJourQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'cheval'], name='un_compte_par_jour_et_cheval'),
+        ]
+
+    def __str__(self):
+        return f"{self.cheval} : {self.seances} séance(s) le {self.date:%d/%m/%Y}"
+
+
+class CavalierSemaineQuerySet(models.QuerySet):
+    def _comptes(self, participations):
+        return participations.order_by().values_list('cavalier', TruncWeek('date')).annotate(n=Count('pk'))
+
+    def reconstruire(self, participations):
+        """Remplace les lignes du queryset par les comptes de ``participations`` (mêmes cavaliers, mêmes semaines)."""
+        with transaction.atomic(using=self.db):
+            self.delete()
+            return len(CavalierSemaine.objects.bulk_create(
+                [CavalierSemaine(cavalier_id=c, lundi=l, cours=n) for c, l, n in self._comptes(participations).iterator()],
+                batch_size=1000,
+            ))
+
+    def faux(self, participations):
+        """Couples ``(cavalier_id, lundi)`` dont le compte diffère de celui de ``participations``."""
+        attendus = {(c, l): n for c, l, n in self._comptes(participations).iterator()}
+        actuels = {(c, l): n for c, l, n in self.filter(cours__gt=0).values_list('cavalier', 'lundi', 'cours').iterator()}
+        return {cle for cle in attendus.keys() | actuels.keys() if attendus.get(cle) != actuels.get(cle)}
+
+
+class CavalierSemaine(models.Model):
+    """Nombre de cours d'un cavalier une semaine donnée (du lundi au dimanche)."""
+    cavalier = models.ForeignKey(Cavalier, on_delete=models.CASCADE, related_name="semaines")
+    lundi = models.DateField()
+    cours = models.PositiveSmallIntegerField(default=0)
+
+    objects = CavalierSemaineQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cavalier', 'lundi'], name='un_compte_par_semaine_et_cavalier'),
+        ]
+
+    def __str__(self):
+        return f"{self.cavalier} : {self.cours} cours la semaine du {self.lundi:%d/%m/%Y}"
+
+
+def participants_du_cours(jours=None):
+    """
+    Expression pour un queryset de cours : participants de sa séance entre
+    les dates ``jours`` (par défaut ``sept_jours()``, soit la prochaine), 0 sans séance.
+    """
+    return Coalesce(Subquery(
+        Seance.objects.filter(cours=OuterRef('pk'), date__range=jours or sept_jours()).values('participants')[:1]
+    ), Value(0))
+
+
+def _par_valeur(deltas):
+    par_delta = {}
+    for cle, delta in deltas.items():
+        if delta:
+            par_delta.setdefault(delta, []).append(cle)
+    return par_delta
+
+
+def _par_valeur_et_cle(deltas):
+    """``{(id, clé): delta}`` regroupés en ``{(clé, delta): [id, ...]}`` : un UPDATE par groupe."""
+    groupes = {}
+    for (pk, cle), delta in deltas.items():
+        if delta:
+            groupes.setdefault((cle, delta), []).append(pk)
+    return groupes
+
+
+def _augmenter(lignes, champ, delta, nombre, limite, erreur):
+    """
+    Ajoute ``delta`` à ``champ`` sur ``lignes`` (``nombre`` lignes) par un UPDATE
+    en F(). Sous ``limite``, une hausse ne passe que là où le compteur reste
+    dans la limite (``UPDATE ... WHERE champ <= limite - delta``) : s'il manque
+    une ligne, ``erreur`` est levée et la transaction appelante annulée.
+    """
+    borne = limite is not None and delta > 0
+    if borne:
+        lignes = lignes.filter(**{f"{champ}__lte": limite - delta})
+    if lignes.update(**{champ: F(champ) + delta}) < nombre and borne:
+        raise erreur
+
+
+def ajuster_occupation(ajoutees=(), retirees=(), places=None, max_cours=None):
+    """
+    Reporte sur l'occupation des participations ajoutées et retirées, données
+    en quadruplets ``(cavalier_id, cheval_id, seance_id, date)`` : des UPDATE
+    en F() groupés par variation (voir ``_par_valeur``), et un
+    INSERT pour les jours de cheval et les semaines de cavalier pas encore
+    comptés.
+
+    ``places`` et ``max_cours`` bornent les hausses des séances et des
+    semaines de cavalier : l'UPDATE conditionnel sert de garde de capacité,
+    et lève une ``ValidationError`` (``complet`` ou ``limite_semaine``)
+    quand il ne trouve pas de place.
+    """
+    seances, jours, semaines = Counter(), Counter(), Counter()
+    for signe, lignes in ((1, ajoutees), (-1, retirees)):
+        for cavalier_id, cheval_id, seance_id, date in lignes:
+            seances[seance_id] += signe
+            jours[(cheval_id, date)] += signe
+            semaines[(cavalier_id, lundi(date))] += signe
+    nouveaux = [ChevalJour(cheval_id=c, date=d) for (c, d), n in jours.items() if n > 0]
+    if nouveaux:
+        ChevalJour.objects.bulk_create(nouveaux, ignore_conflicts=True)
+    nouvelles = [CavalierSemaine(cavalier_id=c, lundi=l) for (c, l), n in semaines.items() if n > 0]
+    if nouvelles:
+        CavalierSemaine.objects.bulk_create(nouvelles, ignore_conflicts=True)
+
+    complet = ValidationError("Ce cours est déjà complet.", code='complet')
+    for delta, ids in _par_valeur(seances).items():
+        _augmenter(Seance.objects.filter(pk__in=ids), 'participants', delta, len(ids), places, complet)
+    for (date, delta), ids in _par_valeur_et_cle(jours).items():
+        ChevalJour.objects.filter(date=date, cheval_id__in=ids).update(seances=F('seances') + delta)
+    limite = ValidationError(f"Tu es déjà inscrit à {max_cours} cours cette semaine.", code='limite_semaine')
+    for (debut, delta), ids in _par_valeur_et_cle(semaines).items():
+        _augmenter(CavalierSemaine.objects.filter(lundi=debut, cavalier_id__in=ids), 'cours', delta, len(ids),
+                   max_cours, limite)
+
+
+def recompter_occupation(participations):
+    """Recompte l'occupation des séances, chevaux, cavaliers, jours et semaines touchés par ``participations``."""
+    lignes = [(p.cavalier_id, p.cheval_id, p.seance_id, p.date) for p in participations]
+    chevaux, dates = {c for _, c, _, _ in lignes}, {d for _, _, _, d in lignes}
+    cavaliers, lundis = {c for c, _, _, _ in lignes}, {lundi(d) for d in dates}
+    Seance.objects.filter(pk__in={s for _, _, s, _ in lignes}).recalculer_participants()
+    ChevalJour.objects.filter(cheval_id__in=chevaux, date__in=dates) \
+        .reconstruire(Participation.objects.filter(cheval_id__in=chevaux, date__in=dates))
+    CavalierSemaine.objects.filter(cavalier_id__in=cavaliers, lundi__in=lundis).reconstruire(
+        Participation.objects.filter(cavalier_id__in=cavaliers).filter(
+            Q(*(Q(date__range=semaine(l)) for l in lundis), _connector=Q.OR)
+        )
+    )
 
 
 # === PARTICIPATION ===
+def _a_venir(participations):
+    """Participations qui comptent dans les séances à venir des chevaux."""
+    lundi = semaine()[0]
+    return [p for p in participations if p.date >= lundi]
+
+
+def _dater(participations):
+    """
+    Remplit ``date`` et ``cours`` d'après la séance, ou à défaut ``date`` avec
+    la prochaine date du cours. Une requête au plus, pour les séances pas
+    encore datées connues par leur seul identifiant.
+    """
+    champ = Participation._meta.get_field('seance')
+    a_charger = {p.seance_id for p in participations
+                 if p.seance_id and p.date is None and not champ.is_cached(p)}
+    seances = Seance.objects.in_bulk(a_charger) if a_charger else {}
+    for p in participations:
+        seance = seances.get(p.seance_id) or (p.seance if champ.is_cached(p) else None)
+        if seance is not None:
+            p.date = seance.date
+            if p.cours_id != seance.cours_id:
+                p.cours_id = seance.cours_id
+        elif p.date is None:
+            p.date = prochaine_date(p.cours.jour)
+
+
+def _rattacher(participations):
+    """Rattache chaque participation sans séance à celle de sa date (créée si besoin)."""
+    _dater(participations)
+    sans_seance = [p for p in participations if not p.seance_id]
+    seances = Seance.objects.obtenir((p.cours_id, p.date) for p in sans_seance)
+    for p in sans_seance:
+        p.seance = seances[(p.cours_id, p.date)]
+
+
+class ParticipationQuerySet(models.QuerySet):
+    def chevauchant(self, date, debut, fin):
+        """Participations du ``date`` dont le cours chevauche [``debut``, ``fin``[ (la séance comprise)."""
+        return self.filter(date=date, cours__heure_debut__lt=fin, cours__heure_fin__gt=debut)
+
+    def bulk_create(self, objs, *args, places=None, max_cours=None, **kwargs):
+        """``places`` et ``max_cours`` bornent les séances et semaines touchées, comme pour ``Participation.save``."""
+        objs = list(objs)
+        with transaction.atomic(using=self.db):
+            _rattacher(objs)
+            objs = super().bulk_create(objs, *args, **kwargs)
+            if kwargs.get('ignore_conflicts') or kwargs.get('update_conflicts'):
+                # On ne sait pas quelles lignes ont été insérées : on recompte
+                recompter_occupation(objs)
+            else:
+                ajuster_occupation(ajoutees=[(o.cavalier_id, o.cheval_id, o.seance_id, o.date) for o in objs],
+                                   places=places, max_cours=max_cours)
+        Cheval.a_recompter({o.cheval_id for o in _a_venir(objs)})
+        participations_modifiees.send(sender=Participation, cavalier_ids={o.cavalier_id for o in objs})
+        return objs
+
+    def update(self, **kwargs):
+        with transaction.atomic(using=self.db):
+            lignes = list(self.values_list('cavalier_id', 'cheval_id', 'date', 'seance_id', 'pk'))
+            n = super().update(**kwargs)
+            if {'cavalier', 'cavalier_id', 'cheval', 'cheval_id', 'seance', 'seance_id', 'date'} & kwargs.keys():
+                ajuster_occupation(
+                    ajoutees=Participation.objects.filter(pk__in=[l[4] for l in lignes])
+                    .values_list('cavalier_id', 'cheval_id', 'seance_id', 'date'),
+                    retirees=[(cavalier_id, cheval_id, seance_id, date)
+                              for cavalier_id, cheval_id, date, seance_id, _ in lignes],
+                )
+            if {'cheval', 'cheval_id', 'seance', 'seance_id', 'date'} & kwargs.keys():
+                # Chevaux d'avant et d'après : le recomptage couvre aussi un changement de date
+                Cheval.a_recompter({l[1] for l in lignes} | set(
+                    Participation.objects.filter(pk__in=[l[4] for l in lignes]).values_list('cheval_id', flat=True)
+                ))
+        cavalier_ids = {l[0] for l in lignes}
+        nouveau = kwargs.get('cavalier', kwargs.get('cavalier_id'))
+        if nouveau is not None:
+            cavalier_ids.add(getattr(nouveau, 'pk', nouveau))
+        participations_modifiees.send(sender=Participation, cavalier_ids=cavalier_ids)
+        return n
+
+
 class Participation(models.Model):
+    # ``cours`` et ``date`` recopient la séance : les limites par jour et par
+    # semaine deviennent des recherches par intervalle de dates sur les index
+    # (cavalier, date) et (cheval, date), qui ne lisent qu'une semaine
+    seance = models.ForeignKey(Seance, on_delete=models.CASCADE, related_name="participations")
     cours = models.ForeignKey(Cours, on_delete=models.CASCADE, related_name="participations")
+    date = models.DateField(editable=False)
     cavalier = models.ForeignKey(Cavalier, on_delete=models.CASCADE)
     cheval = models.ForeignKey(Cheval, on_delete=models.CASCADE)
 
+    objects = ParticipationQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cheval', 'seance'], name='un_cheval_par_seance',
+                violation_error_message="Ce cheval est déjà monté dans ce cours."),
+            models.UniqueConstraint(fields=['cavalier', 'seance'], name='une_inscription_par_seance',
+                violation_error_message="Ce cavalier participe déjà à ce cours."),
+        ]
+        indexes = [
+            models.Index(fields=['cavalier', 'date'], name='participation_cavalier_date'),
+            models.Index(fields=['cheval', 'date'], name='participation_cheval_date'),
+            # Chevaux déjà montés un jour donné (allocation)
+            models.Index(fields=['date', 'cheval'], name='participation_date_cheval'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._cheval_id_initial = instance.__dict__.get('cheval_id')
+        instance._cavalier_id_initial = instance.__dict__.get('cavalier_id')
+        instance._occupation_initiale = tuple(instance.__dict__.get(champ)
+                                              for champ in ('cavalier_id', 'cheval_id', 'seance_id', 'date'))
+        return instance
+
+    def clean_fields(self, exclude=None):
+        # Cavalier et cheval viennent des objets chargés en lot par le formset :
+        # inutile de revérifier leur existence ligne par ligne. La séance est
+        # déduite du cours à l'enregistrement si elle n'est pas donnée.
+        exclude = set(exclude or ()) | {'seance'}
+        if getattr(self, '_validation_groupee', False):
+            exclude |= {'cavalier', 'cheval'}
+        super().clean_fields(exclude)
+
     def clean(self):
-        # 🐴 Cheval déjà utilisé dans ce cours ?
-        conflit_cours = Participation.objects.filter(
-            cheval=self.cheval,
-            cours=self.cours
-        ).exclude(pk=self.pk)
-        if conflit_cours.exists():
-            raise ValidationError(f"{self.cheval.nom} est déjà monté pendant ce créneau.")
-
-        # 🐴 Cheval monté + de 2 fois ce jour-là ?
-        total_jour = Participation.objects.filter(
-            cheval=self.cheval,
-            cours__jour=self.cours.jour
-        ).exclude(pk=self.pk).count()
-        if total_jour >= 2:
-            raise ValidationError(f"{self.cheval.nom} est déjà monté 2 fois ce jour-là.")
-
-        # 🧍‍♂️ Cavalier dans + de 4 cours cette semaine ?
-        total_semaine = Participation.objects.filter(
-            cavalier=self.cavalier
-        ).exclude(pk=self.pk).count()
-        if total_semaine >= 4:
-            raise ValidationError(f"{self.cavalier.prenom} {self.cavalier.nom} a déjà atteint 4 cours cette semaine.")
-
-        # 🧍 Débutant ne peut pas aller en concours
-        if self.cours.niveau.lower() == "concours":
-            debutant = Participation.objects.filter(
-                cavalier=self.cavalier,
-                cours__niveau__iexact="débutant"
-            ).exclude(pk=self.pk)
-            if debutant.exists():
-                raise ValidationError("Ce cavalier suit un cours Débutant et ne peut pas participer à un Concours.")
-
-        # 🐴 Cheval < 6 ans → pas concours, doit être monté par moniteur
-        if self.cheval.age < 6:
-            if self.cours.niveau.lower() == "concours":
-                raise ValidationError(f"{self.cheval.nom} a moins de 6 ans et ne peut pas faire de concours.")
-            if not Moniteur.objects.filter(nom=self.cavalier.nom, prenom=self.cavalier.prenom).exists():
-                raise ValidationError(f"{self.cheval.nom} a moins de 6 ans et ne peut être monté que par un moniteur.")
+        # Déjà vérifiée en lot par le formset (voir contraintes.validate_many)
+        if getattr(self, '_validation_groupee', False):
+            return
+        from .contraintes import validate_many
+        erreur = validate_many([self])[0]
+        if erreur:
+            raise erreur
 
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        self.cheval.update_disponibilite()
+    def save(self, *args, places=None, max_cours=None, **kwargs):
+        """
+        ``places`` et ``max_cours`` bornent la séance et la semaine du cavalier
+        (voir ``ajuster_occupation``) : au-delà, l'enregistrement est annulé
+        par une ``ValidationError``.
+        """
+        creation = self._state.adding
+        ancien = getattr(self, '_cheval_id_initial', None)
+        with transaction.atomic():
+            _rattacher([self])
+            super().save(*args, **kwargs)
+            occupation = (self.cavalier_id, self.cheval_id, self.seance_id, self.date)
+            if creation:
+                ajuster_occupation(ajoutees=[occupation], places=places, max_cours=max_cours)
+                if _a_venir([self]):
+                    Cheval.a_recompter([self.cheval_id])
+            elif occupation != getattr(self, '_occupation_initiale', occupation):
+                ajuster_occupation(ajoutees=[occupation], retirees=[self._occupation_initiale],
+                                   places=places, max_cours=max_cours)
+                # La séance a pu changer de semaine : l'ancien et le nouveau cheval sont recomptés
+                Cheval.a_recompter({ancien, self.cheval_id})
+        self._cheval_id_initial = self.cheval_id
+        self._cavalier_id_initial = self.cavalier_id
+        self._occupation_initiale = (self.cavalier_id, self.cheval_id, self.seance_id, self.date)
 
     def __str__(self):
-        return f"{self.cavalier} monte {self.cheval} dans {self.cours}"
+        quand = f" le {self.date:%d/%m}" if self.date else ""
+        return f"{self.cavalier} monte {self.cheval} dans {self.cours}{quand}"
+
+
+@receiver(post_delete, sender=Participation)
+def liberer_cheval(sender, instance, **kwargs):
+    # Couvre aussi les suppressions en cascade et QuerySet.delete()
+    ajuster_occupation(retirees=[(instance.cavalier_id, instance.cheval_id, instance.seance_id, instance.date)])
+    if _a_venir([instance]):
+        Cheval.a_recompter([instance.cheval_id])
+
+
+# === RÉVISION ===
+class Revision(models.Model):
+    """
+    Marqueur de changement des données publiées (chevaux, cours, places).
+
+    Incrémenté quand la transaction qui modifie les données est validée : lu par clé
+    primaire, il donne l'ETag et le Last-Modified de l'API sans parcourir
+    les tables.
+    """
+    CLUB = "club"
+
+    nom = models.CharField(max_length=30, primary_key=True)
+    numero = models.PositiveBigIntegerField(default=0)
+    modifie = models.DateTimeField(default=timezone.now)
+
+    @classmethod
+    def incrementer(cls, nom=CLUB):
+        """
+        Incrémente ``nom`` à la validation de la transaction en cours, une seule
+        fois par transaction : les inscriptions concurrentes ne se disputent
+        pas le verrou de cette ligne.
+        """
+        connexion = transaction.get_connection()
+        # Une annulation (même partielle) retire aussi l'incrément de run_on_commit
+        if any(getattr(f, 'revision', None) == nom for _, f, _ in connexion.run_on_commit):
+            return
+
+        def ecrire():
+            if not cls.objects.filter(pk=nom).update(numero=F('numero') + 1, modifie=timezone.now()):
+                cls.objects.get_or_create(pk=nom, defaults={'numero': 1})
+        ecrire.revision = nom
+        transaction.on_commit(ecrire)
+
+    @classmethod
+    def actuelle(cls, nom=CLUB):
+        revision = cls.objects.filter(pk=nom).first()
+        return revision or cls(nom=nom, numero=0, modifie=datetime(2000, 1, 1, tzinfo=dt_timezone.utc))
+
+    def __str__(self):
+        return f"{self.nom} n°{self.numero}"
+
+
+@receiver(post_save, sender=Cheval)
+@receiver(post_delete, sender=Cheval)
+@receiver(post_save, sender=Cours)
+@receiver(post_delete, sender=Cours)
+@receiver(post_save, sender=Moniteur)
+@receiver(post_delete, sender=Moniteur)
+@receiver(post_save, sender=Participation)
+@receiver(post_delete, sender=Participation)
+def _donnees_modifiees(sender, **kwargs):
+    Revision.incrementer()
+
+
+@receiver(participations_modifiees)
+def _participations_modifiees(sender, **kwargs):
+    Revision.incrementer()
 
 
 # === INSCRIPTION ===
@@ -139,3 +642,170 @@ class Inscription(models.Model):
 
     def __str__(self):
         return f"{self.cavalier} inscrit à {self.cours}"
+
+
+# === LISTE D'ATTENTE ===
+class AttenteQuerySet(models.QuerySet):
+    def en_attente(self):
+        return self.filter(promue_le__isnull=True)
+
+    def avec_position(self):
+        """Ajoute ``position`` : rang dans la file de la séance, 1 pour la prochaine demande servie."""
+        devant = Attente.objects.en_attente().filter(seance=OuterRef('seance'), pk__lte=OuterRef('pk')) \
+            .order_by().values('seance').annotate(n=Count('pk')).values('n')
+        return self.annotate(position=Subquery(devant))
+
+
+class Attente(models.Model):
+    """
+    Demande d'un cavalier pour une séance complète, servie dans l'ordre
+    d'arrivée (identifiant croissant) quand une place se libère. Une demande
+    servie garde la date de sa promotion ; ``cheval`` est le cheval souhaité.
+    """
+    seance = models.ForeignKey(Seance, on_delete=models.CASCADE, related_name="attentes")
+    cavalier = models.ForeignKey(Cavalier, on_delete=models.CASCADE)
+    cheval = models.ForeignKey(Cheval, on_delete=models.SET_NULL, null=True, blank=True)
+    demandee_le = models.DateTimeField(default=timezone.now)
+    promue_le = models.DateTimeField(null=True, blank=True)
+
+    objects = AttenteQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['pk']
+        constraints = [
+            models.UniqueConstraint(fields=['cavalier', 'seance'], condition=Q(promue_le__isnull=True),
+                                    name='une_attente_par_seance',
+                                    violation_error_message="Ce cavalier attend déjà une place dans ce cours."),
+        ]
+        indexes = [
+            # File d'une séance, dans l'ordre : seules les demandes en attente y figurent
+            models.Index(fields=['seance', 'id'], condition=Q(promue_le__isnull=True), name='attente_file'),
+        ]
+
+    def position(self):
+        return Attente.objects.en_attente().filter(seance_id=self.seance_id, pk__lte=self.pk).count()
+
+    def __str__(self):
+        return f"{self.cavalier} attend une place dans {self.seance}"
+
+
+# === TÂCHES DE FOND ===
+# Au-delà, une tâche prise par un worker qui ne l'a ni finie ni rendue
+# (worker arrêté en cours de route) est reprise par un autre
+DUREE_PRISE = timedelta(minutes=10)
+
+
+class TacheQuerySet(models.QuerySet):
+    def pretes(self, maintenant=None):
+        """Tâches à exécuter : échéance passée, libres (ou prises depuis plus de DUREE_PRISE), pas abandonnées."""
+        maintenant = maintenant or timezone.now()
+        return self.filter(abandonnee_le__isnull=True, executer_apres__lte=maintenant) \
+            .filter(Q(prise_le__isnull=True) | Q(prise_le__lt=maintenant - DUREE_PRISE))
+
+
+class Tache(models.Model):
+    """
+    Travail confié à run_worker après un enregistrement (voir ``club.taches``).
+
+    ``cle`` dédoublonne : une seule tâche en attente par clé, les suivantes
+    sont ignorées. Une tâche réussie est supprimée ; un échec la replanifie
+    plus tard (``executer_apres``), jusqu'à ce qu'elle soit abandonnée avec
+    sa dernière erreur.
+    """
+    nom = models.CharField(max_length=50)
+    cle = models.CharField(max_length=200)
+    arguments = models.JSONField(default=dict)
+    essais = models.PositiveSmallIntegerField(default=0)
+    executer_apres = models.DateTimeField(default=timezone.now)
+    prise_le = models.DateTimeField(null=True, blank=True)
+    jeton = models.CharField(max_length=32, blank=True)  # worker qui l'a prise
+    abandonnee_le = models.DateTimeField(null=True, blank=True)
+    erreur = models.TextField(blank=True)
+
+    objects = TacheQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # Une tâche prise peut avoir lu des données déjà changées : une nouvelle reste possible
+            models.UniqueConstraint(fields=['cle'], condition=Q(prise_le__isnull=True, abandonnee_le__isnull=True),
+                                    name='une_tache_en_attente_par_cle'),
+        ]
+        indexes = [
+            models.Index(fields=['executer_apres'], condition=Q(abandonnee_le__isnull=True), name='taches_a_executer'),
+        ]
+
+    def __str__(self):
+        return f"{self.cle} ({self.essais} essai{'s' if self.essais > 1 else ''})"
+
+
+# === AVIS PAR MAIL ===
+class Avis(models.Model):
+    """
+    Changement du planning d'un cavalier à lui annoncer par mail (voir
+    ``club.mails``), noté dans la transaction du changement. Les avis d'un
+    cavalier partent ensemble dans un seul mail, puis sont supprimés.
+    """
+    INSCRIPTION = "inscription"
+    ANNULATION = "annulation"
+    NATURE_CHOICES = [(INSCRIPTION, "Inscription"), (ANNULATION, "Annulation")]
+
+    cavalier = models.ForeignKey(Cavalier, on_delete=models.CASCADE, related_name="avis")
+    nature = models.CharField(max_length=12, choices=NATURE_CHOICES)
+    seance = models.ForeignKey(Seance, on_delete=models.CASCADE, related_name="+")
+    cheval = models.ForeignKey(Cheval, on_delete=models.SET_NULL, null=True, related_name="+")
+    cree_le = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['pk']
+        verbose_name_plural = "avis"
+
+    def __str__(self):
+        return f"{self.get_nature_display()} de {self.cavalier} : {self.seance}"
+
+
+# === ARCHIVES DES SAISONS TERMINÉES ===
+# Remplies par archive_saison. Les identifiants d'origine sont gardés et les
+# clés étrangères ne sont pas contraintes : les archives survivent à la
+# suppression d'un cavalier, d'un cheval ou d'un cours.
+def _reference(modele):
+    return models.ForeignKey(modele, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+
+
+class ParticipationArchivee(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    date = models.DateField(db_index=True)
+    cours = _reference(Cours)
+    cavalier = _reference(Cavalier)
+    cheval = _reference(Cheval)
+    niveau = models.CharField(max_length=100)  # niveau du cours au moment de l'archivage
+
+    def __str__(self):
+        return f"{self.cavalier_id} / {self.cheval_id} le {self.date:%d/%m/%Y}"
+
+
+class InscriptionArchivee(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    cavalier = _reference(Cavalier)
+    cours = _reference(Cours)
+    date_inscription = models.DateField()
+
+
+class BilanCavalier(models.Model):
+    """Séances archivées d'un cavalier sur une saison."""
+    cavalier = _reference(Cavalier)
+    saison = models.CharField(max_length=9)
+    seances = models.PositiveIntegerField(default=0)
+    concours = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['cavalier', 'saison'], name='un_bilan_par_cavalier_et_saison')]
+
+
+class BilanCheval(models.Model):
+    """Séances archivées d'un cheval sur une saison."""
+    cheval = _reference(Cheval)
+    saison = models.CharField(max_length=9)
+    seances = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['cheval', 'saison'], name='un_bilan_par_cheval_et_saison')]
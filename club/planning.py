@@ -0,0 +1,235 @@
+from collections import Counter, defaultdict, deque
+from datetime import timedelta
+
+from django.db import transaction
+
+from .calendrier import lundi, prochaine_date, sept_jours
+from .contraintes import MAX_PAR_JOUR, MAX_PAR_SEMAINE, validate_many
+from .creneaux import Creneaux
+from .inscriptions import PLACES_PAR_COURS, reecriture
+from .models import LIMITE_SEANCES, Cheval, Cours, Inscription, Moniteur, Participation
+
+
+# === FLOT MAXIMUM (DINIC) ===
+class _Reseau:
+    def __init__(self):
+        self.adj = []
+        self.vers = []
+        self.cap = []
+
+    def noeud(self):
+        self.adj.append([])
+        return len(self.adj) - 1
+
+    def arc(self, u, v, cap):
+        """Ajoute l'arc u → v et renvoie son indice (l'arc retour est ``indice + 1``)."""
+        self.adj[u].append(len(self.vers))
+        self.vers.append(v)
+        self.cap.append(cap)
+        self.adj[v].append(len(self.vers))
+        self.vers.append(u)
+        self.cap.append(0)
+        return len(self.vers) - 2
+
+    def _niveaux(self, s, t):
+        niveau = [-1] * len(self.adj)
+        niveau[s] = 0
+        file = deque([s])
+        while file:
+            u = file.popleft()
+            for a in self.adj[u]:
+                v = self.vers[a]
+                if self.cap[a] and niveau[v] < 0:
+                    niveau[v] = niveau[u] + 1
+                    file.append(v)
+        return niveau if niveau[t] >= 0 else None
+
+    def _pousser(self, u, t, flot, niveau, suivant):
+        if u == t:
+            return flot
+        arcs = self.adj[u]
+        while suivant[u] < len(arcs):
+            a = arcs[suivant[u]]
+            v = self.vers[a]
+            if self.cap[a] and niveau[v] == niveau[u] + 1:
+                pousse = self._pousser(v, t, min(flot, self.cap[a]), niveau, suivant)
+                if pousse:
+                    self.cap[a] -= pousse
+                    self.cap[a ^ 1] += pousse
+                    return pousse
+            suivant[u] += 1
+        return 0
+
+    def flot_max(self, s, t):
+        total = 0
+        while (niveau := self._niveaux(s, t)) is not None:
+            suivant = [0] * len(self.adj)
+            while pousse := self._pousser(s, t, float('inf'), niveau, suivant):
+                total += pousse
+        return total
+
+
+# === PLANNING DE LA SEMAINE ===
+class Plan:
+    def __init__(self):
+        self.affectations = []  # Participations à créer
+        self.refus = []         # (cavalier, cours, motif)
+        self.remplacees = []    # pk des participations replanifiées
+
+
+def _demandes(cours, participations, debut, fin):
+    """Couples (cavalier, cours) à affecter : participations replanifiées puis inscriptions sans cheval."""
+    demandes = [(p.cavalier, p.cours) for p in participations]
+    deja = set(Participation.objects.filter(cours__in=cours, date__range=(debut, fin))
+               .values_list('cavalier_id', 'cours_id'))
+    for inscription in Inscription.objects.filter(cours__in=cours).select_related('cavalier', 'cours') \
+            .order_by('date_inscription', 'pk'):
+        cle = (inscription.cavalier_id, inscription.cours_id)
+        if cle not in deja:
+            deja.add(cle)
+            demandes.append((inscription.cavalier, inscription.cours))
+    return demandes
+
+
+def planifier_semaine(cours=None, replanifier=False, depuis=None):
+    """
+    Calcule en une fois l'affectation des chevaux pour les séances des sept
+    jours qui commencent à ``depuis`` (aujourd'hui par défaut).
+
+    Chaque inscription sans participation reçoit un cheval ; avec
+    ``replanifier``, les participations existantes sont aussi réaffectées.
+    Les règles de ``Participation.clean`` deviennent des capacités d'un
+    réseau de flot : source → cours [places restantes] → (cours, moniteur
+    ou non) → (cheval, cours) [1] → (cheval, jour) [2] → cheval [séances
+    restantes] → puits. Un flot
+    maximum affecte le plus de demandes possible ; les chevaux les moins
+    chargés sont essayés en premier pour répartir le travail. Seules les
+    semaines concernées sont lues.
+
+    Les chevauchements avec les séances gardées sont écartés du réseau (le
+    cavalier est refusé, le cheval n'est pas candidat) ; ceux entre deux
+    affectations du plan, qu'un flot ne sait pas exprimer, sont refusés
+    ensuite par ``validate_many``.
+    """
+    cours = Cours.objects.all() if cours is None else cours
+    debut, fin = sept_jours(depuis)
+    dates = {co.pk: prochaine_date(co.jour, debut) for co in cours}
+    plan = Plan()
+    replanifiees = []
+    if replanifier:
+        replanifiees = list(Participation.objects.filter(cours__in=cours, date__range=(debut, fin))
+                            .select_related('cavalier', 'cours'))
+        plan.remplacees = [p.pk for p in replanifiees]
+    demandes = _demandes(cours, replanifiees, debut, fin)
+
+    # Charge déjà engagée, hors participations replanifiées : séances à venir
+    # des chevaux, et semaines (lundi → dimanche) touchées par ces sept jours
+    a_venir = Participation.objects.filter(date__gte=lundi(debut)).exclude(pk__in=plan.remplacees)
+    autres = a_venir.filter(date__lte=lundi(fin) + timedelta(days=6))
+    charge_semaine = Counter(a_venir.values_list('cheval_id', flat=True))
+    charge_cours, charge_jour, cours_cavalier, debutants = Counter(), Counter(), Counter(), set()
+    places_prises, occupes = Counter(), Creneaux()
+    for cheval_id, cavalier_id, cours_id, date, niveau, heure_debut, heure_fin in autres.values_list(
+            'cheval_id', 'cavalier_id', 'cours_id', 'date', 'cours__niveau_normalise',
+            'cours__heure_debut', 'cours__heure_fin'):
+        if debut <= date <= fin:
+            charge_cours[(cheval_id, cours_id)] += 1
+            places_prises[cours_id] += 1
+            charge_jour[(cheval_id, date)] += 1
+            occupes.ajouter(('cheval', cheval_id, date), heure_debut, heure_fin)
+            occupes.ajouter(('cavalier', cavalier_id, date), heure_debut, heure_fin)
+        cours_cavalier[(cavalier_id, lundi(date))] += 1
+        if niveau == "débutant":
+            debutants.add((cavalier_id, lundi(date)))
+    moniteurs = set(Moniteur.objects.values_list('nom', 'prenom'))
+
+    # Règles propres au cavalier : aucun cheval ne peut les lever
+    debutants |= {(c.pk, lundi(dates[co.pk])) for c, co in demandes if co.niveau.lower() == "débutant"}
+    groupes = defaultdict(list)
+    for cavalier, co in demandes:
+        semaine = (cavalier.pk, lundi(dates[co.pk]))
+        creneau = (('cavalier', cavalier.pk, dates[co.pk]), co.heure_debut, co.heure_fin)
+        if cours_cavalier[semaine] >= MAX_PAR_SEMAINE:
+            plan.refus.append((cavalier, co, f"{MAX_PAR_SEMAINE} cours cette semaine"))
+        elif co.niveau.lower() == "concours" and semaine in debutants:
+            plan.refus.append((cavalier, co, "cavalier débutant en concours"))
+        elif occupes.chevauche(*creneau):
+            plan.refus.append((cavalier, co, "déjà dans un cours sur ce créneau"))
+        else:
+            cours_cavalier[semaine] += 1
+            occupes.ajouter(*creneau)
+            groupes[(co, (cavalier.nom, cavalier.prenom) in moniteurs)].append(cavalier)
+
+    chevaux = sorted(Cheval.objects.all(), key=lambda h: (charge_semaine[h.pk], h.pk))
+    reseau = _Reseau()
+    source, puits = reseau.noeud(), reseau.noeud()
+    noeuds_cheval, noeuds_jour, noeuds_cours, noeuds_places = {}, {}, {}, {}
+    for h in chevaux:
+        restant = LIMITE_SEANCES - charge_semaine[h.pk]
+        if restant > 0:
+            noeuds_cheval[h.pk] = n = reseau.noeud()
+            reseau.arc(n, puits, restant)
+
+    # Une séance ne dépasse jamais PLACES_PAR_COURS : les places déjà prises
+    # par les participations gardées sont retirées de la capacité du cours
+    arcs_groupe, places = {}, {}
+    for (co, moniteur), cavaliers in groupes.items():
+        if co.pk not in noeuds_places:
+            places[co.pk] = max(PLACES_PAR_COURS - places_prises[co.pk], 0)
+            noeuds_places[co.pk] = n = reseau.noeud()
+            reseau.arc(source, n, places[co.pk])
+        g = reseau.noeud()
+        reseau.arc(noeuds_places[co.pk], g, len(cavaliers))
+        concours = co.niveau.lower() == "concours"
+        jour = dates[co.pk]
+        arcs_groupe[(co, moniteur)] = arcs = []
+        for h in chevaux:
+            if h.pk not in noeuds_cheval or (h.age < 6 and (concours or not moniteur)):
+                continue
+            if charge_cours[(h.pk, co.pk)] or charge_jour[(h.pk, jour)] >= MAX_PAR_JOUR:
+                continue
+            if occupes.chevauche(('cheval', h.pk, jour), co.heure_debut, co.heure_fin):
+                continue
+            if (h.pk, jour) not in noeuds_jour:
+                noeuds_jour[(h.pk, jour)] = j = reseau.noeud()
+                reseau.arc(j, noeuds_cheval[h.pk], MAX_PAR_JOUR - charge_jour[(h.pk, jour)])
+            if (h.pk, co.pk) not in noeuds_cours:
+                noeuds_cours[(h.pk, co.pk)] = hc = reseau.noeud()
+                reseau.arc(hc, noeuds_jour[(h.pk, jour)], 1)
+            arcs.append((h, reseau.arc(g, noeuds_cours[(h.pk, co.pk)], 1)))
+
+    reseau.flot_max(source, puits)
+
+    montes = {cle: [h for h, a in arcs if reseau.cap[a] == 0] for cle, arcs in arcs_groupe.items()}
+    affectes = Counter()
+    for (co, _), chevaux_montes in montes.items():
+        affectes[co.pk] += len(chevaux_montes)
+    for cle, cavaliers in groupes.items():
+        co = cle[0]
+        for cavalier, h in zip(cavaliers, montes[cle]):
+            plan.affectations.append(Participation(cavalier=cavalier, cours=co, date=dates[co.pk], cheval=h))
+        motif = "cours complet" if affectes[co.pk] >= places[co.pk] else "aucun cheval disponible"
+        for cavalier in cavaliers[len(montes[cle]):]:
+            plan.refus.append((cavalier, co, motif))
+
+    # Un même cheval sur deux cours du plan qui se chevauchent : le second est refusé
+    erreurs = validate_many(plan.affectations, ignorees=plan.remplacees)
+    plan.refus += [(p.cavalier, p.cours, e.messages[0]) for p, e in zip(plan.affectations, erreurs) if e]
+    plan.affectations = [p for p, e in zip(plan.affectations, erreurs) if e is None]
+    return plan
+
+
+def appliquer(plan):
+    """
+    Écrit le plan en base en une transaction (suppression et création en
+    bloc, séances comprises). Les compteurs des séances et des semaines
+    gardent ``PLACES_PAR_COURS`` et ``MAX_PAR_SEMAINE`` : une inscription
+    passée depuis le calcul du plan l'annule par une ``ValidationError``.
+    """
+    with transaction.atomic():
+        if plan.remplacees:
+            # Remplacées par le plan : la liste d'attente n'a pas à s'en mêler
+            with reecriture():
+                Participation.objects.filter(pk__in=plan.remplacees).delete()
+        return Participation.objects.bulk_create(plan.affectations, places=PLACES_PAR_COURS,
+                                                  max_cours=MAX_PAR_SEMAINE)
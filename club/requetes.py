@@ -0,0 +1,25 @@
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+class BudgetDepasse(AssertionError):
+    pass
+
+
+@contextmanager
+def budget_requetes(maximum, using=DEFAULT_DB_ALIAS):
+    """
+    Échoue si le bloc exécute plus de ``maximum`` requêtes SQL.
+
+    Utilisé par les tests des pages (voir ``BudgetsPagesTests``) ::
+
+        with budget_requetes(5):
+            client.get(url)
+    """
+    with CaptureQueriesContext(connections[using]) as requetes:
+        yield requetes
+    if len(requetes) > maximum:
+        detail = "\n".join(f"  {q['sql']}" for q in requetes.captured_queries)
+        raise BudgetDepasse(f"{len(requetes)} requêtes pour un budget de {maximum} :\n{detail}")
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+
+def appliquer_pragmas(sender, connection, **kwargs):
+    """Applique ``settings.SQLITE_PRAGMAS`` à chaque nouvelle connexion SQLite (profil de production)."""
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', None)
+    if connection.vendor != 'sqlite' or not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for nom, valeur in pragmas.items():
+            cursor.execute(f"PRAGMA {nom} = {valeur}")
+
+
+def brancher():
+    """Appelé par ``ClubConfig.ready``."""
+    connection_created.connect(appliquer_pragmas)
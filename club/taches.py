@@ -0,0 +1,171 @@
+import logging
+import traceback
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import checks
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Cheval, Tache
+
+# Le travail qui suit un enregistrement (recomptages, invalidations) sort de
+# la requête : il est mis en file dans la même transaction, puis exécuté par
+# run_worker. Une tâche est une fonction enregistrée par tache(nom, fonction)
+# dans le brancher() de son module (appelé par ClubConfig.ready), appelée
+# avec une liste d'arguments (un lot). Elle doit pouvoir être rejouée : elle
+# recalcule un état plutôt que d'appliquer une variation.
+
+ESSAIS_MAX = 5
+DELAI_INITIAL = timedelta(seconds=10)  # doublé à chaque échec
+DELAI_MAX = timedelta(hours=1)
+
+logger = logging.getLogger('club.taches')
+
+TACHES = {}
+
+
+def tache(nom, fonction):
+    """Enregistre ``fonction`` comme tâche ``nom``."""
+    TACHES[nom] = fonction
+
+
+def mettre_en_file(nom, taches):
+    """
+    Met en file les tâches ``nom`` données en ``{clé: arguments}``, dans la
+    transaction en cours : elles sont annulées avec elle, et une clé déjà en
+    attente est ignorée. Avec ``TACHES_SYNCHRONES`` (tests, développement),
+    elles s'exécutent dans le processus dès le commit (voir ``_sur_place``).
+    """
+    if not taches:
+        return
+    if getattr(settings, 'TACHES_SYNCHRONES', True):
+        arguments = list(taches.values())
+        transaction.on_commit(lambda: _sur_place(nom, arguments))
+        return
+    Tache.objects.bulk_create(
+        [Tache(nom=nom, cle=f"{nom}:{cle}", arguments=arguments) for cle, arguments in taches.items()],
+        ignore_conflicts=True,
+    )
+
+
+def _sur_place(nom, arguments):
+    """
+    Exécution synchrone, après le commit : l'écriture est validée, une
+    erreur de la tâche est journalisée et ne remonte pas à l'appelant.
+    """
+    erreur = executer(nom, arguments)
+    if erreur:
+        logger.error("Tâche %s en échec (exécution synchrone, %d) :\n%s", nom, len(arguments), erreur)
+
+
+# === WORKER ===
+def prendre(lot, maintenant=None):
+    """
+    Prend au plus ``lot`` tâches prêtes. L'UPDATE revérifie qu'elles sont
+    toujours libres : deux workers ne prennent jamais la même.
+    """
+    maintenant = maintenant or timezone.now()
+    ids = list(Tache.objects.pretes(maintenant).order_by('executer_apres').values_list('pk', flat=True)[:lot])
+    if not ids:
+        return []
+    jeton = uuid.uuid4().hex
+    Tache.objects.filter(pk__in=ids).pretes(maintenant).update(prise_le=maintenant, jeton=jeton)
+    return list(Tache.objects.filter(pk__in=ids, jeton=jeton))
+
+
+def executer(nom, arguments):
+    """Exécute un lot de la tâche ``nom`` ; renvoie la trace de l'erreur, None si tout s'est bien passé."""
+    try:
+        TACHES[nom](arguments)
+    except Exception:
+        return traceback.format_exc()
+    return None
+
+
+def traiter(taches, executeur=None, parallele=1, fonction=executer):
+    """
+    Exécute les tâches prises, regroupées par nom en au plus ``parallele``
+    lots chacune, dans ``executeur`` (pool de threads ou de processus) ou
+    sur place. Les réussies sont supprimées, les autres replanifiées.
+    Renvoie ``(réussies, échouées)``.
+    """
+    par_nom = defaultdict(list)
+    for t in taches:
+        par_nom[t.nom].append(t)
+    lots = []
+    for nom, groupe in par_nom.items():
+        taille = -(-len(groupe) // parallele)
+        lots += [(nom, groupe[i:i + taille]) for i in range(0, len(groupe), taille)]
+
+    noms, arguments = [nom for nom, _ in lots], [[t.arguments for t in lot] for _, lot in lots]
+    erreurs = executeur.map(fonction, noms, arguments) if executeur else map(fonction, noms, arguments)
+    reussies, echouees = [], []
+    for (nom, lot), erreur in zip(lots, erreurs):
+        if erreur is None:
+            reussies += lot
+        else:
+            logger.warning("Tâche %s en échec (%d) :\n%s", nom, len(lot), erreur)
+            echouees += [(t, erreur) for t in lot]
+    # Le jeton protège une tâche reprise entre-temps par un autre worker
+    for jeton, groupe in _par_jeton(reussies).items():
+        Tache.objects.filter(pk__in=groupe, jeton=jeton).delete()
+    maintenant = timezone.now()
+    for t, erreur in echouees:
+        _replanifier(t, erreur, maintenant)
+    return len(reussies), len(echouees)
+
+
+def _par_jeton(taches):
+    groupes = defaultdict(list)
+    for t in taches:
+        groupes[t.jeton].append(t.pk)
+    return groupes
+
+
+def _replanifier(t, erreur, maintenant):
+    """Rend la tâche ``t`` pour un nouvel essai plus tard, ou l'abandonne après ESSAIS_MAX essais."""
+    essais = t.essais + 1
+    champs = {'essais': essais, 'erreur': erreur, 'prise_le': None, 'jeton': ''}
+    if essais >= ESSAIS_MAX:
+        champs['abandonnee_le'] = maintenant
+        logger.error("Tâche %s abandonnée après %d essais", t.cle, essais)
+    else:
+        champs['executer_apres'] = maintenant + min(DELAI_INITIAL * 2 ** (essais - 1), DELAI_MAX)
+    try:
+        with transaction.atomic():
+            Tache.objects.filter(pk=t.pk, jeton=t.jeton).update(**champs)
+    except IntegrityError:
+        # Une tâche de même clé a été mise en file entre-temps : elle fera le travail
+        Tache.objects.filter(pk=t.pk, jeton=t.jeton).delete()
+
+
+# === TÂCHES ===
+def recompter_chevaux(arguments):
+    """Séances à venir et disponibilité des chevaux (voir ``Cheval.a_recompter``)."""
+    Cheval.objects.filter(pk__in={a['cheval'] for a in arguments}).recalculer_seances()
+
+
+def verifier_cache_partage(app_configs, **kwargs):
+    """
+    Une erreur, pas un avertissement : le worker invaliderait son propre cache
+    et les serveurs web serviraient des plannings périmés jusqu'à leur expiration.
+    """
+    if getattr(settings, 'TACHES_SYNCHRONES', True):
+        return []
+    if settings.CACHES['default']['BACKEND'].endswith('LocMemCache'):
+        return [checks.Error(
+            "Les tâches sont confiées à run_worker mais le cache est local au processus : "
+            "le worker ne peut pas invalider les plannings des serveurs web.",
+            hint="Définir DJANGO_CACHE_DIR (cache partagé), ou DJANGO_TACHES=synchrone.",
+            id='club.E001',
+        )]
+    return []
+
+
+def brancher():
+    """Tâche et vérification de ce module ; appelé par ``ClubConfig.ready``."""
+    tache('chevaux', recompter_chevaux)
+    checks.register(verifier_cache_partage, checks.Tags.caches)
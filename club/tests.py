@@ -1,3 +1,978 @@
-from django.test import TestCase
+import itertools
+import os
+import random
+import smtplib
+import socket
+import tempfile
+import time
+import unittest
+from datetime import date, time as heure, timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.mail.backends.locmem import EmailBackend
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.models import Count
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import exports
+from .allocation import choisir_cheval
+from .archivage import archiver
+from .cache import statistiques
+from .calendrier import aujourd_hui, lundi, semaine, sept_jours
+from .contraintes import validate_many
+from .creneaux import Creneaux, conflits
+from .generation import generer_club, generer_historique
+from .importation import importer_csv
+from .mails import annoncer_programmes
+from .inscriptions import PLACES_PAR_COURS, inscrire, inscrire_ou_attendre
+from .management.commands.stress_inscriptions import _en_parallele
+from .models import (
+    Attente, Avis, BilanCavalier, BilanCheval, Cavalier, CavalierSemaine, Cheval, ChevalJour, Cours, Inscription,
+    Moniteur, Participation, ParticipationArchivee, Revision, Seance, Tache, participants_du_cours,
+)
+from .planning import appliquer, planifier_semaine
+from .requetes import budget_requetes
+from .taches import ESSAIS_MAX, TACHES, mettre_en_file, prendre, traiter, verifier_cache_partage
+
+# Cache privé et vide au début de chaque test
+CACHE_LOCAL = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'}}
+
+
+def _cours(niveau="Galop 3", jour="lundi", debut=10, fin=11, **kwargs):
+    return Cours.objects.create(niveau=niveau, jour=jour, heure_debut=heure(debut), heure_fin=heure(fin), **kwargs)
+
+
+def _cavaliers(n, marque="test"):
+    return Cavalier.objects.bulk_create(
+        Cavalier(nom=marque, prenom=str(i), age=20, email=f"{marque}-{i}@club.example") for i in range(n)
+    )
+
+
+def _chevaux(n, age=10, marque="test"):
+    return Cheval.objects.bulk_create(Cheval(nom=f"{marque}-{i}", race="test", age=age) for i in range(n))
+
+
+# === RÈGLES D'INSCRIPTION (validate_many) ===
+class ValidateManyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cours = [_cours(jour=jour) for jour, _ in Cours.JOUR_CHOICES]
+        cls.cavaliers = _cavaliers(40)
+        cls.chevaux = _chevaux(40)
+
+    def _lot(self, n, chevaux=None):
+        chevaux = chevaux or self.chevaux
+        return [Participation(cours=self.cours[i % len(self.cours)], cavalier=self.cavaliers[i],
+                              cheval=chevaux[i % len(chevaux)]) for i in range(n)]
+
+    def test_nombre_de_requetes_constant(self):
+        for n in (1, 40):
+            with self.subTest(lignes=n), self.assertNumQueries(1):
+                erreurs = validate_many(self._lot(n))
+            self.assertEqual(erreurs, [None] * n)
+
+    def test_jeune_cheval_une_requete_de_plus(self):
+        jeunes = _chevaux(40, age=4, marque="jeune")
+        for i in range(0, 40, 2):
+            Moniteur.objects.create(nom="test", prenom=str(i), email=f"m{i}@club.example", specialite="CSO")
+        for n in (1, 40):
+            with self.subTest(lignes=n), self.assertNumQueries(2):
+                erreurs = validate_many(self._lot(n, jeunes))
+            # Seuls les cavaliers qui sont aussi moniteurs montent un jeune cheval
+            self.assertEqual([e is None for e in erreurs], [i % 2 == 0 for i in range(n)])
+
+    def test_chaque_ligne_compte_pour_les_suivantes(self):
+        cavalier, cheval = self.cavaliers[0], self.chevaux[0]
+        lot = [Participation(cours=self.cours[0], cavalier=cavalier, cheval=cheval),
+               Participation(cours=self.cours[0], cavalier=cavalier, cheval=self.chevaux[1])]
+        erreurs = validate_many(lot)
+        self.assertIsNone(erreurs[0])
+        self.assertEqual(erreurs[1].code, 'deja_inscrit')
+
+
+# === PLANNING DE LA SEMAINE ===
+class PlanifierSemaineTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cours = _cours()
+        cls.cavaliers = _cavaliers(8)
+        cls.chevaux = _chevaux(10)
+        Inscription.objects.bulk_create(Inscription(cavalier=c, cours=cls.cours) for c in cls.cavaliers)
+
+    def _seance(self):
+        return Seance.objects.get(cours=self.cours)
+
+    def test_seance_jamais_au_dela_des_places(self):
+        plan = planifier_semaine(cours=Cours.objects.filter(pk=self.cours.pk))
+        self.assertEqual(len(plan.affectations), PLACES_PAR_COURS)
+        self.assertEqual([motif for _, _, motif in plan.refus], ["cours complet"] * (8 - PLACES_PAR_COURS))
+        appliquer(plan)
+        self.assertEqual(self._seance().participants, PLACES_PAR_COURS)
+
+    def test_places_deja_prises_comptees(self):
+        for cavalier, cheval in zip(self.cavaliers[:2], self.chevaux):
+            Participation.objects.create(cours=self.cours, cavalier=cavalier, cheval=cheval)
+        appliquer(planifier_semaine(cours=Cours.objects.filter(pk=self.cours.pk)))
+        self.assertEqual(Participation.objects.filter(cours=self.cours).count(), PLACES_PAR_COURS)
+        self.assertEqual(self._seance().participants, PLACES_PAR_COURS)
+
+    def test_plan_perime_refuse(self):
+        plan = planifier_semaine(cours=Cours.objects.filter(pk=self.cours.pk))
+        # Une inscription passée entre le calcul et l'écriture du plan
+        retard = _cavaliers(1, marque="retard")[0]
+        Participation.objects.create(cours=self.cours, cavalier=retard, cheval=_chevaux(1, marque="retard")[0])
+        with self.assertRaises(ValidationError) as e:
+            appliquer(plan)
+        self.assertEqual(e.exception.code, 'complet')
+        self.assertEqual(self._seance().participants, 1)
+
+    def test_action_admin_plan_perime(self):
+        admin = User.objects.create_superuser("planning-admin", "planning@example.com")
+        self.client.force_login(admin)
+        retard = _cavaliers(1, marque="retard")[0]
+
+        def planifier_puis_inscrire(**kwargs):
+            plan = planifier_semaine(**kwargs)
+            Participation.objects.create(cours=self.cours, cavalier=retard, cheval=_chevaux(1, marque="retard")[0])
+            return plan
+
+        with mock.patch('club.admin.planifier_semaine', planifier_puis_inscrire):
+            reponse = self.client.post(reverse('admin:club_cours_changelist'), {
+                'action': 'planifier_chevaux', '_selected_action': [self.cours.pk]}, follow=True)
+        self.assertEqual(reponse.status_code, 200)
+        self.assertIn("Planning non appliqué", [str(m) for m in reponse.context['messages']][0])
+        self.assertEqual(self._seance().participants, 1)
+
+
+class ChevauchementsPlanningTests(TestCase):
+    """Le plan n'écrit jamais ce que ``validate_many`` refuserait : deux créneaux qui se chevauchent."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.dix = _cours(debut=10, fin=11)
+        cls.dix_et_demie = Cours.objects.create(niveau="Galop 3", jour="lundi", heure_debut=heure(10, 30),
+                                                heure_fin=heure(11, 30))
+        cls.cavaliers = _cavaliers(2)
+
+    def _plan(self):
+        return planifier_semaine(cours=Cours.objects.filter(pk__in=[self.dix.pk, self.dix_et_demie.pk]))
+
+    def _verifier(self, plan, refus):
+        self.assertEqual([motif for _, _, motif in plan.refus], refus)
+        self.assertEqual(validate_many(plan.affectations), [None] * len(plan.affectations))
+
+    def test_cavalier_sur_deux_creneaux_du_plan(self):
+        _chevaux(2)
+        for co in (self.dix, self.dix_et_demie):
+            Inscription.objects.create(cavalier=self.cavaliers[0], cours=co)
+        self._verifier(self._plan(), ["déjà dans un cours sur ce créneau"])
+
+    def test_cavalier_deja_dans_une_seance(self):
+        premier, second = _chevaux(2)
+        Participation.objects.create(cours=self.dix, cavalier=self.cavaliers[0], cheval=premier)
+        Inscription.objects.create(cavalier=self.cavaliers[0], cours=self.dix_et_demie)
+        self._verifier(self._plan(), ["déjà dans un cours sur ce créneau"])
+
+    def test_cheval_deja_dans_une_seance(self):
+        # Le seul cheval libre à 10 h 30 est celui qui n'est pas monté à 10 h
+        premier, second = _chevaux(2)
+        Participation.objects.create(cours=self.dix, cavalier=self.cavaliers[0], cheval=premier)
+        Inscription.objects.create(cavalier=self.cavaliers[1], cours=self.dix_et_demie)
+        plan = self._plan()
+        self._verifier(plan, [])
+        self.assertEqual([p.cheval for p in plan.affectations], [second])
+
+    def test_cheval_sur_deux_creneaux_du_plan(self):
+        _chevaux(1)
+        for cavalier, co in zip(self.cavaliers, (self.dix, self.dix_et_demie)):
+            Inscription.objects.create(cavalier=cavalier, cours=co)
+        plan = self._plan()
+        self.assertEqual(len(plan.affectations), 1)
+        self._verifier(plan, [f"{plan.affectations[0].cheval.nom} est déjà monté dans un cours sur ce créneau."])
+
+
+class CreneauxTests(unittest.TestCase):
+    # 10 h – 12 h, 11 h – 13 h et 11 h 30 – 12 h 30 se chevauchent deux à deux
+    CRENEAUX = [("a", heure(10), heure(12)), ("b", heure(11), heure(13)), ("c", heure(11, 30), heure(12, 30))]
+
+    def test_conflits_toutes_les_paires(self):
+        trouves = conflits(("lundi", d, f, v) for v, d, f in self.CRENEAUX)
+        self.assertEqual(sorted(tuple(sorted((a, b))) for _, a, b in trouves), [("a", "b"), ("a", "c"), ("b", "c")])
+
+    def test_conflits_creneaux_contigus_ou_d_autres_cles(self):
+        creneaux = [("lundi", heure(10), heure(11), "a"), ("lundi", heure(11), heure(12), "b"),
+                    ("mardi", heure(10), heure(12), "c")]
+        self.assertEqual(conflits(creneaux), [])
+
+    def test_chevauchants(self):
+        index = Creneaux()
+        for v, d, f in self.CRENEAUX:
+            index.ajouter("lundi", d, f, v)
+        self.assertEqual(sorted(index.chevauchants("lundi", heure(12), heure(14))), ["b", "c"])
+        self.assertEqual(index.chevauchants("lundi", heure(13), heure(14)), [])
+
+
+# === BUDGETS DE REQUÊTES DES PAGES ===
+# Nombre maximum de requêtes par page, quel que soit le volume de données
+# (session et utilisateur compris, cache du planning vide)
+BUDGETS = {
+    'accueil': 2,
+    'dashboard': 4,
+    'statut': 4,
+    'inscription': 4,
+    'concours': 4,
+    'chevaux': 3,
+    'inscription_cavalier': 6,  # séances ouvertes, chevaux candidats, chevaux exclus (disponibilites)
+    'api_chevaux': 2,
+    'api_cours': 2,
+    'api_places': 2,
+}
+
+# Pages d'admin ; le cours modifié a 20 lignes de participation
+BUDGETS_ADMIN = {
+    'admin:club_cours_change': 8,
+    'admin:club_cours_changelist': 5,
+    'admin:club_cavalier_changelist': 4,
+    'admin:club_participation_changelist': 4,
+}
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class BudgetsPagesTests(TestCase):
+    """Jeu de données réaliste : 300 cavaliers, 80 chevaux, 60 cours, deux cours par cavalier."""
+
+    @classmethod
+    def setUpTestData(cls):
+        alea = random.Random(0)
+        moniteurs = [Moniteur.objects.create(nom=f"budget-{i}", prenom="M", email=f"m{i}@example.com",
+                                             specialite="CSO") for i in range(5)]
+        cours = [
+            Cours.objects.create(
+                niveau=alea.choice(["Débutant", "Galop 3", "Concours"]), jour=Cours.JOUR_CHOICES[i % 6][0],
+                heure_debut=heure(8 + i % 10), heure_fin=heure(9 + i % 10), entraineur=alea.choice(moniteurs),
+            )
+            for i in range(60)
+        ]
+        chevaux = _chevaux(80, marque="budget")
+        cavaliers = _cavaliers(300, marque="budget")
+        # Un cheval par cours au plus (contrainte un_cheval_par_seance)
+        restants = {co.pk: alea.sample(chevaux, len(chevaux)) for co in cours}
+        Participation.objects.bulk_create(
+            Participation(cavalier=cavalier, cours=co, cheval=restants[co.pk].pop())
+            for cavalier in cavaliers for co in alea.sample(cours, 2)
+        )
+        cls.cours_complet = _cours(jour="samedi", debut=20, fin=21)
+        Participation.objects.bulk_create(
+            Participation(cavalier=cavalier, cours=cls.cours_complet, cheval=cheval)
+            for cavalier, cheval in zip(cavaliers[-20:], chevaux[-20:])
+        )
+        cls.user = User.objects.create_user("budget", cavaliers[0].email)
+        cavaliers[0].user = cls.user
+        cavaliers[0].save()
+        cls.admin = User.objects.create_superuser("budget-admin", "admin@example.com")
+
+    def _verifier(self, budgets, args=None):
+        for nom, maximum in budgets.items():
+            with self.subTest(page=nom), budget_requetes(maximum):
+                reponse = self.client.get(reverse(nom, args=(args or {}).get(nom)))
+            self.assertLess(reponse.status_code, 400, nom)
+
+    def test_pages_du_cavalier(self):
+        self.client.force_login(self.user)
+        self._verifier(BUDGETS)
+
+    def test_pages_d_admin(self):
+        self.client.force_login(self.admin)
+        self._verifier(BUDGETS_ADMIN, {'admin:club_cours_change': [self.cours_complet.pk]})
+
+
+# === CACHE DES PLANNINGS ===
+class _PlanningEnCache:
+    """Aucune page ne montre un planning périmé après un changement (chaque backend de cache)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.moniteur = Moniteur.objects.create(nom="Dupont", prenom="Anne", email="anne@club.example",
+                                               specialite="CSO")
+        cls.cours = _cours(niveau="Galop 3", entraineur=cls.moniteur)
+        cls.cavalier = _cavaliers(1, marque="cache")[0]
+        cls.cavalier.user = User.objects.create_user("cache", cls.cavalier.email)
+        cls.cavalier.save()
+        cls.cheval, cls.autre = _chevaux(2, marque="cache")
+        cls.participation = Participation.objects.create(cours=cls.cours, cavalier=cls.cavalier, cheval=cls.cheval)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.cavalier.user)
+
+    def _statut(self):
+        return self.client.get(reverse('statut')).content.decode()
+
+    def _apres(self, changement):
+        """Réchauffe le cache, applique ``changement`` (transaction validée), renvoie la page suivante."""
+        self._statut()
+        self._statut()
+        with self.captureOnCommitCallbacks(execute=True):
+            changement()
+        return self._statut()
+
+    def test_lectures_depuis_le_cache(self):
+        self._statut()
+        avant = statistiques()
+        self.assertIn("cache-0", self._statut())
+        apres = statistiques()
+        self.assertEqual((apres["succes"] - avant["succes"], apres["echecs"] - avant["echecs"]), (1, 0))
+
+    def test_participation_modifiee(self):
+        def changer():
+            self.participation.cheval = self.autre
+            self.participation.save()
+        self.assertIn("cache-1", self._apres(changer))
+
+    def test_participation_supprimee(self):
+        self.assertIn("aucun cours à venir", self._apres(self.participation.delete))
+
+    def test_cours_modifie(self):
+        def changer():
+            self.cours.niveau = "Galop 4"
+            self.cours.save()
+        self.assertIn("Galop 4", self._apres(changer))
+
+    def test_cheval_renomme(self):
+        def changer():
+            self.cheval.nom = "Tornade"
+            self.cheval.save()
+        self.assertIn("Tornade", self._apres(changer))
+
+    def test_moniteur_renomme(self):
+        def changer():
+            self.moniteur.prenom = "Bérénice"
+            self.moniteur.save()
+        self.assertIn("Bérénice", self._apres(changer))
+
+    def test_moniteur_supprime(self):
+        self.assertNotIn("Anne", self._apres(self.moniteur.delete))
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class PlanningEnCacheLocalTests(_PlanningEnCache, TestCase):
+    pass
+
+
+class PlanningEnCacheFichiersTests(_PlanningEnCache, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        dossier = cls.enterClassContext(tempfile.TemporaryDirectory())
+        cls.enterClassContext(override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': dossier,
+        }}))
+        super().setUpClass()
+
+
+# === RÉVISION DE L'API ===
+class RevisionTests(TestCase):
+    # Tout se passe dans la transaction du test : chaque test n'en valide qu'une
+    def test_un_increment_par_transaction(self):
+        avant = Revision.actuelle().numero
+        with self.captureOnCommitCallbacks(execute=True):
+            cours, cavaliers, chevaux = _cours(), _cavaliers(2), _chevaux(2)
+            for cavalier, cheval in zip(cavaliers, chevaux):
+                Participation.objects.create(cours=cours, cavalier=cavalier, cheval=cheval)
+            Participation.objects.filter(cavalier=cavaliers[0]).delete()
+        self.assertEqual(Revision.actuelle().numero, avant + 1)
+
+    def test_savepoint_annule(self):
+        avant = Revision.actuelle().numero
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    _cours()
+                    raise IntegrityError
+            except IntegrityError:
+                pass
+            _cours(jour="mardi")
+        self.assertEqual(Revision.actuelle().numero, avant + 1)
+
+
+# === INDEX DES REQUÊTES FRÉQUENTES ===
+JOUR = date(2026, 1, 5)
+
+# Requêtes des règles d'inscription et des pages, avec la table qui doit
+# être lue par un index (et non parcourue en entier)
+REQUETES_INDEXEES = {
+    "cheval déjà dans la séance": (Participation.objects.filter(cheval_id=1, seance_id=1), "club_participation"),
+    "cavalier déjà inscrit à la séance": (
+        Participation.objects.filter(cavalier_id=1, seance_id=1), "club_participation"),
+    "places prises dans la séance": (Participation.objects.filter(seance_id=1), "club_participation"),
+    "séances du cheval ce jour-là": (Participation.objects.filter(cheval_id=1, date=JOUR), "club_participation"),
+    "cours du cavalier cette semaine": (
+        Participation.objects.filter(cavalier_id=1, date__range=semaine(JOUR)), "club_participation"),
+    "chevaux montés ce jour-là": (
+        Participation.objects.filter(date=JOUR).values('cheval').annotate(n=Count('pk')), "club_participation"),
+    "séance d'un cours à une date": (Seance.objects.filter(cours_id=1, date=JOUR), "club_seance"),
+    "séances d'une semaine": (Seance.objects.filter(date__range=semaine(JOUR)), "club_seance"),
+    "chevaux pleins ce jour-là": (ChevalJour.objects.pleins(JOUR), "club_chevaljour"),
+    "jour d'un cheval (compteur)": (ChevalJour.objects.filter(cheval_id=1, date=JOUR), "club_chevaljour"),
+    "semaine d'un cavalier (compteur)": (
+        CavalierSemaine.objects.filter(cavalier_id=1, lundi=semaine(JOUR)[0]), "club_cavaliersemaine"),
+    "cours d'un jour": (Cours.objects.filter(jour="lundi"), "club_cours"),
+    "créneaux d'un moniteur": (
+        Cours.objects.filter(entraineur_id=1).chevauchant("lundi", heure(9), heure(10)), "club_cours"),
+    "participations sur un créneau": (
+        Participation.objects.chevauchant(JOUR, heure(9), heure(10)), "club_participation"),
+    "liste des concours": (Cours.objects.filter(niveau_normalise="concours"), "club_cours"),
+    "cavalier par email": (Cavalier.objects.filter(email="cavalier@example.com"), "club_cavalier"),
+    "file d'attente d'une séance": (Attente.objects.en_attente().filter(seance_id=1), "club_attente"),
+    "position dans la file": (Attente.objects.en_attente().filter(seance_id=1, pk__lte=10), "club_attente"),
+    "demandes d'un cavalier": (Attente.objects.en_attente().filter(cavalier_id=1), "club_attente"),
+    "tâches prêtes (run_worker)": (Tache.objects.pretes().order_by('executer_apres')[:100], "club_tache"),
+    "avis d'un cavalier (mails)": (Avis.objects.filter(cavalier_id__in=[1, 2, 3]), "club_avis"),
+}
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', "lit le plan d'exécution de SQLite")
+class IndexTests(TestCase):
+    def test_requetes_frequentes_par_index(self):
+        for nom, (requete, table) in REQUETES_INDEXEES.items():
+            with self.subTest(requete=nom):
+                plan = requete.explain()
+                self.assertIn(table, plan)
+                self.assertNotRegex(plan, rf"\bSCAN {table}\b(?! USING)")
+
+
+# === ARCHIVAGE DES SAISONS ===
+@override_settings(CACHES=CACHE_LOCAL)
+class ArchivageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generer_club(cavaliers=40, chevaux=20, cours=8, moniteurs=3, marque="archive", semaines=1)
+
+    def _chemins_chauds(self):
+        """Résultats et nombre de requêtes des chemins chauds de bench_archive."""
+        cours, cavalier = Cours.objects.order_by('pk').first(), Cavalier.objects.order_by('pk').first()
+        cheval = Cheval.objects.filter(age__gte=6).order_by('pk').first()
+        chemins = {
+            "règles": lambda: [e and e.code for e in validate_many([
+                Participation(cours=cours, cavalier=cavalier, cheval=cheval)])],
+            "choix du cheval": lambda: choisir_cheval(cours, cavalier),
+            "places des cours": lambda: sorted(Cours.objects.annotate(nb=participants_du_cours(sept_jours()))
+                                               .values_list('pk', 'nb')),
+            "planning du cavalier": lambda: list(Participation.objects.filter(
+                cavalier=cavalier, date__gte=sept_jours()[0]).values_list('pk', flat=True)),
+        }
+        mesures = {}
+        for nom, chemin in chemins.items():
+            with CaptureQueriesContext(connection) as requetes:
+                resultat = chemin()
+            mesures[nom] = (resultat, len(requetes))
+        return mesures
+
+    def _archiver(self, **kwargs):
+        for _ in archiver(**kwargs):
+            pass
+
+    def test_chemins_chauds_independants_de_l_historique(self):
+        # La table chaude, les résultats et les requêtes restent les mêmes quel que soit le volume archivé
+        chaudes, reference = Participation.objects.count(), self._chemins_chauds()
+        plus_ancien = None
+        for volume in (200, 800):
+            plus_ancien = generer_historique(volume, avant=plus_ancien)
+            self._archiver(taille=150)
+            with self.subTest(archivees=ParticipationArchivee.objects.count()):
+                self.assertEqual(Participation.objects.count(), chaudes)
+                self.assertEqual(self._chemins_chauds(), reference)
+        self.assertEqual(ParticipationArchivee.objects.count(), 1000)
+
+    def test_reprise_apres_interruption(self):
+        generer_historique(300)
+        next(archiver(taille=100))  # interrompu après le premier lot
+        self.assertEqual(ParticipationArchivee.objects.count(), 100)
+        self._archiver(taille=100)
+        self.assertEqual(ParticipationArchivee.objects.count(), 300)
+        self.assertFalse(Participation.objects.filter(date__lt=semaine()[0]).exists())
+
+    def test_bilans(self):
+        generer_historique(300)
+        concours = Participation.objects.filter(date__lt=semaine()[0], cours__niveau_normalise="concours").count()
+        self._archiver()
+        self.assertEqual(sum(BilanCavalier.objects.values_list('seances', flat=True)), 300)
+        self.assertEqual(sum(BilanCavalier.objects.values_list('concours', flat=True)), concours)
+        self.assertEqual(sum(BilanCheval.objects.values_list('seances', flat=True)), 300)
+        # Compteurs d'occupation toujours justes après le déplacement
+        self.assertFalse(Seance.objects.participants_faux().exists())
+
+
+# === LISTE D'ATTENTE ===
+@override_settings(CACHES=CACHE_LOCAL)
+class ListeAttenteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cours = _cours()
+        cls.cavaliers = _cavaliers(PLACES_PAR_COURS + 1)
+        _chevaux(PLACES_PAR_COURS + 2)
+
+    def setUp(self):
+        for cavalier in self.cavaliers[:PLACES_PAR_COURS]:
+            inscrire(cavalier, self.cours)
+        self.attente = inscrire_ou_attendre(self.cavaliers[-1], self.cours)[1]
+        self.seance = Seance.objects.get(cours=self.cours)
+
+    def test_desinscription_promeut_la_file(self):
+        Participation.objects.filter(cavalier=self.cavaliers[0]).delete()
+        self.attente.refresh_from_db()
+        self.assertIsNotNone(self.attente.promue_le)
+        self.assertTrue(Participation.objects.filter(cavalier=self.cavaliers[-1], seance=self.seance).exists())
+        self.seance.refresh_from_db()
+        self.assertEqual(self.seance.participants, PLACES_PAR_COURS)
+
+    def test_replanification_ne_promeut_personne(self):
+        appliquer(planifier_semaine(cours=Cours.objects.filter(pk=self.cours.pk), replanifier=True))
+        self.attente.refresh_from_db()
+        self.assertIsNone(self.attente.promue_le)
+        self.assertEqual(set(Participation.objects.filter(seance=self.seance).values_list('cavalier', flat=True)),
+                         {c.pk for c in self.cavaliers[:PLACES_PAR_COURS]})
+        self.seance.refresh_from_db()
+        self.assertEqual(self.seance.participants, PLACES_PAR_COURS)
+
+
+# === INSCRIPTIONS SIMULTANÉES ===
+@override_settings(CACHES=CACHE_LOCAL, EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class InscriptionsSimultaneesTests(TransactionTestCase):
+    """Version réduite de stress_inscriptions, sur la base de test et une connexion par thread."""
+
+    def test_aucune_limite_depassee(self):
+        # Même jour : les chevaux atteignent leur limite de 2 séances par jour
+        cours = [_cours(debut=8 + i, fin=9 + i) for i in range(4)]
+        chevaux = _chevaux(3)
+        cavaliers = _cavaliers(40)
+
+        def inscrire_en_reessayant(tache):
+            # La base de test en mémoire refuse tout de suite un écrivain concurrent
+            # (« table is locked ») au lieu de l'attendre : on réessaie
+            i, cavalier = tache
+            for _ in range(1000):
+                try:
+                    return inscrire(cavalier, cours[i % len(cours)], cheval=chevaux[i % len(chevaux)])
+                except OperationalError:
+                    time.sleep(0.001)
+            raise OperationalError("verrou jamais obtenu")
+
+        resultats, _ = _en_parallele(enumerate(cavaliers), inscrire_en_reessayant, 8)
+
+        self.assertEqual(resultats['verrou'], 0)
+        participations = Participation.objects.all()
+        self.assertEqual(participations.count(), 3 * 2)  # chaque cheval deux fois dans la journée
+        self.assertFalse(participations.values('seance').annotate(n=Count('id')).filter(n__gt=PLACES_PAR_COURS))
+        self.assertFalse(participations.values('cheval', 'date').annotate(n=Count('id')).filter(n__gt=2))
+        self.assertFalse(participations.values('cheval', 'seance').annotate(n=Count('id')).filter(n__gt=1))
+        for seance in Seance.objects.annotate(n=Count('participations')):
+            self.assertEqual(seance.participants, seance.n)
+
+# === COMPTEURS D'OCCUPATION ===
+@override_settings(CACHES=CACHE_LOCAL)
+class CompteursTests(TestCase):
+    """Participants des séances, jours de cheval et semaines de cavalier suivent toutes les écritures."""
+
+    @classmethod
+    def setUpTestData(cls):
+        generer_club(cavaliers=60, chevaux=30, cours=10, moniteurs=3, marque="compteurs", semaines=2)
+
+    def setUp(self):
+        self.assertEqual(self._fausses(), {})
+        self.seances = list(Seance.objects.filter(date__range=sept_jours()).select_related('cours').order_by('pk'))
+        self.suivantes = list(Seance.objects.exclude(date__range=sept_jours()).select_related('cours')
+                              .order_by('pk'))
+
+    def tearDown(self):
+        self.assertEqual(self._fausses(), {})
+
+    def _fausses(self):
+        """Compteurs qui ne correspondent plus aux participations : ``{nom: nombre}``, vide si tout est juste."""
+        participations = Participation.objects.all()
+        comptes = {
+            'séances': Seance.objects.participants_faux().count(),
+            'jours de cheval': len(ChevalJour.objects.faux(participations)),
+            'semaines de cavalier': len(CavalierSemaine.objects.faux(participations)),
+        }
+        return {nom: n for nom, n in comptes.items() if n}
+
+    def _libre(self, seance, cavalier=None):
+        """Un cavalier (``cavalier`` ou un autre) et un cheval absents de ``seance``."""
+        presents = Participation.objects.filter(seance=seance)
+        cavalier = cavalier or Cavalier.objects.exclude(pk__in=presents.values('cavalier')).order_by('pk').first()
+        cheval = Cheval.objects.exclude(pk__in=presents.values('cheval')).order_by('pk').first()
+        return cavalier, cheval
+
+    def _premiere(self):
+        return Participation.objects.filter(seance__in=self.seances).order_by('pk').first()
+
+    def test_creation(self):
+        seance = self.seances[0]
+        avant = seance.participants
+        cavalier, cheval = self._libre(seance)
+        Participation.objects.create(seance=seance, cavalier=cavalier, cheval=cheval)
+        seance.refresh_from_db()
+        self.assertEqual(seance.participants, avant + 1)
+
+    def test_suppression(self):
+        Participation.objects.order_by('pk').first().delete()
+
+    def test_reaffectation(self):
+        p = self._premiere()
+        seance = next(s for s in self.suivantes if s.cours_id != p.cours_id)
+        p.cavalier, p.cheval = self._libre(seance)
+        p.seance, p.date = seance, None
+        p.save()
+
+    def test_queryset_update(self):
+        p = self._premiere()
+        seance = next(s for s in self.suivantes if s.cours_id != p.cours_id)
+        cavalier, _ = self._libre(seance)
+        Participation.objects.filter(pk=p.pk).update(cavalier=cavalier, seance=seance, cours=seance.cours,
+                                                     date=seance.date)
+
+    def _en_lot(self, **kwargs):
+        lot = []
+        for seance in self.suivantes[:10]:
+            cavalier, cheval = self._libre(seance)
+            lot.append(Participation(seance=seance, cavalier=cavalier, cheval=cheval))
+        Participation.objects.bulk_create(lot, **kwargs)
+
+    def test_bulk_create(self):
+        self._en_lot()
+
+    def test_bulk_create_ignore_conflicts(self):
+        self._en_lot(ignore_conflicts=True)
+
+    def test_queryset_delete(self):
+        Participation.objects.filter(seance=self.seances[0]).delete()
+
+    def test_suppression_en_cascade(self):
+        Participation.objects.order_by('pk').first().cavalier.delete()
+
+    def _refusee(self, participation, code, **limites):
+        """Enregistre ``participation`` sous ``limites`` : doit être refusée (``code``) sans rien laisser."""
+        avant = Participation.objects.count()
+        with self.assertRaises(ValidationError) as e:
+            participation.save(**limites)
+        self.assertEqual(e.exception.code, code)
+        self.assertEqual(Participation.objects.count(), avant)
+
+    def test_garde_seance_complete(self):
+        seance = self.seances[0]
+        while Seance.objects.get(pk=seance.pk).participants < PLACES_PAR_COURS:
+            cavalier, cheval = self._libre(seance)
+            Participation.objects.create(seance=seance, cavalier=cavalier, cheval=cheval)
+        cavalier, cheval = self._libre(seance)
+        self._refusee(Participation(seance=seance, cavalier=cavalier, cheval=cheval),
+                      'complet', places=PLACES_PAR_COURS)
+
+    def test_garde_semaine_pleine(self):
+        cavalier = Cavalier.objects.order_by('pk').first()
+        # Semaine prochaine, toutes séances créées quel que soit le jour. Séances
+        # où il n'est pas : une passe, la suivante dépasse la limite
+        debut = lundi(aujourd_hui()) + timedelta(weeks=1)
+        libres = [s for s in self.seances + self.suivantes if lundi(s.date) == debut
+                  and not Participation.objects.filter(seance=s, cavalier=cavalier).exists()]
+        limite = cavalier.nb_cours(debut) + 1
+        premiere, seconde = libres[:2]
+        Participation(seance=premiere, cavalier=cavalier, cheval=self._libre(premiere, cavalier)[1]) \
+            .save(max_cours=limite)
+        self._refusee(Participation(seance=seconde, cavalier=cavalier, cheval=self._libre(seconde, cavalier)[1]),
+                      'limite_semaine', max_cours=limite)
+
+
+# === EXPORT CSV ===
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cours = _cours()
+        for cavalier, cheval in zip(_cavaliers(3), _chevaux(3)):
+            Participation.objects.create(cours=cours, cavalier=cavalier, cheval=cheval)
+
+    def test_iterateur_selon_le_serveur(self):
+        # Sous ASGI, un itérateur synchrone serait lu d'un bloc avant l'envoi
+        attendu = "".join(exports.lignes_csv(*exports.participations()))
+        self.assertEqual(len(attendu.splitlines()), 4)
+        wsgi = exports.reponse_csv(RequestFactory().get('/'), "participations", exports.participations())
+        self.assertFalse(wsgi.is_async)
+        self.assertEqual(b"".join(wsgi.streaming_content).decode(), attendu)
+
+        async def lire(reponse):
+            return b"".join([morceau async for morceau in reponse.streaming_content]).decode()
+
+        asgi = exports.reponse_csv(AsyncRequestFactory().get('/'), "participations", exports.participations())
+        self.assertTrue(asgi.is_async)
+        self.assertEqual(async_to_sync(lire)(asgi), attendu)
+
+
+# === IMPORT CSV ===
+class ImportationTests(TestCase):
+    def _importer(self, format, contenu, **kwargs):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', encoding='utf-8', delete=False) as f:
+            f.write(contenu)
+        self.addCleanup(os.remove, f.name)
+        return importer_csv(f.name, format, **kwargs)
+
+    def test_compteurs_des_chevaux_ignores(self):
+        cheval = Cheval.objects.create(nom="Tornado", age=9, race="Selle français")
+        Cheval.objects.filter(pk=cheval.pk).update(seances_travail=3)
+        rapport = self._importer("chevaux", "nom,age,race,seances_travail,disponible\n"
+                                            "Tornado,10,Selle français,0,oui\n"
+                                            "Éclair,7,Connemara,12,non\n", upsert=True)
+        self.assertEqual((rapport.crees, rapport.mis_a_jour, rapport.rejets), (1, 1, []))
+        cheval.refresh_from_db()
+        self.assertEqual((cheval.age, cheval.seances_travail), (10, 3))
+        self.assertEqual(Cheval.objects.values_list('seances_travail', 'disponible').get(nom="Éclair"), (0, True))
+
+    def test_emails_deja_pris_rejetes(self):
+        Cavalier.objects.create(nom="Martin", prenom="Léa", age=15, email="lea@example.com")
+        rapport = self._importer("cavaliers", "nom,prenom,age,email\n"
+                                              "Martin,Léa,15,lea@example.com\n"
+                                              "Dubois,Hugo,12,hugo@example.com\n"
+                                              "Dubois,Hugo,12,hugo@example.com\n")
+        self.assertEqual(rapport.crees, 1)
+        self.assertEqual([numero for numero, _ in rapport.rejets], [2, 4])
+        self.assertEqual(Cavalier.objects.count(), 2)
+
+
+# === TÂCHES DE FOND ===
+def _en_echec(arguments):
+    raise RuntimeError("serveur indisponible")
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class TachesTests(TestCase):
+    def setUp(self):
+        self.faites = []
+        patch = mock.patch.dict(TACHES, {'test': self.faites.extend, 'test_echec': _en_echec})
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def _tout_executer(self, maintenant=None):
+        while taches := prendre(100, maintenant):
+            traiter(taches)
+
+    @override_settings(TACHES_SYNCHRONES=True)
+    def test_synchrone_apres_le_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            mettre_en_file('test', {1: {'n': 1}, 2: {'n': 2}})
+            self.assertEqual(self.faites, [])
+        self.assertEqual(self.faites, [{'n': 1}, {'n': 2}])
+
+    @override_settings(TACHES_SYNCHRONES=True)
+    def test_echec_synchrone_journalise(self):
+        # L'écriture est validée : l'échec de la tâche ne remonte pas à la requête
+        with self.assertLogs('club.taches', 'ERROR') as journal, self.captureOnCommitCallbacks(execute=True):
+            mettre_en_file('test_echec', {1: {}})
+        self.assertIn("serveur indisponible", journal.output[0])
+
+    @override_settings(TACHES_SYNCHRONES=False)
+    def test_file_dedoublonnee(self):
+        mettre_en_file('test', {1: {'n': 1}})
+        mettre_en_file('test', {1: {'n': 1}, 2: {'n': 2}})
+        self.assertEqual(Tache.objects.count(), 2)
+        self._tout_executer()
+        self.assertEqual(sorted(a['n'] for a in self.faites), [1, 2])
+        self.assertFalse(Tache.objects.exists())
+
+    @override_settings(TACHES_SYNCHRONES=False)
+    def test_echec_rejoue_puis_abandonne(self):
+        mettre_en_file('test_echec', {1: {}})
+        with self.assertLogs('club.taches', 'WARNING'):
+            for essai in range(ESSAIS_MAX):
+                self._tout_executer(maintenant=timezone.now() + timedelta(days=essai + 1))
+        tache = Tache.objects.get()
+        self.assertEqual(tache.essais, ESSAIS_MAX)
+        self.assertIsNotNone(tache.abandonnee_le)
+        self.assertIn("serveur indisponible", tache.erreur)
+
+    def test_file_sans_cache_partage_refusee(self):
+        with self.settings(TACHES_SYNCHRONES=False):
+            self.assertEqual([e.id for e in verifier_cache_partage(None)], ['club.E001'])
+            with self.settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                                                   'LOCATION': tempfile.gettempdir()}}):
+                self.assertEqual(verifier_cache_partage(None), [])
+
+
+# === MAILS ===
+class Compteur(EmailBackend):
+    """Backend locmem qui compte les connexions ouvertes."""
+    connexions = 0
+
+    def open(self):
+        Compteur.connexions += 1
+        return super().open()
+
+
+class Capricieux(Compteur):
+    """Compteur qui lève ``erreurs[adresse]`` pour les mails à ces adresses."""
+    erreurs = {}
+
+    def send_messages(self, messages):
+        for m in messages:
+            if m.to[0] in self.erreurs:
+                raise self.erreurs[m.to[0]]
+        return super().send_messages(messages)
+
+
+def _port_ferme():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@override_settings(CACHES=CACHE_LOCAL, EMAIL_BACKEND='club.tests.Compteur', TACHES_SYNCHRONES=False)
+class MailsTests(TestCase):
+    numeros = itertools.count()
+
+    @classmethod
+    def setUpTestData(cls):
+        generer_club(cavaliers=60, chevaux=30, cours=10, moniteurs=3, marque="mails", semaines=2)
+
+    def setUp(self):
+        self._vider()
+        self.seances = list(Seance.objects.filter(date__range=sept_jours()).select_related('cours')
+                            .order_by('participants', 'pk'))
+
+    def _vider(self):
+        """Exécute la file comme run_worker : renvoie les mails envoyés."""
+        mail.outbox = []
+        Compteur.connexions = 0
+        while taches := prendre(1000):
+            traiter(taches)
+        return mail.outbox
+
+    def _cavalier(self):
+        n = next(self.numeros)
+        return Cavalier.objects.create(nom="mails", prenom=f"nouveau-{n}", age=30, email=f"mails-nouveau-{n}@club.example")
+
+    def _inscrire(self, cavalier, seances=None):
+        """Inscrit ``cavalier`` à la première séance de ``seances`` qui l'accepte."""
+        for seance in seances or self.seances:
+            try:
+                with transaction.atomic():
+                    return inscrire(cavalier, seance.cours, date=seance.date)
+            except ValidationError:
+                continue
+        self.fail("aucune séance ne l'accepte")
+
+    def _semaine(self):
+        """Semaine de la prochaine participation."""
+        return semaine(Participation.objects.filter(date__gte=aujourd_hui()).earliest('date').date)
+
+    def test_inscription_confirmee(self):
+        cavalier = self._cavalier()
+        p = self._inscrire(cavalier)
+        mails = self._vider()
+        self.assertEqual([m.to for m in mails], [[cavalier.email]])
+        self.assertTrue(mails[0].subject.startswith("Inscription confirmée"))
+        self.assertIn(p.cheval.nom, mails[0].body)
+
+    def test_deux_inscriptions_un_seul_mail(self):
+        cavalier = self._cavalier()
+        premiere = self._inscrire(cavalier)
+        self._inscrire(cavalier, [s for s in self.seances if s.cours_id != premiere.cours_id])
+        mails = self._vider()
+        self.assertEqual(len(mails), 1)
+        self.assertEqual(mails[0].body.count("✅"), 2)
+
+    def test_inscription_puis_desinscription_rien(self):
+        self._inscrire(self._cavalier()).delete()
+        self.assertEqual(self._vider(), [])
+
+    def test_desinscription(self):
+        p = Participation.objects.filter(seance__in=self.seances).select_related('cavalier').first()
+        p.delete()
+        mails = self._vider()
+        self.assertEqual([m.to for m in mails], [[p.cavalier.email]])
+        self.assertTrue(mails[0].subject.startswith("Désinscription"))
+
+    def test_promotion_depuis_la_liste_d_attente(self):
+        seance = self.seances[0]
+        while Seance.objects.get(pk=seance.pk).participants < PLACES_PAR_COURS:
+            self._inscrire(self._cavalier(), [seance])
+        attente = inscrire_ou_attendre(self._cavalier(), seance.cours, date=seance.date)[1]
+        self.assertIsNotNone(attente)
+        self._vider()
+        partant = Participation.objects.filter(seance=seance).select_related('cavalier').first()
+        partant.delete()
+        self.assertEqual(sorted(m.to[0] for m in self._vider()),
+                         sorted([partant.cavalier.email, attente.cavalier.email]))
+
+    def test_suppression_en_cascade_rien(self):
+        self.seances[-1].cours.delete()
+        self.assertEqual(self._vider(), [])
+
+    def test_replanification_rien(self):
+        # Les participations réécrites par le planning ne sont pas des désinscriptions
+        self.assertTrue(Participation.objects.filter(seance__in=self.seances).exists())
+        appliquer(planifier_semaine(replanifier=True))
+        self.assertEqual([m.subject for m in self._vider() if m.subject.startswith("Désinscription")], [])
+
+    def test_programme_de_la_semaine(self):
+        jours = self._semaine()
+        annoncer_programmes(jours[0])
+        mails = self._vider()
+        cavaliers = Participation.objects.filter(date__range=jours).values_list('cavalier__email', flat=True)
+        moniteurs = Seance.objects.filter(date__range=jours, cours__entraineur__isnull=False) \
+            .values_list('cours__entraineur__email', flat=True)
+        self.assertTrue(cavaliers)
+        self.assertEqual(sorted(m.to[0] for m in mails), sorted(set(cavaliers) | set(moniteurs)))
+        p = Participation.objects.filter(date__range=jours).select_related('cavalier', 'cheval').first()
+        self.assertIn(p.cheval.nom, next(m.body for m in mails if m.to == [p.cavalier.email]))
+
+    def test_une_connexion_par_lot(self):
+        for _ in range(3):
+            self._inscrire(self._cavalier())
+        annoncer_programmes(self._semaine()[0])
+        mails = self._vider()
+        # Un lot par tâche (avis, programmes), une connexion chacun
+        self.assertGreater(len(mails), 3)
+        self.assertEqual(Compteur.connexions, 2)
+
+    @override_settings(EMAIL_BACKEND='club.tests.Capricieux')
+    def test_adresse_refusee_ne_bloque_pas_le_lot(self):
+        refuse, servi = self._cavalier(), self._cavalier()
+        for cavalier in (refuse, servi):
+            self._inscrire(cavalier)
+        erreur = smtplib.SMTPRecipientsRefused({refuse.email: (550, b"adresse inconnue")})
+        with mock.patch.dict(Capricieux.erreurs, {refuse.email: erreur}), \
+                self.assertLogs('club.taches.mails', 'WARNING'):
+            mails = self._vider()
+        self.assertEqual([m.to for m in mails], [[servi.email]])
+        self.assertFalse(Avis.objects.filter(cavalier__in=[refuse, servi]).exists())
+        self.assertFalse(Tache.objects.exists())
+
+    @override_settings(EMAIL_BACKEND='club.tests.Capricieux')
+    def test_echec_partiel_pas_de_second_mail(self):
+        en_echec, servi = self._cavalier(), self._cavalier()
+        for cavalier in (en_echec, servi):
+            self._inscrire(cavalier)
+        with mock.patch.dict(Capricieux.erreurs, {en_echec.email: smtplib.SMTPDataError(451, b"plus tard")}), \
+                self.assertLogs('club.taches', 'WARNING'):
+            self.assertEqual([m.to for m in self._vider()], [[servi.email]])
+        self.assertEqual(list(Avis.objects.filter(cavalier__in=[en_echec, servi]).values_list('cavalier', flat=True)
+                              .distinct()), [en_echec.pk])
+        # Nouvel essai : seul le cavalier pas encore servi reçoit son mail
+        Tache.objects.update(executer_apres=timezone.now())
+        self.assertEqual([m.to for m in self._vider()], [[en_echec.email]])
+        self.assertFalse(Avis.objects.filter(cavalier=en_echec).exists())
+
+    @override_settings(TACHES_SYNCHRONES=True, EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+                       EMAIL_HOST="127.0.0.1", EMAIL_PORT=_port_ferme(), EMAIL_TIMEOUT=1)
+    def test_serveur_injoignable(self):
+        # L'inscription est validée et réussit : l'échec est journalisé, l'avis gardé pour le prochain envoi
+        cavalier = self._cavalier()
+        with self.assertLogs('club.taches', 'ERROR'), self.captureOnCommitCallbacks(execute=True):
+            p = self._inscrire(cavalier)
+        self.assertTrue(Participation.objects.filter(pk=p.pk).exists())
+        self.assertTrue(Avis.objects.filter(cavalier=cavalier).exists())
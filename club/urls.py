@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     path('', views.accueil, name='accueil'),
@@ -9,4 +9,7 @@ urlpatterns = [
     path('dashboard/concours/', views.concours, name='concours'),
     path('dashboard/chevaux/', views.chevaux, name='chevaux'),
     path('dashboard/inscription-cavalier/', views.inscription_cavalier, name='inscription_cavalier'),
+    path('api/chevaux/', api.chevaux, name='api_chevaux'),
+    path('api/cours/', api.cours, name='api_cours'),
+    path('api/places/', api.places, name='api_places'),
 ]
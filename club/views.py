@@ -1,22 +1,44 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import redirect_to_login
 from django.contrib import messages
-from .models import Cavalier, Participation, Cheval, Cours
-from django.utils.timezone import now
-from datetime import timedelta
-from django.db.models import Count
-
-
-def accueil(request):
+from django.core.exceptions import ValidationError
+from django.template.loader import render_to_string
+from .cache import afragment_planning, aparticipations_du_cavalier
+from .disponibilites import disponibilites, seances_ouvertes
+from .inscriptions import PLACES_PAR_COURS, inscrire_ou_attendre
+from .models import Cavalier, Cheval, Cours
+
+
+# === VUES ASYNCHRONES (lecture) ===
+# Sous ASGI, elles attendent la base sans occuper un thread. L'utilisateur est
+# chargé avec request.auser() puis posé sur request.user : les gabarits
+# peuvent alors lire user sans requête synchrone.
+
+def connexion_requise(vue):
+    """Équivalent de login_required pour une vue asynchrone."""
+    @wraps(vue)
+    async def envelopper(request, *args, **kwargs):
+        request.user = await request.auser()
+        if not request.user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await vue(request, *args, **kwargs)
+    return envelopper
+
+
+async def accueil(request):
+    request.user = await request.auser()
     return render(request, 'accueil.html')
 
 
-@login_required
-def dashboard(request):
-    user = request.user
+@connexion_requise
+async def dashboard(request):
     try:
-        cavalier = Cavalier.objects.get(user=user)
-        participations = Participation.objects.filter(cavalier=cavalier)
+        cavalier = await Cavalier.objects.aget(user=request.user)
+        participations = await aparticipations_du_cavalier(cavalier)
     except Cavalier.DoesNotExist:
         cavalier = None
         participations = None
@@ -27,102 +49,101 @@ def dashboard(request):
     })
 
 
-@login_required
-def statut(request):
+@connexion_requise
+async def statut(request):
     try:
-        cavalier = Cavalier.objects.get(user=request.user)
-        participations = Participation.objects.filter(cavalier=cavalier)
+        cavalier = await Cavalier.objects.aget(user=request.user)
+        planning = await afragment_planning(cavalier)
     except Cavalier.DoesNotExist:
-        participations = []
+        planning = render_to_string('club/_planning.html', {'participations': []})
 
     return render(request, 'statut.html', {
-        'participations': participations
+        'planning': planning
     })
 
 
-@login_required
-def inscription(request):
+def _en_attente(attente):
+    return f"Ce cours est complet : tu es n°{attente.position()} sur la liste d'attente ⏳"
+
+
+def _inscrire_au_concours(cavalier, cours_id):
+    """Partie POST de ``concours`` : synchrone, dans la transaction d'``inscrire``."""
+    cours = Cours.objects.get(id=cours_id)
+    try:
+        participation, attente = inscrire_ou_attendre(cavalier, cours)
+        if attente:
+            return _en_attente(attente)
+        return "Inscription au concours réussie ✅"
+    except ValidationError as e:
+        if e.code == 'deja_inscrit':
+            return "Tu es déjà inscrit à ce concours."
+        elif e.code == 'aucun_cheval':
+            return "Aucun cheval disponible pour ce concours 😥"
+        else:
+            return f"Erreur : {e.messages[0]}"
+
+
+@connexion_requise
+async def concours(request):
     message = ""
     try:
-        cavalier = Cavalier.objects.get(user=request.user)
-        participations = Participation.objects.filter(cavalier=cavalier)
-        nb_actuel = participations.count()
+        cavalier = await Cavalier.objects.aget(user=request.user)
+        if request.method == "POST":
+            message = await sync_to_async(_inscrire_au_concours)(cavalier, request.POST.get("cours_id"))
+        # Prochaine séance des concours qu'il peut rejoindre, complets compris (liste d'attente)
+        concours = [s async for s in seances_ouvertes(cavalier, niveau="concours", complets=True)]
+    except Cavalier.DoesNotExist:
+        concours = []
+        message = "Cavalier non trouvé."
 
-        if request.method == "POST" and nb_actuel < 3:
-            cours_id = request.POST.get("cours_id")
-            cours = Cours.objects.get(id=cours_id)
-            deja = Participation.objects.filter(cavalier=cavalier, cours=cours).exists()
-            if not deja:
-                cheval_dispo = Cheval.objects.filter(disponible=True).first()
-                if cheval_dispo:
-                    Participation.objects.create(cavalier=cavalier, cours=cours, cheval=cheval_dispo)
-                    message = "Inscription réussie ✅"
-                else:
-                    message = "Aucun cheval disponible 😥"
-            else:
-                message = "Tu es déjà inscrit à ce cours."
-        cours_dispo = Cours.objects.exclude(participations__cavalier=cavalier)
-        if nb_actuel >= 3:
-            cours_dispo = []
+    return render(request, "concours.html", {
+        "concours": concours,
+        "message": message,
+        "places": PLACES_PAR_COURS,
+    })
 
-    except Cavalier.DoesNotExist:
-        cours_dispo = []
-        message = "Cavalier introuvable"
 
-    return render(request, "inscription.html", {
-        "cours_dispo": cours_dispo,
-        "message": message
+@connexion_requise
+async def chevaux(request):
+    chevaux = [cheval async for cheval in Cheval.objects.all()]
+    return render(request, "chevaux.html", {
+        "chevaux": chevaux
     })
 
 
+# === VUES SYNCHRONES (formulaires) ===
 @login_required
-def concours(request):
+def inscription(request):
     message = ""
     try:
         cavalier = Cavalier.objects.get(user=request.user)
-        concours = Cours.objects.filter(niveau__iexact="concours")
+
         if request.method == "POST":
             cours_id = request.POST.get("cours_id")
             cours = Cours.objects.get(id=cours_id)
-            deja = Participation.objects.filter(cavalier=cavalier, cours=cours).exists()
-            if not deja:
-                cheval_dispo = Cheval.objects.filter(disponible=True).first()
-                if cheval_dispo:
-                    try:
-                        Participation.objects.create(cavalier=cavalier, cours=cours, cheval=cheval_dispo)
-                        message = "Inscription au concours réussie ✅"
-                    except Exception as e:
-                        message = f"Erreur : {e}"
+            try:
+                participation, attente = inscrire_ou_attendre(cavalier, cours, max_cours=3)
+                message = _en_attente(attente) if attente else "Inscription réussie ✅"
+            except ValidationError as e:
+                if e.code == 'aucun_cheval':
+                    message = "Aucun cheval disponible 😥"
                 else:
-                    message = "Aucun cheval disponible pour ce concours 😥"
-            else:
-                message = "Tu es déjà inscrit à ce concours."
+                    message = e.messages[0]
+        cours_dispo = seances_ouvertes(cavalier, max_cours=3, complets=True)
+
     except Cavalier.DoesNotExist:
-        concours = []
-        message = "Cavalier non trouvé."
+        cours_dispo = []
+        message = "Cavalier introuvable"
 
-    return render(request, "concours.html", {
-        "concours": concours,
+    return render(request, "inscription.html", {
+        "cours_dispo": cours_dispo,
         "message": message
     })
 
 
-@login_required
-def chevaux(request):
-    chevaux = Cheval.objects.all()
-    return render(request, "chevaux.html", {
-        "chevaux": chevaux
-    })
-
-
 @login_required
 def inscription_cavalier(request):
     cavalier = Cavalier.objects.get(email=request.user.email)
-    cours_disponibles = Cours.objects.annotate(nb=Count('participations')).filter(nb__lt=5)
-    today = now().strftime('%A').lower()
-    chevaux_disponibles = Cheval.objects.filter(
-        disponible=True
-    ).annotate(nb=Count('participation')).filter(nb__lt=2)
 
     if request.method == "POST":
         cours_id = request.POST.get("cours_id")
@@ -130,27 +151,27 @@ def inscription_cavalier(request):
 
         cours = Cours.objects.get(id=cours_id)
         cheval = Cheval.objects.get(id=cheval_id)
-        semaine = now().date() - timedelta(days=7)
-        total = Participation.objects.filter(cavalier=cavalier, cours__jour__gte=semaine).count()
-
-        if total >= 4:
-            messages.error(request, "❌ Tu as atteint la limite de 4 cours par semaine.")
-            return redirect("inscription_cavalier")
 
-        if cours.participations.count() >= 5:
-            messages.error(request, "❌ Ce cours est déjà complet.")
-            return redirect("inscription_cavalier")
-
-        today_count = Participation.objects.filter(cheval=cheval, cours__jour=cours.jour).count()
-        if today_count >= 2:
-            messages.error(request, f"❌ {cheval.nom} est déjà monté 2 fois aujourd’hui.")
+        try:
+            participation, attente = inscrire_ou_attendre(cavalier, cours, cheval=cheval)
+        except ValidationError as e:
+            if e.code == 'limite_semaine':
+                messages.error(request, "❌ Tu as atteint la limite de 4 cours par semaine.")
+            elif e.code == 'cheval_jour':
+                messages.error(request, f"❌ {cheval.nom} est déjà monté 2 fois ce jour-là.")
+            else:
+                messages.error(request, f"❌ {e.messages[0]}")
             return redirect("inscription_cavalier")
 
-        Participation.objects.create(cavalier=cavalier, cheval=cheval, cours=cours)
-        messages.success(request, f"✅ Tu es inscrit à {cours} avec {cheval.nom} !")
+        if attente:
+            messages.info(request, _en_attente(attente))
+        else:
+            messages.success(request, f"✅ Tu es inscrit à {cours} avec {cheval.nom} !")
         return redirect("inscription_cavalier")
 
+    # Séances qu'il peut rejoindre (complètes : liste d'attente), avec les chevaux qu'il peut y monter
+    seances = disponibilites(cavalier, complets=True)
+
     return render(request, "club/inscription_cavalier.html", {
-        "cours_disponibles": cours_disponibles,
-        "chevaux_disponibles": chevaux_disponibles
+        "seances": seances,
     })
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+import django
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -41,6 +44,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'club.middleware.InstrumentationMiddleware',  # en premier : mesure toute la pile
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -74,11 +78,157 @@ WSGI_APPLICATION = 'monsite.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DJANGO_PROFIL=production active le profil SQLite de production : WAL,
+# connexions persistantes et transactions d'écriture IMMEDIATE (les
+# inscriptions simultanées attendent le verrou au lieu d'échouer en
+# « database is locked »). DJANGO_DB_ENGINE choisit une autre base, décrite
+# par DJANGO_DB_NAME, _USER, _PASSWORD, _HOST et _PORT.
+
+PROFIL = os.environ.get('DJANGO_PROFIL', 'developpement')
+
+if os.environ.get('DJANGO_DB_ENGINE'):
+    DATABASES = {
+        'default': {
+            'ENGINE': os.environ['DJANGO_DB_ENGINE'],
+            'NAME': os.environ.get('DJANGO_DB_NAME', 'club'),
+            'USER': os.environ.get('DJANGO_DB_USER', ''),
+            'PASSWORD': os.environ.get('DJANGO_DB_PASSWORD', ''),
+            'HOST': os.environ.get('DJANGO_DB_HOST', ''),
+            'PORT': os.environ.get('DJANGO_DB_PORT', ''),
+            'CONN_MAX_AGE': int(os.environ.get('DJANGO_DB_CONN_MAX_AGE', 600)),
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+elif PROFIL == 'production':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DJANGO_DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': int(os.environ.get('DJANGO_DB_CONN_MAX_AGE', 600)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'timeout': 5,  # secondes d'attente du verrou d'écriture
+                # Option disponible à partir de Django 5.1
+                **({'transaction_mode': 'IMMEDIATE'} if django.VERSION >= (5, 1) else {}),
+            },
+        }
+    }
+    # Appliqués à chaque connexion par club.sqlite
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -20000,  # en Kio : 20 Mo
+        'temp_store': 'MEMORY',
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DJANGO_DB_NAME', BASE_DIR / 'db.sqlite3'),
+        }
+    }
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# Mémoire locale par défaut ; fichiers si DJANGO_CACHE_DIR est défini, pour
+# partager le cache des plannings entre plusieurs processus.
+
+if os.environ.get('DJANGO_CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ['DJANGO_CACHE_DIR'],
+        }
     }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+
+# Tâches de fond (club.taches)
+# Confiées à la commande run_worker avec le profil de production, exécutées
+# dans le processus dès le commit sinon (tests, développement) ;
+# DJANGO_TACHES=file ou DJANGO_TACHES=synchrone force l'un ou l'autre. Le
+# worker invalide les plannings depuis un autre processus : le cache doit
+# alors être partagé (DJANGO_CACHE_DIR), sinon le check club.E001 refuse de
+# démarrer.
+
+TACHES_SYNCHRONES = os.environ.get('DJANGO_TACHES', 'file' if PROFIL == 'production' else 'synchrone') != 'file'
+
+
+# Mails (club.mails)
+# Affichés sur la console par défaut ; DJANGO_EMAIL_HOST les envoie par SMTP
+# (DJANGO_EMAIL_PORT, _USER, _PASSWORD, DJANGO_EMAIL_TLS=1).
+
+if os.environ.get('DJANGO_EMAIL_HOST'):
+    EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+    EMAIL_HOST = os.environ['DJANGO_EMAIL_HOST']
+    EMAIL_PORT = int(os.environ.get('DJANGO_EMAIL_PORT', 25))
+    EMAIL_HOST_USER = os.environ.get('DJANGO_EMAIL_USER', '')
+    EMAIL_HOST_PASSWORD = os.environ.get('DJANGO_EMAIL_PASSWORD', '')
+    EMAIL_USE_TLS = os.environ.get('DJANGO_EMAIL_TLS') == '1'
+    EMAIL_TIMEOUT = 10
+else:
+    EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
+DEFAULT_FROM_EMAIL = os.environ.get('DJANGO_EMAIL_EXPEDITEUR', 'club@example.com')
+
+
+# Instrumentation des requêtes (club.middleware)
+# Seuils du journal des requêtes lentes ; voir club.middleware.PAR_DEFAUT
+
+INSTRUMENTATION = {
+    'SERVER_TIMING': True,
+    'SEUIL_VUE_MS': 500,
+    'SEUIL_REQUETE_MS': 100,
+    'SEUIL_REQUETES': 50,
+}
+
+
+# Logging
+# https://docs.djangoproject.com/en/5.0/topics/logging/
+# Une ligne JSON par requête HTTP (niveau INFO, désactivée si DEBUG est faux
+# sauf DJANGO_LOG_REQUETES=1) ; requêtes lentes toujours journalisées, dans
+# DJANGO_LOG_LENT si ce fichier est défini.
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+        'lent': {
+            'class': 'logging.FileHandler',
+            'filename': os.environ['DJANGO_LOG_LENT'],
+        } if os.environ.get('DJANGO_LOG_LENT') else {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'club.instrumentation': {
+            'handlers': ['console'],
+            'level': 'INFO' if DEBUG or os.environ.get('DJANGO_LOG_REQUETES') else 'WARNING',
+            'propagate': False,
+        },
+        'club.instrumentation.lent': {
+            'handlers': ['lent'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+        # Échecs et abandons des tâches de fond (run_worker ou exécution synchrone)
+        'club.taches': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
 }
 
 